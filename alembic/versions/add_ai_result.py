@@ -0,0 +1,32 @@
+"""keep the AI prediction of test_results separate from the confirmed result
+
+Revision ID: add_ai_result_005
+Revises: add_clinic_timezone_004
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'add_ai_result_005'
+down_revision = 'add_clinic_timezone_004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    test_status = postgresql.ENUM('Positive', 'Negative', 'Inconclusive', name='teststatus', create_type=False)
+    op.add_column('test_results', sa.Column('ai_result', test_status, nullable=True))
+
+    # Until confirmed, result is still the model's prediction, whether or not the model
+    # version was recorded (those count under "unknown"). Confirmation overwrote it in
+    # place, so the prediction of results confirmed before this migration is unknown and
+    # they stay out of model performance analytics.
+    op.execute("UPDATE test_results SET ai_result = result WHERE NOT is_confirmed")
+    # The daily_model_stats table is created, and filled if needed, on startup.
+
+
+def downgrade() -> None:
+    op.drop_column('test_results', 'ai_result')
@@ -0,0 +1,25 @@
+"""add timezone to clinics
+
+Revision ID: add_clinic_timezone_004
+Revises: add_sync_status_index_003
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_clinic_timezone_004'
+down_revision = 'add_sync_status_index_003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Dashboard statistics are bucketed by the clinic's local day; existing clinics keep UTC days.
+    # Run rebuild_rollups.py after setting clinic timezones.
+    op.add_column('clinics', sa.Column('timezone', sa.String(), nullable=False, server_default='UTC'))
+
+
+def downgrade() -> None:
+    op.drop_column('clinics', 'timezone')
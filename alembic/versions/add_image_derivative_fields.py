@@ -0,0 +1,28 @@
+"""add image hash and detections to test_results
+
+Revision ID: add_image_derivatives_002
+Revises: add_confirmation_001
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_image_derivatives_002'
+down_revision = 'add_confirmation_001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Content hash of the stored image, used to key thumbnail/overlay derivatives
+    op.add_column('test_results', sa.Column('image_hash', sa.String(length=64), nullable=True))
+
+    # Model detections, needed to render overlays after the analysis response is gone
+    op.add_column('test_results', sa.Column('detections', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('test_results', 'detections')
+    op.drop_column('test_results', 'image_hash')
@@ -0,0 +1,23 @@
+"""add index on test_results.sync_status
+
+Revision ID: add_sync_status_index_003
+Revises: add_image_derivatives_002
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'add_sync_status_index_003'
+down_revision = 'add_image_derivatives_002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Sync status counts and pending/failed lookups group or filter on this column
+    op.create_index('ix_test_results_sync_status', 'test_results', ['sync_status'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_test_results_sync_status', table_name='test_results')
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Rebuild the dashboard's rollup tables (daily_clinic_stats, daily_model_stats) from test_results.
+Run after bulk imports or restores that bypassed the application, or to verify the rollups.
+
+Usage:
+    python rebuild_rollups.py
+"""
+
+from src.database.core import engine, Base, SessionLocal
+from src.entities.daily_clinic_stats import DailyClinicStats
+from src.entities.daily_model_stats import DailyModelStats
+from src.dashboard.rollups import rebuild_daily_stats
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def main():
+    Base.metadata.create_all(bind=engine, tables=[DailyClinicStats.__table__, DailyModelStats.__table__])
+    db = SessionLocal()
+    try:
+        rows = rebuild_daily_stats(db)
+        logger.info(f"Rollups rebuilt; daily_clinic_stats has {rows} rows")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
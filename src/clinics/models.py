@@ -1,6 +1,12 @@
 from typing import Optional
 from uuid import UUID
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, field_validator
+from src.database.dates import is_valid_timezone
+
+def _check_timezone(value: Optional[str]) -> Optional[str]:
+    if value is not None and not is_valid_timezone(value):
+        raise ValueError(f"unknown timezone {value!r}")
+    return value
 
 class ClinicBase(BaseModel):
     name: str
@@ -10,6 +16,9 @@ class ClinicBase(BaseModel):
     longitude: Optional[float] = None
     contact_phone: Optional[str] = None
     contact_email: Optional[str] = None
+    timezone: str = "UTC"
+
+    _valid_timezone = field_validator("timezone")(_check_timezone)
 
 class ClinicCreate(ClinicBase):
     pass
@@ -22,6 +31,9 @@ class ClinicUpdate(BaseModel):
     longitude: Optional[float] = None
     contact_phone: Optional[str] = None
     contact_email: Optional[str] = None
+    timezone: Optional[str] = None
+
+    _valid_timezone = field_validator("timezone")(_check_timezone)
 
 class ClinicResponse(ClinicBase):
     id: UUID
@@ -0,0 +1,263 @@
+"""
+Outbreak detection over the daily rollups
+Flags clinic and district days whose positivity is anomalously high and stores them as alerts.
+"""
+
+import os
+import logging
+import threading
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Tuple
+from uuid import UUID
+import numpy as np
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+from src.database.core import SessionLocal
+from src.entities.clinic import Clinic
+from src.entities.daily_clinic_stats import DailyClinicStats
+from src.entities.outbreak_alert import OutbreakAlert, AlertScope, AlertMethod
+from .cache import mark_stale
+from .service import dashboard_today
+
+# Positivity baselines are floored at this rate so a clinic with no positives yet is
+# not alerted on its first one
+MIN_EXPECTED_RATE = 0.02
+
+
+def ewma_baseline(positives: np.ndarray, totals: np.ndarray, alpha: float) -> np.ndarray:
+    """
+    Expected positivity of each series on each day, from exponentially weighted moving
+    averages of positives and of tests over the days before it.
+
+    Args:
+        positives, totals: Arrays of shape (series, days)
+        alpha: Weight of the most recent day
+
+    Returns:
+        Array of the same shape; nan where a series has no earlier tests
+    """
+    smoothed_positives = np.zeros(positives.shape[0])
+    smoothed_totals = np.zeros(positives.shape[0])
+    expected = np.full(positives.shape, np.nan)
+    for day in range(positives.shape[1]):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            expected[:, day] = np.where(smoothed_totals > 0, smoothed_positives / smoothed_totals, np.nan)
+        # Days without tests leave the baseline where it was
+        tested = totals[:, day] > 0
+        smoothed_positives = np.where(tested, alpha * positives[:, day] + (1 - alpha) * smoothed_positives, smoothed_positives)
+        smoothed_totals = np.where(tested, alpha * totals[:, day] + (1 - alpha) * smoothed_totals, smoothed_totals)
+    return expected
+
+
+def excess_scores(positives: np.ndarray, totals: np.ndarray, expected: np.ndarray) -> np.ndarray:
+    """Binomial z-score of each day's positives against the expected positivity."""
+    rate = np.clip(expected, MIN_EXPECTED_RATE, 1 - MIN_EXPECTED_RATE)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (positives - totals * rate) / np.sqrt(totals * rate * (1 - rate))
+
+
+def cusum(scores: np.ndarray, k: float, h: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    One-sided CUSUM of z-scores: S = max(0, S + z - k), signalling when S exceeds h.
+    Days without a score (nan) leave S unchanged; S restarts from 0 after a signal.
+
+    Returns:
+        Tuple of (S after each day, signal mask)
+    """
+    running = np.zeros(scores.shape[0])
+    sums = np.zeros(scores.shape)
+    signals = np.zeros(scores.shape, dtype=bool)
+    for day in range(scores.shape[1]):
+        running = np.maximum(0, running + np.nan_to_num(scores[:, day] - k, nan=0.0))
+        sums[:, day] = running
+        signals[:, day] = running > h
+        running = np.where(signals[:, day], 0, running)
+    return sums, signals
+
+
+class AnomalyDetector:
+    """
+    Periodically scores recent days of every clinic and district against their own
+    positivity baseline and stores the anomalous ones as outbreak alerts.
+
+    Two detectors run over the same baseline:
+    - EWMA: a single day's positivity is z_threshold standard errors above the baseline.
+    - CUSUM: smaller excesses accumulate over consecutive days beyond cusum_h.
+
+    Each run reads only baseline_days + recheck_days of daily rollups, so its cost does
+    not grow with history. The last recheck_days are scored again every run, because
+    results synced late from offline clinics still change them; their alerts are replaced.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        interval_seconds: float = None,
+        baseline_days: int = None,
+        recheck_days: int = None,
+        alpha: float = None,
+        z_threshold: float = None,
+        cusum_k: float = 0.5,
+        cusum_h: float = 4.0,
+        min_tests: int = None,
+    ):
+        self.session_factory = session_factory
+        # 0 disables the periodic run
+        self.interval_seconds = interval_seconds if interval_seconds is not None else float(os.getenv("ANOMALY_INTERVAL_SECONDS", "3600"))
+        self.baseline_days = baseline_days or int(os.getenv("ANOMALY_BASELINE_DAYS", "56"))
+        self.recheck_days = recheck_days or int(os.getenv("ANOMALY_RECHECK_DAYS", "14"))
+        self.alpha = alpha or float(os.getenv("ANOMALY_EWMA_ALPHA", "0.1"))
+        self.z_threshold = z_threshold or float(os.getenv("ANOMALY_Z_THRESHOLD", "3"))
+        self.cusum_k = cusum_k
+        self.cusum_h = cusum_h
+        # Days with fewer tests are not scored, and neither are series with fewer earlier tests
+        self.min_tests = min_tests or int(os.getenv("ANOMALY_MIN_TESTS", "5"))
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def load_counts(self, db: Session, start_day: date, end_day: date) -> Tuple[List[Tuple[UUID, str]], np.ndarray, np.ndarray]:
+        """
+        Daily positives and tests per clinic from the rollups, days with no tests as zeros.
+
+        Returns:
+            Tuple of ([(clinic_id, district)] per series, positives, totals), the arrays of shape (clinics, days)
+        """
+        rows = db.execute(
+            select(DailyClinicStats.clinic_id, Clinic.district, DailyClinicStats.day,
+                   DailyClinicStats.positive_cases, DailyClinicStats.total_tests)
+            .join(Clinic, Clinic.id == DailyClinicStats.clinic_id)
+            .where(DailyClinicStats.day >= start_day, DailyClinicStats.day <= end_day)
+        ).all()
+
+        clinics = sorted({(row.clinic_id, row.district) for row in rows}, key=lambda clinic: str(clinic[0]))
+        index = {clinic_id: i for i, (clinic_id, _) in enumerate(clinics)}
+        shape = (len(clinics), (end_day - start_day).days + 1)
+        positives, totals = np.zeros(shape), np.zeros(shape)
+        if rows:
+            series = np.array([index[row.clinic_id] for row in rows])
+            days = np.array([(row.day - start_day).days for row in rows])
+            np.add.at(positives, (series, days), [row.positive_cases for row in rows])
+            np.add.at(totals, (series, days), [row.total_tests for row in rows])
+        return clinics, positives, totals
+
+    def detect(self, positives: np.ndarray, totals: np.ndarray, first_scored_day: int) -> List[Tuple[int, int, AlertMethod, float, float]]:
+        """
+        Score every series and return the anomalous (series, day) pairs from first_scored_day on.
+
+        Returns:
+            List of (series index, day index, method, expected rate, score)
+        """
+        expected = ewma_baseline(positives, totals, self.alpha)
+        earlier_tests = np.cumsum(totals, axis=1) - totals
+        scored = (totals >= self.min_tests) & (earlier_tests >= self.min_tests) & ~np.isnan(expected)
+        scores = np.where(scored, excess_scores(positives, totals, expected), np.nan)
+        sums, cusum_signals = cusum(scores, self.cusum_k, self.cusum_h)
+
+        alerts = []
+        for method, mask, values in (
+            (AlertMethod.Ewma, scored & (np.nan_to_num(scores, nan=0.0) >= self.z_threshold), scores),
+            (AlertMethod.Cusum, scored & cusum_signals, sums),
+        ):
+            for series, day in zip(*np.nonzero(mask[:, first_scored_day:])):
+                day += first_scored_day
+                alerts.append((int(series), int(day), method, float(expected[series, day]), float(values[series, day])))
+        return alerts
+
+    def run_once(self, today: date = None) -> Dict[str, int]:
+        """
+        Score the last recheck_days days and replace their alerts.
+
+        Returns:
+            Dictionary with the number of clinic and district alerts written
+        """
+        end_day = today or dashboard_today()
+        first_scored = end_day - timedelta(days=self.recheck_days - 1)
+        start_day = first_scored - timedelta(days=self.baseline_days)
+        first_scored_index = (first_scored - start_day).days
+
+        db = self.session_factory()
+        try:
+            clinics, positives, totals = self.load_counts(db, start_day, end_day)
+            districts = sorted({district for _, district in clinics})
+            district_index = np.array([districts.index(district) for _, district in clinics], dtype=int)
+            district_positives = np.zeros((len(districts), positives.shape[1]))
+            district_totals = np.zeros((len(districts), positives.shape[1]))
+            np.add.at(district_positives, district_index, positives)
+            np.add.at(district_totals, district_index, totals)
+
+            rows: List[Dict[str, Any]] = []
+            stats = {"clinic_alerts": 0, "district_alerts": 0}
+            for scope, counts, subjects in (
+                (AlertScope.Clinic, (positives, totals), clinics),
+                (AlertScope.District, (district_positives, district_totals), [(None, district) for district in districts]),
+            ):
+                scope_positives, scope_totals = counts
+                for series, day, method, expected, score in self.detect(scope_positives, scope_totals, first_scored_index):
+                    clinic_id, district = subjects[series]
+                    positive_cases, total_tests = int(scope_positives[series, day]), int(scope_totals[series, day])
+                    rows.append({
+                        "scope": scope,
+                        "method": method,
+                        "day": start_day + timedelta(days=day),
+                        "district": district,
+                        "clinic_id": clinic_id,
+                        "positive_cases": positive_cases,
+                        "total_tests": total_tests,
+                        "positivity_rate": round(positive_cases / total_tests * 100, 2),
+                        "expected_rate": round(expected * 100, 2),
+                        "score": round(score, 2),
+                    })
+                    stats[f"{scope.value}_alerts"] += 1
+
+            replaced = db.execute(delete(OutbreakAlert).where(OutbreakAlert.day >= first_scored)).rowcount
+            if rows:
+                db.execute(insert(OutbreakAlert), rows)
+            if rows or replaced:
+                mark_stale(db)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        logging.info(
+            f"Anomaly detection complete: {stats['clinic_alerts']} clinic and {stats['district_alerts']} district alerts "
+            f"from {first_scored} to {end_day}"
+        )
+        return stats
+
+    def start(self) -> None:
+        """Start the background detector thread (runs immediately, then every interval)."""
+        if self.interval_seconds <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="anomaly-detector", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background detector thread."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                logging.error(f"Anomaly detection failed: {str(e)}")
+            if self._stop_event.wait(self.interval_seconds):
+                return
+
+
+# Singleton instance
+_anomaly_detector = None
+
+def get_anomaly_detector() -> AnomalyDetector:
+    """Get or create the singleton anomaly detector instance."""
+    global _anomaly_detector
+    if _anomaly_detector is None:
+        _anomaly_detector = AnomalyDetector(SessionLocal)
+    return _anomaly_detector
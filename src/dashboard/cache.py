@@ -0,0 +1,239 @@
+"""
+Dashboard response cache
+Short-lived cache of serialized dashboard responses, dropped whenever the data behind them changes.
+"""
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from src.entities.test_result import TestResult
+from src.entities.clinic import Clinic
+from src.entities.patient import Patient
+from src.entities.user import User
+from .rollups import ROLLUP_COLUMNS
+import logging
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# Entities the dashboard reports on; other writes never invalidate it
+DASHBOARD_ENTITIES = (TestResult, Clinic, Patient, User)
+
+@dataclass
+class CachedPayload:
+    """A serialized response and the ETag identifying its content."""
+    body: bytes
+    etag: str
+
+    def to_bytes(self) -> bytes:
+        return self.etag.encode() + b"\n" + self.body
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CachedPayload":
+        etag, body = data.split(b"\n", 1)
+        return cls(body=body, etag=etag.decode())
+
+
+class MemoryCacheBackend:
+    """
+    Per-process LRU cache. Each uvicorn worker has its own, so an invalidation only
+    reaches the worker that made the change; the others catch up within the TTL.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def generation(self) -> int:
+        return self._generation
+
+    def bump_generation(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl_seconds: int) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class RedisCacheBackend:
+    """
+    Cache shared by every worker through Redis. Invalidation increments a generation
+    counter that is part of every key, so stale entries are never read again and
+    simply expire.
+    """
+
+    GENERATION_KEY = "dashboard:generation"
+
+    def __init__(self, url: str):
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5)
+
+    def generation(self) -> int:
+        return int(self._client.get(self.GENERATION_KEY) or 0)
+
+    def bump_generation(self) -> None:
+        self._client.incr(self.GENERATION_KEY)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(key)
+
+    def set(self, key: str, value: bytes, ttl_seconds: int) -> None:
+        self._client.set(key, value, ex=ttl_seconds)
+
+
+class DashboardCache:
+    """
+    Caches dashboard responses by (endpoint, days, district) for a short TTL.
+
+    Entries are stored serialized together with an ETag over their content, so a
+    client holding the current ETag can be answered 304 without recomputing anything.
+    Any committed write to test results, clinics, patients or users invalidates
+    every entry.
+    """
+
+    def __init__(self, backend=None, ttl_seconds: int = None):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else int(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", "30"))
+        self.backend = backend or self._default_backend()
+
+    @staticmethod
+    def _default_backend():
+        url = os.getenv("DASHBOARD_CACHE_URL")
+        if url:
+            if redis is not None:
+                return RedisCacheBackend(url)
+            logging.warning("DASHBOARD_CACHE_URL is set but redis is not installed; using an in-process cache")
+        return MemoryCacheBackend(int(os.getenv("DASHBOARD_CACHE_MAX_ENTRIES", "256")))
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    def get_or_compute(
+        self,
+        endpoint: str,
+        days: Optional[int],
+        district: Optional[str],
+        compute: Callable[[], bytes],
+        etag_basis: Callable[[bytes], bytes] = None,
+    ) -> CachedPayload:
+        """
+        Return the cached response for the key, computing and storing it on a miss.
+
+        Args:
+            compute: Produces the serialized response body
+            etag_basis: Maps the body to the bytes the ETag is computed over, to leave
+                out fields that change without the data changing (default: the body)
+        """
+        key = None
+        if self.enabled:
+            try:
+                key = f"dashboard:{self.backend.generation()}:{endpoint}:{days}:{district or ''}"
+                data = self.backend.get(key)
+                if data is not None:
+                    return CachedPayload.from_bytes(data)
+            except Exception as e:
+                # The cache is an optimization; serve from the database if it is unreachable
+                logging.warning(f"Dashboard cache unavailable: {str(e)}")
+                key = None
+
+        body = compute()
+        digest = hashlib.sha256(etag_basis(body) if etag_basis else body).hexdigest()[:32]
+        payload = CachedPayload(body=body, etag=f'W/"{digest}"')
+        if key is not None:
+            try:
+                self.backend.set(key, payload.to_bytes(), self.ttl_seconds)
+            except Exception as e:
+                logging.warning(f"Dashboard cache unavailable: {str(e)}")
+        return payload
+
+    def invalidate(self) -> None:
+        """Drop every cached response and tell the invalidation listeners."""
+        try:
+            self.backend.bump_generation()
+        except Exception as e:
+            logging.warning(f"Dashboard cache invalidation failed: {str(e)}")
+        for listener in list(_invalidation_listeners):
+            listener()
+
+    def generation(self) -> Optional[int]:
+        """Current generation, which changes with every invalidation by any worker sharing the backend."""
+        try:
+            return self.backend.generation()
+        except Exception as e:
+            logging.warning(f"Dashboard cache unavailable: {str(e)}")
+            return None
+
+
+# Called after every invalidation in this process; listeners must return quickly
+_invalidation_listeners: List[Callable[[], None]] = []
+
+def add_invalidation_listener(listener: Callable[[], None]) -> None:
+    if listener not in _invalidation_listeners:
+        _invalidation_listeners.append(listener)
+
+def remove_invalidation_listener(listener: Callable[[], None]) -> None:
+    if listener in _invalidation_listeners:
+        _invalidation_listeners.remove(listener)
+
+
+def _changes_dashboard_data(obj) -> bool:
+    if isinstance(obj, TestResult):
+        # Sync bookkeeping and AI details do not show on the dashboard
+        attrs = inspect(obj).attrs
+        return any(attrs[column].history.has_changes() for column in ROLLUP_COLUMNS)
+    return isinstance(obj, DASHBOARD_ENTITIES)
+
+def mark_stale(session: Session) -> None:
+    """Invalidate the cache when session commits, for writes that bypass the ORM."""
+    session.info["dashboard_stale"] = True
+
+def _after_flush(session: Session, flush_context) -> None:
+    if session.info.get("dashboard_stale"):
+        return
+    if any(isinstance(obj, DASHBOARD_ENTITIES) for obj in (*session.new, *session.deleted)) or \
+            any(_changes_dashboard_data(obj) for obj in session.dirty):
+        mark_stale(session)
+
+def _after_commit(session: Session) -> None:
+    if session.info.pop("dashboard_stale", False):
+        get_dashboard_cache().invalidate()
+
+event.listen(Session, "after_flush", _after_flush)
+event.listen(Session, "after_commit", _after_commit)
+
+
+# Singleton instance
+_dashboard_cache = None
+
+def get_dashboard_cache() -> DashboardCache:
+    """Get or create the singleton dashboard cache instance."""
+    global _dashboard_cache
+    if _dashboard_cache is None:
+        _dashboard_cache = DashboardCache()
+    return _dashboard_cache
@@ -1,10 +1,19 @@
-from fastapi import APIRouter, Query
+import asyncio
+from fastapi import APIRouter, Query, Request, Response, WebSocket, status
+from fastapi.concurrency import run_in_threadpool
 from typing import Optional, List
+from uuid import UUID
 
 from ..database.core import DbSession
+from ..database.dates import Granularity
+from ..http_cache import REVALIDATE_CACHE_CONTROL, etag_matches, not_modified
 from . import models
 from . import service
-from ..auth.service import CurrentUser
+from .cache import CachedPayload
+from .live import Subscription, get_dashboard_publisher
+from ..entities.outbreak_alert import AlertScope
+from ..auth.service import CurrentUser, verify_token
+from ..exceptions import AuthenticationError, DashboardError
 
 router = APIRouter(
     prefix="/api/dashboard",
@@ -13,34 +22,178 @@ router = APIRouter(
 
 @router.get("/", response_model=models.DashboardResponse)
 def get_dashboard(
+    request: Request,
     db: DbSession,
     current_user: CurrentUser,
-    days: int = Query(30, description="Number of days for time series data"),
-    district: Optional[str] = Query(None, description="Filter by district")
+    days: int = Query(30, ge=1, le=service.MAX_RANGE_DAYS, description="Number of days for time series data"),
+    district: Optional[str] = Query(None, description="Filter by district"),
+    granularity: Granularity = Query(Granularity.Day, description="Time series bucket: day, week, epi_week or month")
 ):
     """
     Get comprehensive dashboard data for malaria surveillance.
     Includes summary statistics, district breakdowns, and time series data.
+    Responses are cached briefly and carry an ETag; If-None-Match is answered with 304
+    while the data is unchanged.
+    """
+    return _cached_response(request, service.get_cached_dashboard_data(current_user, db, days, district, granularity))
+
+
+@router.get("/time-series", response_model=List[models.TimeSeriesData])
+def get_time_series(
+    request: Request,
+    db: DbSession,
+    current_user: CurrentUser,
+    days: int = Query(30, ge=1, le=service.MAX_RANGE_DAYS, description="Number of days to cover"),
+    district: Optional[str] = Query(None, description="Filter by district"),
+    granularity: Granularity = Query(Granularity.Day, description="Bucket: day, week, epi_week or month")
+):
+    """
+    Get test counts per day, week, epidemiological week or month, with empty buckets
+    filled with zeros. Long ranges need a coarser granularity (see DASHBOARD_MAX_BUCKETS).
+    """
+    return _cached_response(request, service.get_cached_time_series(db, days, district, granularity))
+
+
+@router.get("/map", response_model=models.MapResponse)
+def get_map(
+    request: Request,
+    db: DbSession,
+    current_user: CurrentUser,
+    days: int = Query(30, ge=1, le=service.MAX_RANGE_DAYS, description="Number of days to aggregate"),
+    district: Optional[str] = Query(None, description="Filter by district"),
+    bbox: Optional[str] = Query(None, description="Only clinics inside min_lon,min_lat,max_lon,max_lat"),
+    cell_size: float = Query(0.5, ge=0.01, le=10, description="Grid cell size in degrees")
+):
+    """
+    Get test volume and positivity per clinic with coordinates, and aggregated onto a
+    grid, for rendering a map in one request.
+    """
+    return _cached_response(request, service.get_cached_map_data(db, days, district, service.parse_bbox(bbox), cell_size))
+
+
+@router.get("/alerts", response_model=List[models.OutbreakAlertResponse])
+def get_alerts(
+    request: Request,
+    db: DbSession,
+    current_user: CurrentUser,
+    days: int = Query(30, ge=1, le=service.MAX_RANGE_DAYS, description="Number of days to look back"),
+    district: Optional[str] = Query(None, description="Filter by district"),
+    scope: Optional[AlertScope] = Query(None, description="Only clinic or only district alerts")
+):
     """
-    return service.get_dashboard_data(current_user, db, days, district)
+    Get days on which a clinic's or district's positivity was anomalously high, as
+    flagged by the background anomaly detector.
+    """
+    return _cached_response(request, service.get_cached_alerts(db, days, district, scope))
+
+
+@router.get("/model-performance", response_model=List[models.ModelPerformance])
+def get_model_performance(
+    request: Request,
+    db: DbSession,
+    current_user: CurrentUser,
+    days: int = Query(90, ge=1, le=service.MAX_RANGE_DAYS, description="Number of days of confirmed results"),
+    district: Optional[str] = Query(None, description="Filter by district"),
+    clinic_id: Optional[UUID] = Query(None, description="Filter by clinic"),
+    model_version: Optional[str] = Query(None, description="Filter by model version"),
+    by_clinic: bool = Query(False, description="Break down per clinic"),
+    granularity: Optional[Granularity] = Query(None, description="Break down per day, week, epi_week or month")
+):
+    """
+    Get the AI model's accuracy against technician-confirmed results per model version:
+    confusion matrix, agreement, sensitivity, specificity and calibration by confidence.
+    """
+    return _cached_response(request, service.get_cached_model_performance(
+        db, days, district, clinic_id, model_version, by_clinic, granularity
+    ))
 
 
 @router.get("/districts", response_model=List[models.DistrictStats])
 def get_district_stats(
+    request: Request,
     db: DbSession,
     current_user: CurrentUser,
     district: Optional[str] = Query(None, description="Filter by specific district")
 ):
     """Get statistics grouped by district."""
-    return service.get_district_statistics(db, district)
+    return _cached_response(request, service.get_cached_district_statistics(db, district))
 
 
 @router.get("/clinics", response_model=List[models.ClinicStats])
 def get_clinic_stats(
+    request: Request,
     db: DbSession,
     current_user: CurrentUser,
     district: Optional[str] = Query(None, description="Filter by district")
 ):
     """Get statistics grouped by clinic."""
-    return service.get_clinic_statistics(db, district)
+    return _cached_response(request, service.get_cached_clinic_statistics(db, district))
+
+
+@router.websocket("/live")
+async def dashboard_live(
+    websocket: WebSocket,
+    token: Optional[str] = Query(None, description="Access token, for clients that cannot send an Authorization header"),
+    days: int = Query(30, ge=1, le=service.MAX_RANGE_DAYS, description="Number of days for time series data"),
+    district: Optional[str] = Query(None, description="Filter by district"),
+    granularity: Granularity = Query(Granularity.Day, description="Time series bucket: day, week, epi_week or month")
+):
+    """
+    Live dashboard over a WebSocket. Sends a `snapshot` message with the same data as
+    GET /api/dashboard, then a `delta` message (a JSON merge patch against the previous
+    version) whenever the data changes. Every client watching the same view shares one
+    computation per change.
+    """
+    authorization = websocket.headers.get("authorization", "")
+    try:
+        current_user = verify_token(token or authorization.removeprefix("Bearer "))
+    except AuthenticationError:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    publisher = get_dashboard_publisher()
+    try:
+        subscription, snapshot = await run_in_threadpool(
+            publisher.subscribe, current_user, asyncio.get_running_loop(), days, district, granularity
+        )
+    except DashboardError as e:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=e.detail)
+        return
+
+    try:
+        await websocket.send_text(snapshot)
+        await _forward_updates(websocket, subscription)
+    finally:
+        publisher.unsubscribe(subscription)
+
+
+async def _forward_updates(websocket: WebSocket, subscription: Subscription) -> None:
+    """Send the subscription's messages until the client disconnects or the subscription ends."""
+    async def send():
+        while (message := await subscription.get()) is not None:
+            await websocket.send_text(message)
+
+    async def receive():
+        # Clients send nothing; reading only notices them disconnecting
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    sender, receiver = asyncio.create_task(send()), asyncio.create_task(receive())
+    done, pending = await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+    for task in pending:
+        task.cancel()
+    if sender in done and sender.exception() is None:
+        # Ended by the server (shutdown, or the client fell too far behind): reconnect for a new snapshot
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+
+
+def _cached_response(request: Request, payload: CachedPayload) -> Response:
+    if etag_matches(request, payload.etag):
+        return not_modified(payload.etag, REVALIDATE_CACHE_CONTROL)
+    return Response(
+        payload.body,
+        media_type="application/json",
+        headers={"ETag": payload.etag, "Cache-Control": REVALIDATE_CACHE_CONTROL},
+    )
 
@@ -0,0 +1,274 @@
+"""
+Live dashboard updates
+Recomputes each watched dashboard once per change and pushes the difference to every connected client.
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+from sqlalchemy.orm import Session
+from src.auth.models import TokenData
+from src.database.core import SessionLocal
+from src.database.dates import Granularity
+from .cache import get_dashboard_cache, add_invalidation_listener, remove_invalidation_listener
+from . import service
+
+# Messages a client may fall behind by before it is disconnected to resynchronize
+LIVE_QUEUE_SIZE = 32
+
+ChannelKey = Tuple[int, Optional[str], Granularity]
+
+
+def merge_patch(old: Any, new: Any) -> Any:
+    """JSON merge patch (RFC 7386) that turns old into new. Lists are replaced whole."""
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return new
+    patch = {key: None for key in old if key not in new}
+    for key, value in new.items():
+        if key not in old:
+            patch[key] = value
+        elif old[key] != value:
+            patch[key] = merge_patch(old[key], value)
+    return patch
+
+
+def _without_last_updated(data: Dict[str, Any]) -> Dict[str, Any]:
+    # last_updated changes on every computation; alone it is not an update
+    return {**data, "summary": {k: v for k, v in data["summary"].items() if k != "last_updated"}}
+
+
+class Subscription:
+    """
+    Queue of serialized messages for one connected client. Filled from the publisher
+    thread, drained by the client's WebSocket handler on the event loop.
+    """
+
+    def __init__(self, key: ChannelKey, loop: asyncio.AbstractEventLoop):
+        self.key = key
+        self._loop = loop
+        self._queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue(maxsize=LIVE_QUEUE_SIZE)
+
+    def push(self, message: Optional[str]) -> None:
+        """Queue a message from any thread; None ends the subscription."""
+        try:
+            self._loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # The client's event loop has shut down
+            pass
+
+    def _put(self, message: Optional[str]) -> None:
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # The client missed too much to patch up; it gets a fresh snapshot on reconnect
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._queue.put_nowait(None)
+
+    async def get(self) -> Optional[str]:
+        """Next message, or None once the subscription has ended."""
+        return await self._queue.get()
+
+
+@dataclass
+class _Channel:
+    """Latest snapshot of one dashboard view and the clients watching it."""
+    requested_by: TokenData
+    data: Dict[str, Any]
+    version: int = 1
+    subscribers: Set[Subscription] = field(default_factory=set)
+
+
+class DashboardPublisher:
+    """
+    Keeps every dashboard view with a connected client up to date and pushes changes to
+    those clients, so N open dashboards cost one computation per change instead of N
+    polling requests.
+
+    Clients of the same view (days, district, granularity) share a channel. A write that
+    invalidates the dashboard cache wakes the publisher, which waits until writes have
+    been quiet for debounce_seconds (at most max_delay_seconds), recomputes each channel
+    once through the dashboard cache, and sends its subscribers a JSON merge patch from
+    the previous snapshot. Writes made by other workers are picked up by polling the
+    cache generation, which is shared when the cache is in Redis.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        debounce_seconds: float = None,
+        max_delay_seconds: float = None,
+        poll_seconds: float = None,
+    ):
+        self.session_factory = session_factory
+        self.debounce_seconds = debounce_seconds if debounce_seconds is not None else float(os.getenv("DASHBOARD_LIVE_DEBOUNCE_SECONDS", "1"))
+        self.max_delay_seconds = max_delay_seconds if max_delay_seconds is not None else float(os.getenv("DASHBOARD_LIVE_MAX_DELAY_SECONDS", "5"))
+        self.poll_seconds = poll_seconds if poll_seconds is not None else float(os.getenv("DASHBOARD_LIVE_POLL_SECONDS", "5"))
+        self._channels: Dict[ChannelKey, _Channel] = {}
+        self._lock = threading.Lock()
+        self._subscribe_lock = threading.Lock()
+        self._changed = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._last_generation = None
+
+    def _compute(self, key: ChannelKey, requested_by: TokenData) -> Dict[str, Any]:
+        days, district, granularity = key
+        db = self.session_factory()
+        try:
+            return json.loads(service.get_cached_dashboard_data(requested_by, db, days, district, granularity).body)
+        finally:
+            db.close()
+
+    def subscribe(
+        self,
+        current_user: TokenData,
+        loop: asyncio.AbstractEventLoop,
+        days: int = 30,
+        district: Optional[str] = None,
+        granularity: Granularity = Granularity.Day,
+    ) -> Tuple[Subscription, str]:
+        """
+        Register a client for a dashboard view.
+
+        Returns:
+            Tuple of (subscription, snapshot message to send before anything from the subscription)
+
+        Raises:
+            TimeSeriesTooLongError: If the view's time series would be too long
+        """
+        key = (days, district, granularity)
+        subscription = Subscription(key, loop)
+        # Clients connecting together to a view nobody watches yet wait for one computation
+        with self._subscribe_lock:
+            with self._lock:
+                channel = self._channels.get(key)
+            if channel is None:
+                data = self._compute(key, current_user)
+                with self._lock:
+                    channel = self._channels.setdefault(key, _Channel(requested_by=current_user, data=data))
+            with self._lock:
+                channel.subscribers.add(subscription)
+                self._channels.setdefault(key, channel)
+                snapshot = json.dumps({"type": "snapshot", "version": channel.version, "data": channel.data})
+        return subscription, snapshot
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Remove a client; a view without clients is no longer recomputed."""
+        with self._lock:
+            channel = self._channels.get(subscription.key)
+            if channel is None:
+                return
+            channel.subscribers.discard(subscription)
+            if not channel.subscribers:
+                del self._channels[subscription.key]
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(channel.subscribers) for channel in self._channels.values())
+
+    def notify(self) -> None:
+        """Signal that dashboard data changed (called on every cache invalidation)."""
+        self._changed.set()
+
+    def publish_once(self) -> int:
+        """
+        Recompute every watched view and send a delta to the subscribers of those that changed.
+
+        Returns:
+            Number of views that changed
+        """
+        with self._lock:
+            channels = list(self._channels.items())
+
+        changed = 0
+        for key, channel in channels:
+            try:
+                data = self._compute(key, channel.requested_by)
+            except Exception as e:
+                logging.error(f"Live dashboard update failed for {key}: {str(e)}")
+                continue
+            if _without_last_updated(data) == _without_last_updated(channel.data):
+                continue
+
+            with self._lock:
+                patch = merge_patch(channel.data, data)
+                channel.data = data
+                channel.version += 1
+                message = json.dumps({"type": "delta", "version": channel.version, "patch": patch})
+                subscribers = list(channel.subscribers)
+            for subscription in subscribers:
+                subscription.push(message)
+            changed += 1
+
+        if changed:
+            logging.info(f"Pushed live dashboard updates for {changed} view(s) to {self.subscriber_count()} client(s)")
+        return changed
+
+    def start(self) -> None:
+        """Start the background publisher thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        add_invalidation_listener(self.notify)
+        self._thread = threading.Thread(target=self._run, name="dashboard-publisher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background publisher thread and end every subscription."""
+        remove_invalidation_listener(self.notify)
+        self._stop_event.set()
+        self._changed.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        with self._lock:
+            subscriptions = [s for channel in self._channels.values() for s in channel.subscribers]
+            self._channels.clear()
+        for subscription in subscriptions:
+            subscription.push(None)
+
+    def _wait_for_quiet(self) -> None:
+        # Let a burst of writes (e.g. a sync batch) finish before recomputing
+        deadline = time.monotonic() + self.max_delay_seconds
+        while self.debounce_seconds > 0 and not self._stop_event.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._changed.wait(min(self.debounce_seconds, remaining)):
+                return
+            self._changed.clear()
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            notified = self._changed.wait(self.poll_seconds)
+            self._changed.clear()
+            if self._stop_event.is_set():
+                return
+            with self._lock:
+                watched = bool(self._channels)
+            generation = get_dashboard_cache().generation()
+            if not watched or (not notified and generation == self._last_generation):
+                self._last_generation = generation
+                continue
+
+            self._wait_for_quiet()
+            self._last_generation = get_dashboard_cache().generation()
+            try:
+                self.publish_once()
+            except Exception as e:
+                logging.error(f"Live dashboard update failed: {str(e)}")
+
+
+# Singleton instance
+_dashboard_publisher = None
+
+def get_dashboard_publisher() -> DashboardPublisher:
+    """Get or create the singleton dashboard publisher instance."""
+    global _dashboard_publisher
+    if _dashboard_publisher is None:
+        _dashboard_publisher = DashboardPublisher(SessionLocal)
+    return _dashboard_publisher
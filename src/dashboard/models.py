@@ -1,6 +1,7 @@
-from datetime import datetime
-from typing import List, Optional
+from datetime import date, datetime
+from typing import Dict, List, Optional
 from pydantic import BaseModel
+from src.entities.outbreak_alert import AlertScope, AlertMethod
 
 class DistrictStats(BaseModel):
     """Statistics for a specific district."""
@@ -11,6 +12,10 @@ class DistrictStats(BaseModel):
     inconclusive_cases: int
     positivity_rate: float
     clinics_count: int
+    tests_this_week: int
+    tests_last_week: int
+    tests_change: Optional[float] = None  # Percent change in tests from last week
+    positivity_change: Optional[float] = None  # Change in positivity rate, in percentage points
 
 class ClinicStats(BaseModel):
     """Statistics for a specific clinic."""
@@ -22,6 +27,10 @@ class ClinicStats(BaseModel):
     negative_cases: int
     inconclusive_cases: int
     positivity_rate: float
+    tests_this_week: int
+    tests_last_week: int
+    tests_change: Optional[float] = None  # Percent change in tests from last week
+    positivity_change: Optional[float] = None  # Change in positivity rate, in percentage points
 
 class TimeSeriesData(BaseModel):
     """Time series data point."""
@@ -49,3 +58,66 @@ class DashboardResponse(BaseModel):
     recent_tests: int
     time_series: List[TimeSeriesData]
 
+class ClinicLocationStats(BaseModel):
+    """Test volume and positivity of a clinic, with its coordinates."""
+    clinic_id: str
+    clinic_name: str
+    district: str
+    latitude: float
+    longitude: float
+    total_tests: int
+    positive_cases: int
+    positivity_rate: float
+
+class GridCellStats(BaseModel):
+    """Aggregate of the clinics in one grid cell, located at the cell's centre."""
+    latitude: float
+    longitude: float
+    clinics_count: int
+    total_tests: int
+    positive_cases: int
+    positivity_rate: float
+
+class MapResponse(BaseModel):
+    """Clinic positivity for a map view."""
+    days: int
+    cell_size: float
+    clinics: List[ClinicLocationStats]
+    cells: List[GridCellStats]
+
+class OutbreakAlertResponse(BaseModel):
+    """A clinic or district day with anomalously high positivity."""
+    id: str
+    scope: AlertScope
+    method: AlertMethod
+    day: date
+    district: str
+    clinic_id: Optional[str] = None
+    clinic_name: Optional[str] = None
+    positive_cases: int
+    total_tests: int
+    positivity_rate: float
+    expected_rate: float
+    score: float
+
+class CalibrationBin(BaseModel):
+    """Confirmed results whose AI confidence fell in [lower, upper)."""
+    lower: float
+    upper: float
+    tests: int
+    mean_confidence: float
+    accuracy: float  # Share of these predictions the technician confirmed (0-1)
+
+class ModelPerformance(BaseModel):
+    """How a model's predictions compare with technicians' confirmed results."""
+    model_version: str
+    clinic_id: Optional[str] = None
+    clinic_name: Optional[str] = None
+    period: Optional[date] = None
+    confirmed_tests: int
+    agreement_rate: float
+    sensitivity: Optional[float] = None  # None without confirmed positives
+    specificity: Optional[float] = None  # None without confirmed negatives
+    confusion_matrix: Dict[str, Dict[str, int]]  # AI prediction -> confirmed result -> tests
+    calibration: List[CalibrationBin]
+    expected_calibration_error: Optional[float] = None
@@ -0,0 +1,227 @@
+"""
+Daily surveillance rollups
+Keeps daily_clinic_stats and daily_model_stats in step with test_results, so dashboards aggregate
+days x clinics instead of tests. Days are calendar days in each clinic's timezone.
+"""
+
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, List, Set, Tuple
+from uuid import UUID
+from sqlalchemy import Integer, case, cast, delete, event, func, insert, inspect, literal, select, tuple_, and_
+from sqlalchemy.orm import Session
+from src.database.dates import dialect_name, local_date
+from src.entities.test_result import TestResult, TestStatus
+from src.entities.clinic import Clinic
+from src.entities.daily_clinic_stats import DailyClinicStats
+from src.entities.daily_model_stats import DailyModelStats, UNKNOWN_MODEL_VERSION, NO_CONFIDENCE_BIN
+import logging
+
+RollupKey = Tuple[date, UUID]
+
+# Changing any other column of a result does not move it between rollup rows
+ROLLUP_COLUMNS = ("test_date", "clinic_id", "result", "is_confirmed", "ai_result", "model_version", "confidence_score")
+
+# Confidence bins of the model calibration curves
+CALIBRATION_BINS = 10
+
+# Keys per DELETE/INSERT statement, well under bind parameter limits
+REFRESH_CHUNK_SIZE = 400
+
+def _local_day(dialect: str):
+    # Results of a clinic missing from clinics still count, on their UTC day
+    return local_date(dialect, TestResult.test_date, func.coalesce(Clinic.timezone, "UTC"))
+
+def _aggregate(dialect: str, *criteria):
+    """SELECT producing daily_clinic_stats rows from test_results."""
+    day = _local_day(dialect)
+
+    def count_where(*conditions):
+        return func.sum(case((and_(*conditions), 1), else_=0))
+
+    return select(
+        day,
+        TestResult.clinic_id,
+        func.count(TestResult.id),
+        count_where(TestResult.result == TestStatus.Positive),
+        count_where(TestResult.result == TestStatus.Negative),
+        count_where(TestResult.result == TestStatus.Inconclusive),
+        count_where(TestResult.is_confirmed),
+        count_where(TestResult.is_confirmed, TestResult.result == TestStatus.Positive),
+        count_where(TestResult.is_confirmed, TestResult.result == TestStatus.Negative),
+        count_where(TestResult.is_confirmed, TestResult.result == TestStatus.Inconclusive),
+    ).select_from(TestResult).outerjoin(Clinic, Clinic.id == TestResult.clinic_id).where(*criteria).group_by(day, TestResult.clinic_id)
+
+_STATS_COLUMNS = [
+    "day", "clinic_id", "total_tests", "positive_cases", "negative_cases", "inconclusive_cases",
+    "confirmed_tests", "confirmed_positive", "confirmed_negative", "confirmed_inconclusive",
+]
+
+def _confidence_bin(dialect: str):
+    confidence = TestResult.confidence_score
+    # PostgreSQL rounds when casting to integer; SQLite truncates
+    scaled = func.floor(confidence * CALIBRATION_BINS) if dialect == "postgresql" else confidence * CALIBRATION_BINS
+    return case(
+        (confidence.is_(None), NO_CONFIDENCE_BIN),
+        (confidence >= 1, CALIBRATION_BINS - 1),
+        else_=cast(scaled, Integer),
+    )
+
+def _model_aggregate(dialect: str, *criteria):
+    """SELECT producing daily_model_stats rows from the confirmed results with an AI prediction."""
+    day = _local_day(dialect)
+    model_version = func.coalesce(TestResult.model_version, UNKNOWN_MODEL_VERSION)
+    confidence_bin = _confidence_bin(dialect)
+    return select(
+        day,
+        TestResult.clinic_id,
+        model_version,
+        TestResult.ai_result,
+        TestResult.result,
+        confidence_bin,
+        func.count(TestResult.id),
+        func.coalesce(func.sum(TestResult.confidence_score), 0.0),
+    ).select_from(TestResult).outerjoin(Clinic, Clinic.id == TestResult.clinic_id).where(
+        TestResult.is_confirmed, TestResult.ai_result.is_not(None), *criteria
+    ).group_by(day, TestResult.clinic_id, model_version, TestResult.ai_result, TestResult.result, confidence_bin)
+
+_MODEL_STATS_COLUMNS = ["day", "clinic_id", "model_version", "ai_result", "confirmed_result", "confidence_bin", "tests", "confidence_sum"]
+
+_ROLLUPS = (
+    (DailyClinicStats.__table__, _STATS_COLUMNS, _aggregate),
+    (DailyModelStats.__table__, _MODEL_STATS_COLUMNS, _model_aggregate),
+)
+
+def rollup_keys(db, result_ids: List[UUID]) -> Set[RollupKey]:
+    """
+    The (local day, clinic) rollup rows the given results currently count towards.
+    Works on a Session or Connection.
+    """
+    day = _local_day(dialect_name(db))
+    keys = set()
+    for start in range(0, len(result_ids), REFRESH_CHUNK_SIZE):
+        rows = db.execute(
+            select(day, TestResult.clinic_id)
+            .outerjoin(Clinic, Clinic.id == TestResult.clinic_id)
+            .where(TestResult.id.in_(result_ids[start:start + REFRESH_CHUNK_SIZE]))
+        )
+        keys.update((row[0], row[1]) for row in rows)
+    return keys
+
+def refresh_daily_stats(db, keys: Iterable[RollupKey]) -> None:
+    """
+    Recompute the given (day, clinic) rollup rows from test_results.
+
+    Each row is replaced by a GROUP BY over that clinic's tests on that day, so the
+    result is exact however the tests changed. Works on a Session or Connection
+    and does not commit.
+    """
+    keys = sorted(set(keys), key=lambda key: (key[0], str(key[1])))
+    dialect = dialect_name(db)
+    day = _local_day(dialect)
+    for start in range(0, len(keys), REFRESH_CHUNK_SIZE):
+        chunk = keys[start:start + REFRESH_CHUNK_SIZE]
+        # Local days lie within a day of the UTC day; bound test_date so indexes can be used
+        earliest = datetime.combine(min(key[0] for key in chunk) - timedelta(days=1), time.min)
+        latest = datetime.combine(max(key[0] for key in chunk) + timedelta(days=2), time.min)
+        for table, columns, aggregate in _ROLLUPS:
+            db.execute(delete(table).where(tuple_(table.c.day, table.c.clinic_id).in_(chunk)))
+            db.execute(insert(table).from_select(columns, aggregate(
+                dialect,
+                TestResult.clinic_id.in_({key[1] for key in chunk}),
+                TestResult.test_date >= earliest,
+                TestResult.test_date < latest,
+                tuple_(day, TestResult.clinic_id).in_(chunk),
+            )))
+
+def refresh_clinic_stats(db, clinic_ids: Iterable[UUID]) -> None:
+    """Recompute every rollup row of the given clinics, e.g. after a timezone change."""
+    clinic_ids = list(clinic_ids)
+    for table, columns, aggregate in _ROLLUPS:
+        db.execute(delete(table).where(table.c.clinic_id.in_(clinic_ids)))
+        db.execute(insert(table).from_select(
+            columns, aggregate(dialect_name(db), TestResult.clinic_id.in_(clinic_ids))
+        ))
+
+def clinics_changing_timezone(db, rows: Iterable[dict]) -> List[UUID]:
+    """
+    Clinics whose rollups a bulk write of the given clinic rows will invalidate: those
+    changing timezone, and new ones outside UTC (their tests were counted on UTC days).
+    Call before the write and pass the result to refresh_clinic_stats after it.
+    """
+    timezones = {row["id"]: row["timezone"] for row in rows if "timezone" in row}
+    if not timezones:
+        return []
+    stored = dict(db.execute(select(Clinic.id, Clinic.timezone).where(Clinic.id.in_(list(timezones)))).all())
+    return [clinic_id for clinic_id, tz in timezones.items() if stored.get(clinic_id, "UTC") != tz]
+
+def rebuild_daily_stats(db: Session) -> int:
+    """
+    Recompute every rollup row from scratch and commit.
+
+    Returns:
+        Number of (day, clinic) rows written
+    """
+    for table, columns, aggregate in _ROLLUPS:
+        db.execute(delete(table))
+        db.execute(insert(table).from_select(columns, aggregate(dialect_name(db))))
+    db.commit()
+    rows = db.query(DailyClinicStats).count()
+    logging.info(f"Rebuilt daily clinic stats: {rows} rows")
+    return rows
+
+def backfill_rollups(db: Session) -> List[str]:
+    """
+    Fill rollup tables that are empty although test_results has rows for them, e.g. ones
+    create_all just added to an existing database. Cheap when there is nothing to do; run at startup.
+
+    Returns:
+        Names of the tables filled
+    """
+    dialect = dialect_name(db)
+    filled = []
+    for table, columns, aggregate in _ROLLUPS:
+        source = aggregate(dialect)
+        if db.execute(select(literal(1)).select_from(table).limit(1)).first() is not None:
+            continue
+        # Cheap probe: does the aggregate have any input rows at all?
+        if db.execute(source.with_only_columns(literal(1)).group_by(None).limit(1)).first() is None:
+            continue
+        db.execute(insert(table).from_select(columns, source))
+        filled.append(table.name)
+    db.commit()
+    if filled:
+        logging.info(f"Backfilled empty rollup tables: {', '.join(filled)}")
+    return filled
+
+def _changes_rollup(obj: TestResult) -> bool:
+    attrs = inspect(obj).attrs
+    return any(attrs[column].history.has_changes() for column in ROLLUP_COLUMNS)
+
+def _before_flush(session: Session, flush_context, instances) -> None:
+    # Rows that results being changed or deleted are counted in now, read before the flush
+    # changes them (the old values are not necessarily loaded on the objects)
+    result_ids = [obj.id for obj in session.deleted if isinstance(obj, TestResult)]
+    result_ids.extend(obj.id for obj in session.dirty if isinstance(obj, TestResult) and _changes_rollup(obj))
+    if result_ids:
+        session.info.setdefault("rollup_keys", set()).update(rollup_keys(session.connection(), result_ids))
+
+def _after_flush(session: Session, flush_context) -> None:
+    keys = session.info.pop("rollup_keys", set())
+    result_ids = [obj.id for obj in session.new if isinstance(obj, TestResult)]
+    result_ids.extend(obj.id for obj in session.dirty if isinstance(obj, TestResult) and _changes_rollup(obj))
+    connection = session.connection()
+    if result_ids:
+        keys.update(rollup_keys(connection, result_ids))
+    if keys:
+        refresh_daily_stats(connection, keys)
+
+    # A new timezone moves a clinic's tests between days
+    moved = [
+        obj.id for obj in session.dirty
+        if isinstance(obj, Clinic) and inspect(obj).attrs.timezone.history.has_changes()
+    ]
+    if moved:
+        refresh_clinic_stats(connection, moved)
+
+event.listen(Session, "before_flush", _before_flush)
+event.listen(Session, "after_flush", _after_flush)
@@ -1,20 +1,45 @@
-from datetime import datetime, timedelta, timezone
+import os
+import json
+import math
+import numpy as np
+from datetime import date, datetime, timedelta, timezone
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
-from sqlalchemy import func, case
-from typing import List, Optional
+from sqlalchemy import Float, Numeric, String, cast, func, literal, null, select, union_all
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
 from . import models
-from src.entities.test_result import TestResult, TestStatus
+from .cache import CachedPayload, get_dashboard_cache
+from src.database.dates import Granularity, bucket_start, bucket_start_sql, calendar, count_buckets, dialect_name, to_local_date
+from src.entities.daily_clinic_stats import DailyClinicStats
+from src.entities.daily_model_stats import DailyModelStats
+from src.entities.test_result import TestStatus
+from src.entities.outbreak_alert import OutbreakAlert, AlertScope
 from src.entities.patient import Patient
 from src.entities.clinic import Clinic
 from src.entities.user import User, UserRole
 from src.auth.models import TokenData
+from src.exceptions import TimeSeriesTooLongError, InvalidBoundingBoxError
+from . import rollups  # registers the flush listener that maintains daily_clinic_stats
+from .rollups import CALIBRATION_BINS
 import logging
 
+# Longest time series returned, in buckets
+MAX_TIME_SERIES_BUCKETS = int(os.getenv("DASHBOARD_MAX_BUCKETS", "400"))
+
+# Longest date range accepted, in days (ten years); far larger ones overflow date arithmetic
+MAX_RANGE_DAYS = 3660
+
+def dashboard_today() -> date:
+    """Today's date in DASHBOARD_TIMEZONE, which anchors the dashboard's date ranges."""
+    return to_local_date(datetime.now(timezone.utc), os.getenv("DASHBOARD_TIMEZONE", "UTC"))
+
 def get_dashboard_data(
     current_user: TokenData,
     db: Session,
     days: int = 30,
-    district: Optional[str] = None
+    district: Optional[str] = None,
+    granularity: Granularity = Granularity.Day
 ) -> models.DashboardResponse:
     """
     Get comprehensive dashboard data for malaria surveillance.
@@ -24,158 +49,557 @@ def get_dashboard_data(
         db: Database session
         days: Number of days to include in time series (default 30)
         district: Optional district filter
+        granularity: Bucket size of the time series
+
+    Raises:
+        TimeSeriesTooLongError: If the time series would exceed MAX_TIME_SERIES_BUCKETS
     """
-    # Calculate date range
-    end_date = datetime.now(timezone.utc)
-    start_date = end_date - timedelta(days=days)
-    
-    # Base query
-    base_query = db.query(TestResult)
+    recent_date = dashboard_today() - timedelta(days=7)
+
+    # Summary: every count in one pass over the daily rollups
+    summary_query = db.query(
+        func.coalesce(func.sum(DailyClinicStats.total_tests), 0).label('total_tests'),
+        func.coalesce(func.sum(DailyClinicStats.positive_cases), 0).label('positive_cases'),
+        func.coalesce(func.sum(DailyClinicStats.negative_cases), 0).label('negative_cases'),
+        func.coalesce(func.sum(DailyClinicStats.inconclusive_cases), 0).label('inconclusive_cases'),
+        func.coalesce(func.sum(DailyClinicStats.total_tests).filter(DailyClinicStats.day >= recent_date), 0).label('recent_tests'),
+        func.coalesce(_rate(func.sum(DailyClinicStats.positive_cases), func.sum(DailyClinicStats.total_tests)), 0.0).label('positivity_rate'),
+    )
     if district:
-        base_query = base_query.join(Clinic).filter(Clinic.district == district)
-    
-    # Get summary statistics
-    total_tests = base_query.count()
-    
-    positive_count = base_query.filter(TestResult.result == TestStatus.Positive).count()
-    negative_count = base_query.filter(TestResult.result == TestStatus.Negative).count()
-    inconclusive_count = base_query.filter(TestResult.result == TestStatus.Inconclusive).count()
-    
-    overall_positivity_rate = (positive_count / total_tests * 100) if total_tests > 0 else 0.0
-    
-    # Get counts
-    total_patients = db.query(Patient).count()
-    total_clinics = db.query(Clinic).count()
-    total_health_workers = db.query(User).filter(User.role == UserRole.HealthWorker).count()
-    
+        summary_query = summary_query.join(Clinic, Clinic.id == DailyClinicStats.clinic_id).filter(Clinic.district == district)
+    totals = summary_query.one()
+
+    # Entity counts as scalar subqueries of a single SELECT
+    counts = db.query(
+        select(func.count()).select_from(Patient).scalar_subquery().label('patients'),
+        select(func.count()).select_from(Clinic).scalar_subquery().label('clinics'),
+        select(func.count()).select_from(User).where(User.role == UserRole.HealthWorker).scalar_subquery().label('health_workers'),
+    ).one()
+
     summary = models.DashboardSummary(
-        total_tests=total_tests,
-        total_positive=positive_count,
-        total_negative=negative_count,
-        total_inconclusive=inconclusive_count,
-        overall_positivity_rate=round(overall_positivity_rate, 2),
-        total_patients=total_patients,
-        total_clinics=total_clinics,
-        total_health_workers=total_health_workers,
+        total_tests=totals.total_tests,
+        total_positive=totals.positive_cases,
+        total_negative=totals.negative_cases,
+        total_inconclusive=totals.inconclusive_cases,
+        overall_positivity_rate=totals.positivity_rate,
+        total_patients=counts.patients,
+        total_clinics=counts.clinics,
+        total_health_workers=counts.health_workers,
         last_updated=datetime.now(timezone.utc)
     )
     
     # Get district statistics
     district_stats = get_district_statistics(db, district)
     
-    # Get recent tests count (last 7 days)
-    recent_date = end_date - timedelta(days=7)
-    recent_tests = base_query.filter(TestResult.test_date >= recent_date).count()
-    
     # Get time series data
-    time_series = get_time_series_data(db, days, district)
+    time_series = get_time_series_data(db, days, district, granularity)
     
     logging.info(f"Generated dashboard data for user {current_user.get_uuid()}")
     
     return models.DashboardResponse(
         summary=summary,
         district_stats=district_stats,
-        recent_tests=recent_tests,
+        recent_tests=totals.recent_tests,
         time_series=time_series
     )
 
 
-def get_district_statistics(db: Session, district_filter: Optional[str] = None) -> List[models.DistrictStats]:
-    """Get statistics grouped by district."""
-    query = db.query(
+def _rate(numerator, denominator):
+    """SQL percentage rounded to 2 places, NULL when the denominator is 0."""
+    return func.round(cast(numerator * 100.0 / func.nullif(denominator, 0), Numeric), 2, type_=Float)
+
+
+def get_statistics(db: Session, district: Optional[str] = None) -> Tuple[List[models.DistrictStats], List[models.ClinicStats]]:
+    """
+    Get statistics per district and per clinic, with week-over-week changes, in one query.
+
+    Per-clinic totals over the rollups (outer-joined, so clinics without tests are
+    included with zeros) form a CTE; district rows are aggregated from it and appended
+    with UNION ALL, the portable equivalent of GROUPING SETS ((district, clinic), (district)).
+    Rates and changes are computed in SQL. "This week" is the last 7 days including
+    today and "last week" the 7 days before; changes are NULL when last week had no tests.
+
+    Returns:
+        Tuple of (district statistics by district, clinic statistics by district and name)
+    """
+    this_week = dashboard_today() - timedelta(days=6)
+    last_week = this_week - timedelta(days=7)
+
+    def total(column, *criteria):
+        summed = func.sum(column).filter(*criteria) if criteria else func.sum(column)
+        return func.coalesce(summed, 0)
+
+    clinic_totals = select(
         Clinic.district,
-        func.count(TestResult.id).label('total_tests'),
-        func.sum(case((TestResult.result == TestStatus.Positive, 1), else_=0)).label('positive_cases'),
-        func.sum(case((TestResult.result == TestStatus.Negative, 1), else_=0)).label('negative_cases'),
-        func.sum(case((TestResult.result == TestStatus.Inconclusive, 1), else_=0)).label('inconclusive_cases'),
-        func.count(func.distinct(Clinic.id)).label('clinics_count')
-    ).join(TestResult, Clinic.id == TestResult.clinic_id).group_by(Clinic.district)
-    
-    if district_filter:
-        query = query.filter(Clinic.district == district_filter)
-    
-    results = query.all()
-    
-    district_stats = []
+        Clinic.id.label('clinic_id'),
+        Clinic.name.label('clinic_name'),
+        total(DailyClinicStats.total_tests).label('total_tests'),
+        total(DailyClinicStats.positive_cases).label('positive_cases'),
+        total(DailyClinicStats.negative_cases).label('negative_cases'),
+        total(DailyClinicStats.inconclusive_cases).label('inconclusive_cases'),
+        total(DailyClinicStats.total_tests, DailyClinicStats.day >= this_week).label('tests_this_week'),
+        total(DailyClinicStats.positive_cases, DailyClinicStats.day >= this_week).label('positive_this_week'),
+        total(DailyClinicStats.total_tests, DailyClinicStats.day >= last_week, DailyClinicStats.day < this_week).label('tests_last_week'),
+        total(DailyClinicStats.positive_cases, DailyClinicStats.day >= last_week, DailyClinicStats.day < this_week).label('positive_last_week'),
+    ).outerjoin(DailyClinicStats, DailyClinicStats.clinic_id == Clinic.id).group_by(Clinic.district, Clinic.id, Clinic.name)
+    if district:
+        clinic_totals = clinic_totals.where(Clinic.district == district)
+    clinic_totals = clinic_totals.cte('clinic_totals')
+
+    counts = [column for column in clinic_totals.c if column.name not in ('district', 'clinic_id', 'clinic_name')]
+    levels = union_all(
+        select(
+            clinic_totals.c.district, clinic_totals.c.clinic_id, clinic_totals.c.clinic_name,
+            *counts, literal(1).label('clinics_count'),
+        ),
+        select(
+            clinic_totals.c.district, cast(null(), clinic_totals.c.clinic_id.type), cast(null(), String),
+            *(func.sum(column).label(column.name) for column in counts), func.count().label('clinics_count'),
+        ).group_by(clinic_totals.c.district),
+    ).subquery('levels')
+
+    c = levels.c
+    rows = db.execute(select(
+        c.district,
+        c.clinic_id,
+        c.clinic_name,
+        c.total_tests,
+        c.positive_cases,
+        c.negative_cases,
+        c.inconclusive_cases,
+        c.clinics_count,
+        func.coalesce(_rate(c.positive_cases, c.total_tests), 0.0).label('positivity_rate'),
+        c.tests_this_week,
+        c.tests_last_week,
+        _rate(c.tests_this_week - c.tests_last_week, c.tests_last_week).label('tests_change'),
+        func.round(cast(
+            c.positive_this_week * 100.0 / func.nullif(c.tests_this_week, 0)
+            - c.positive_last_week * 100.0 / func.nullif(c.tests_last_week, 0), Numeric
+        ), 2, type_=Float).label('positivity_change'),
+    ).order_by(c.district, c.clinic_name)).all()
+
+    district_stats, clinic_stats = [], []
+    for row in rows:
+        fields = row._asdict()
+        if row.clinic_id is None:
+            district_stats.append(models.DistrictStats(**fields))
+        else:
+            clinic_stats.append(models.ClinicStats(**{**fields, 'clinic_id': str(row.clinic_id)}))
+    return district_stats, clinic_stats
+
+
+def get_district_statistics(db: Session, district_filter: Optional[str] = None) -> List[models.DistrictStats]:
+    """Get statistics grouped by district (see get_statistics)."""
+    return get_statistics(db, district_filter)[0]
+
+
+def get_clinic_statistics(db: Session, district: Optional[str] = None) -> List[models.ClinicStats]:
+    """Get statistics grouped by clinic (see get_statistics)."""
+    return get_statistics(db, district)[1]
+
+
+def get_time_series_data(
+    db: Session,
+    days: int = 30,
+    district: Optional[str] = None,
+    granularity: Granularity = Granularity.Day
+) -> List[models.TimeSeriesData]:
+    """
+    Get a gap-filled time series covering the last `days` days, one point per bucket.
+
+    Bucketing and zero-filling happen in the database: a recursive CTE generates the
+    calendar of bucket starts and the rollups are outer-joined onto it. Points are labelled
+    with the bucket's first day; the first bucket is whole, so it may start before the range.
+
+    Raises:
+        TimeSeriesTooLongError: If the series would exceed MAX_TIME_SERIES_BUCKETS
+    """
+    end_day = dashboard_today()
+    start_day = end_day - timedelta(days=days)
+    buckets = count_buckets(start_day, end_day, granularity)
+    if buckets > MAX_TIME_SERIES_BUCKETS:
+        raise TimeSeriesTooLongError(buckets, MAX_TIME_SERIES_BUCKETS)
+
+    dialect = dialect_name(db)
+    first, last = bucket_start(start_day, granularity), bucket_start(end_day, granularity)
+    buckets_cte = calendar(dialect, first, last, granularity)
+    bucket = bucket_start_sql(dialect, DailyClinicStats.day, granularity)
+
+    totals = select(
+        bucket.label('bucket'),
+        func.sum(DailyClinicStats.positive_cases).label('positive_cases'),
+        func.sum(DailyClinicStats.negative_cases).label('negative_cases'),
+        func.sum(DailyClinicStats.total_tests).label('total_tests')
+    ).where(DailyClinicStats.day >= first, DailyClinicStats.day <= end_day)
+    if district:
+        totals = totals.join(Clinic, Clinic.id == DailyClinicStats.clinic_id).where(Clinic.district == district)
+    totals = totals.group_by(bucket).subquery('totals')
+
+    results = db.execute(
+        select(
+            buckets_cte.c.bucket,
+            func.coalesce(totals.c.positive_cases, 0).label('positive_cases'),
+            func.coalesce(totals.c.negative_cases, 0).label('negative_cases'),
+            func.coalesce(totals.c.total_tests, 0).label('total_tests'),
+        ).outerjoin(totals, totals.c.bucket == buckets_cte.c.bucket).order_by(buckets_cte.c.bucket)
+    )
+
+    time_series = []
     for row in results:
-        positivity_rate = (row.positive_cases / row.total_tests * 100) if row.total_tests > 0 else 0.0
-        district_stats.append(models.DistrictStats(
-            district=row.district,
-            total_tests=row.total_tests,
+        time_series.append(models.TimeSeriesData(
+            date=row.bucket.isoformat(),
             positive_cases=row.positive_cases,
             negative_cases=row.negative_cases,
-            inconclusive_cases=row.inconclusive_cases,
-            positivity_rate=round(positivity_rate, 2),
-            clinics_count=row.clinics_count
+            total_tests=row.total_tests
         ))
-    
-    return district_stats
 
+    return time_series
 
-def get_clinic_statistics(db: Session, district: Optional[str] = None) -> List[models.ClinicStats]:
-    """Get statistics grouped by clinic."""
-    query = db.query(
+
+# (min_lon, min_lat, max_lon, max_lat), the GeoJSON order
+BoundingBox = Tuple[float, float, float, float]
+
+def parse_bbox(bbox: Optional[str]) -> Optional[BoundingBox]:
+    """
+    Parse a "min_lon,min_lat,max_lon,max_lat" bounding box.
+
+    Raises:
+        InvalidBoundingBoxError: If it is malformed or out of range
+    """
+    if bbox is None:
+        return None
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(value) for value in bbox.split(","))
+    except ValueError:
+        raise InvalidBoundingBoxError(bbox)
+    if not (-180 <= min_lon <= max_lon <= 180 and -90 <= min_lat <= max_lat <= 90):
+        raise InvalidBoundingBoxError(bbox)
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def _positivity(positive_cases: int, total_tests: int) -> float:
+    return round(positive_cases / total_tests * 100, 2) if total_tests > 0 else 0.0
+
+
+def get_map_data(
+    db: Session,
+    days: int = 30,
+    district: Optional[str] = None,
+    bbox: Optional[BoundingBox] = None,
+    cell_size: float = 0.5
+) -> models.MapResponse:
+    """
+    Get test volume and positivity over the last `days` days for every clinic with
+    coordinates, plus the same aggregated onto a grid of cell_size-degree cells.
+
+    One query over the daily rollups; clinics without tests in the window are included
+    with zero counts. The grid is binned from the clinic rows, so it costs nothing extra.
+    """
+    start_day = dashboard_today() - timedelta(days=days)
+    totals = select(
+        DailyClinicStats.clinic_id,
+        func.sum(DailyClinicStats.total_tests).label('total_tests'),
+        func.sum(DailyClinicStats.positive_cases).label('positive_cases'),
+    ).where(DailyClinicStats.day >= start_day).group_by(DailyClinicStats.clinic_id).subquery('totals')
+
+    query = select(
         Clinic.id,
         Clinic.name,
         Clinic.district,
-        func.count(TestResult.id).label('total_tests'),
-        func.sum(case((TestResult.result == TestStatus.Positive, 1), else_=0)).label('positive_cases'),
-        func.sum(case((TestResult.result == TestStatus.Negative, 1), else_=0)).label('negative_cases'),
-        func.sum(case((TestResult.result == TestStatus.Inconclusive, 1), else_=0)).label('inconclusive_cases'),
-    ).join(TestResult, Clinic.id == TestResult.clinic_id).group_by(Clinic.id, Clinic.name, Clinic.district)
-    
+        Clinic.latitude,
+        Clinic.longitude,
+        func.coalesce(totals.c.total_tests, 0).label('total_tests'),
+        func.coalesce(totals.c.positive_cases, 0).label('positive_cases'),
+    ).outerjoin(totals, totals.c.clinic_id == Clinic.id).where(
+        Clinic.latitude.is_not(None), Clinic.longitude.is_not(None)
+    )
     if district:
-        query = query.filter(Clinic.district == district)
-    
-    results = query.all()
-    
-    clinic_stats = []
-    for row in results:
-        positivity_rate = (row.positive_cases / row.total_tests * 100) if row.total_tests > 0 else 0.0
-        clinic_stats.append(models.ClinicStats(
+        query = query.where(Clinic.district == district)
+    if bbox:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        query = query.where(Clinic.longitude.between(min_lon, max_lon), Clinic.latitude.between(min_lat, max_lat))
+
+    clinics = []
+    cells: Dict[Tuple[int, int], List[int]] = {}
+    for row in db.execute(query.order_by(Clinic.name)):
+        clinics.append(models.ClinicLocationStats(
             clinic_id=str(row.id),
             clinic_name=row.name,
             district=row.district,
+            latitude=row.latitude,
+            longitude=row.longitude,
             total_tests=row.total_tests,
             positive_cases=row.positive_cases,
-            negative_cases=row.negative_cases,
-            inconclusive_cases=row.inconclusive_cases,
-            positivity_rate=round(positivity_rate, 2)
+            positivity_rate=_positivity(row.positive_cases, row.total_tests)
         ))
-    
-    return clinic_stats
+        cell = cells.setdefault((math.floor(row.latitude / cell_size), math.floor(row.longitude / cell_size)), [0, 0, 0])
+        cell[0] += 1
+        cell[1] += row.total_tests
+        cell[2] += row.positive_cases
 
+    return models.MapResponse(
+        days=days,
+        cell_size=cell_size,
+        clinics=clinics,
+        cells=[
+            models.GridCellStats(
+                latitude=round((lat_index + 0.5) * cell_size, 6),
+                longitude=round((lon_index + 0.5) * cell_size, 6),
+                clinics_count=clinics_count,
+                total_tests=total_tests,
+                positive_cases=positive_cases,
+                positivity_rate=_positivity(positive_cases, total_tests)
+            )
+            for (lat_index, lon_index), (clinics_count, total_tests, positive_cases) in sorted(cells.items())
+        ]
+    )
 
-def get_time_series_data(db: Session, days: int = 30, district: Optional[str] = None) -> List[models.TimeSeriesData]:
-    """Get time series data for the specified number of days."""
-    end_date = datetime.now(timezone.utc)
-    start_date = end_date - timedelta(days=days)
-    
-    # Query for daily aggregates
-    query = db.query(
-        func.date(TestResult.test_date).label('date'),
-        func.sum(case((TestResult.result == TestStatus.Positive, 1), else_=0)).label('positive_cases'),
-        func.sum(case((TestResult.result == TestStatus.Negative, 1), else_=0)).label('negative_cases'),
-        func.count(TestResult.id).label('total_tests')
-    ).filter(TestResult.test_date >= start_date)
-    
+
+def get_alerts(
+    db: Session,
+    days: int = 30,
+    district: Optional[str] = None,
+    scope: Optional[AlertScope] = None
+) -> List[models.OutbreakAlertResponse]:
+    """Get outbreak alerts of the last `days` days, most recent and strongest first."""
+    query = db.query(OutbreakAlert, Clinic.name).outerjoin(Clinic, Clinic.id == OutbreakAlert.clinic_id).filter(
+        OutbreakAlert.day >= dashboard_today() - timedelta(days=days)
+    )
     if district:
-        query = query.join(Clinic).filter(Clinic.district == district)
-    
-    query = query.group_by(func.date(TestResult.test_date)).order_by(func.date(TestResult.test_date))
-    
-    results = query.all()
+        query = query.filter(OutbreakAlert.district == district)
+    if scope:
+        query = query.filter(OutbreakAlert.scope == scope)
 
-    time_series = []
-    for row in results:
-        # row.date is already a string from func.date() in SQLite
-        date_str = row.date if isinstance(row.date, str) else row.date.strftime('%Y-%m-%d')
-        time_series.append(models.TimeSeriesData(
-            date=date_str,
-            positive_cases=row.positive_cases,
-            negative_cases=row.negative_cases,
-            total_tests=row.total_tests
+    return [
+        models.OutbreakAlertResponse(
+            id=str(alert.id),
+            scope=alert.scope,
+            method=alert.method,
+            day=alert.day,
+            district=alert.district,
+            clinic_id=str(alert.clinic_id) if alert.clinic_id else None,
+            clinic_name=clinic_name,
+            positive_cases=alert.positive_cases,
+            total_tests=alert.total_tests,
+            positivity_rate=alert.positivity_rate,
+            expected_rate=alert.expected_rate,
+            score=alert.score
+        )
+        for alert, clinic_name in query.order_by(OutbreakAlert.day.desc(), OutbreakAlert.score.desc())
+    ]
+
+
+def _percent_or_none(value: float) -> Optional[float]:
+    return None if math.isnan(value) else round(value * 100, 2)
+
+
+def get_model_performance(
+    db: Session,
+    days: int = 90,
+    district: Optional[str] = None,
+    clinic_id: Optional[UUID] = None,
+    model_version: Optional[str] = None,
+    by_clinic: bool = False,
+    granularity: Optional[Granularity] = None
+) -> List[models.ModelPerformance]:
+    """
+    Compare the AI's predictions with technicians' confirmed results over the last `days`
+    days, per model version and optionally per clinic and per period.
+
+    One GROUP BY over the daily_model_stats rollup yields counts per group, prediction,
+    confirmed result and confidence bin; the confusion matrices, rates and calibration
+    curves of all groups are then computed at once with numpy. Sensitivity and specificity
+    take the confirmed result as the truth, so inconclusive predictions count against both.
+
+    Raises:
+        TimeSeriesTooLongError: If a per-period breakdown would exceed MAX_TIME_SERIES_BUCKETS
+    """
+    end_day = dashboard_today()
+    start_day = end_day - timedelta(days=days)
+    group_columns = [DailyModelStats.model_version.label('model_version')]
+    if by_clinic:
+        group_columns += [DailyModelStats.clinic_id.label('clinic_id'), Clinic.name.label('clinic_name')]
+    if granularity:
+        buckets = count_buckets(start_day, end_day, granularity)
+        if buckets > MAX_TIME_SERIES_BUCKETS:
+            raise TimeSeriesTooLongError(buckets, MAX_TIME_SERIES_BUCKETS)
+        start_day = bucket_start(start_day, granularity)
+        group_columns.append(bucket_start_sql(dialect_name(db), DailyModelStats.day, granularity).label('period'))
+
+    query = select(
+        *group_columns,
+        DailyModelStats.ai_result,
+        DailyModelStats.confirmed_result,
+        DailyModelStats.confidence_bin,
+        func.sum(DailyModelStats.tests).label('tests'),
+        func.sum(DailyModelStats.confidence_sum).label('confidence_sum'),
+    ).where(DailyModelStats.day >= start_day, DailyModelStats.day <= end_day)
+    if by_clinic or district:
+        query = query.outerjoin(Clinic, Clinic.id == DailyModelStats.clinic_id)
+    if district:
+        query = query.where(Clinic.district == district)
+    if clinic_id:
+        query = query.where(DailyModelStats.clinic_id == clinic_id)
+    if model_version:
+        query = query.where(DailyModelStats.model_version == model_version)
+    rows = db.execute(query.group_by(
+        *group_columns, DailyModelStats.ai_result, DailyModelStats.confirmed_result, DailyModelStats.confidence_bin
+    )).all()
+    if not rows:
+        return []
+
+    keys = [column.name for column in group_columns]
+    groups = sorted({tuple(getattr(row, key) for key in keys) for row in rows}, key=lambda group: tuple(map(str, group)))
+    group_index = {group: i for i, group in enumerate(groups)}
+    statuses = list(TestStatus)
+    series = np.array([group_index[tuple(getattr(row, key) for key in keys)] for row in rows])
+    predicted = np.array([statuses.index(row.ai_result) for row in rows])
+    confirmed = np.array([statuses.index(row.confirmed_result) for row in rows])
+    bins = np.array([row.confidence_bin for row in rows])
+    tests = np.array([row.tests for row in rows], dtype=float)
+    confidence = np.array([row.confidence_sum for row in rows], dtype=float)
+
+    # confusion[group, predicted, confirmed]
+    confusion = np.zeros((len(groups), len(statuses), len(statuses)))
+    np.add.at(confusion, (series, predicted, confirmed), tests)
+    # Per confidence bin; results without a score are left out of calibration
+    scored = bins >= 0
+    bin_tests, bin_correct, bin_confidence = (np.zeros((len(groups), CALIBRATION_BINS)) for _ in range(3))
+    np.add.at(bin_tests, (series[scored], bins[scored]), tests[scored])
+    np.add.at(bin_correct, (series[scored], bins[scored]), np.where(predicted == confirmed, tests, 0)[scored])
+    np.add.at(bin_confidence, (series[scored], bins[scored]), confidence[scored])
+
+    positive, negative = statuses.index(TestStatus.Positive), statuses.index(TestStatus.Negative)
+    totals = confusion.sum(axis=(1, 2))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        agreement = np.trace(confusion, axis1=1, axis2=2) / totals
+        sensitivity = confusion[:, positive, positive] / confusion[:, :, positive].sum(axis=1)
+        specificity = confusion[:, negative, negative] / confusion[:, :, negative].sum(axis=1)
+        bin_accuracy = bin_correct / bin_tests
+        bin_mean_confidence = bin_confidence / bin_tests
+        calibration_error = np.nansum(bin_tests * np.abs(bin_accuracy - bin_mean_confidence), axis=1) / bin_tests.sum(axis=1)
+
+    performance = []
+    for i, group in enumerate(groups):
+        fields = dict(zip(keys, group))
+        performance.append(models.ModelPerformance(
+            model_version=fields['model_version'],
+            clinic_id=str(fields['clinic_id']) if fields.get('clinic_id') else None,
+            clinic_name=fields.get('clinic_name'),
+            period=fields.get('period'),
+            confirmed_tests=int(totals[i]),
+            agreement_rate=_percent_or_none(agreement[i]),
+            sensitivity=_percent_or_none(sensitivity[i]),
+            specificity=_percent_or_none(specificity[i]),
+            confusion_matrix={
+                ai.value: {truth.value: int(confusion[i, p, t]) for t, truth in enumerate(statuses)}
+                for p, ai in enumerate(statuses)
+            },
+            calibration=[
+                models.CalibrationBin(
+                    lower=b / CALIBRATION_BINS,
+                    upper=(b + 1) / CALIBRATION_BINS,
+                    tests=int(bin_tests[i, b]),
+                    mean_confidence=round(float(bin_mean_confidence[i, b]), 4),
+                    accuracy=round(float(bin_accuracy[i, b]), 4)
+                )
+                for b in np.nonzero(bin_tests[i])[0]
+            ],
+            expected_calibration_error=None if math.isnan(calibration_error[i]) else round(float(calibration_error[i]), 4)
         ))
+    return performance
 
-    return time_series
 
+_DISTRICT_STATS = TypeAdapter(List[models.DistrictStats])
+_CLINIC_STATS = TypeAdapter(List[models.ClinicStats])
+_TIME_SERIES = TypeAdapter(List[models.TimeSeriesData])
+_ALERTS = TypeAdapter(List[models.OutbreakAlertResponse])
+_MODEL_PERFORMANCE = TypeAdapter(List[models.ModelPerformance])
+
+def _without_last_updated(body: bytes) -> bytes:
+    # last_updated is the time of computation, not of the data; it must not change the ETag
+    data = json.loads(body)
+    data["summary"].pop("last_updated", None)
+    return json.dumps(data, sort_keys=True).encode()
+
+def get_cached_dashboard_data(
+    current_user: TokenData,
+    db: Session,
+    days: int = 30,
+    district: Optional[str] = None,
+    granularity: Granularity = Granularity.Day
+) -> CachedPayload:
+    """Dashboard data as a JSON body with its ETag, served from the dashboard cache."""
+    return get_dashboard_cache().get_or_compute(
+        f"dashboard:{granularity.value}", days, district,
+        lambda: get_dashboard_data(current_user, db, days, district, granularity).model_dump_json().encode(),
+        etag_basis=_without_last_updated,
+    )
+
+def get_cached_district_statistics(db: Session, district_filter: Optional[str] = None) -> CachedPayload:
+    """District statistics as a JSON body with its ETag, served from the dashboard cache."""
+    return get_dashboard_cache().get_or_compute(
+        "districts", None, district_filter,
+        lambda: _DISTRICT_STATS.dump_json(get_district_statistics(db, district_filter)),
+    )
+
+def get_cached_clinic_statistics(db: Session, district: Optional[str] = None) -> CachedPayload:
+    """Clinic statistics as a JSON body with its ETag, served from the dashboard cache."""
+    return get_dashboard_cache().get_or_compute(
+        "clinics", None, district,
+        lambda: _CLINIC_STATS.dump_json(get_clinic_statistics(db, district)),
+    )
+
+def get_cached_time_series(
+    db: Session,
+    days: int = 30,
+    district: Optional[str] = None,
+    granularity: Granularity = Granularity.Day
+) -> CachedPayload:
+    """Time series as a JSON body with its ETag, served from the dashboard cache."""
+    return get_dashboard_cache().get_or_compute(
+        f"time-series:{granularity.value}", days, district,
+        lambda: _TIME_SERIES.dump_json(get_time_series_data(db, days, district, granularity)),
+    )
+
+def get_cached_map_data(
+    db: Session,
+    days: int = 30,
+    district: Optional[str] = None,
+    bbox: Optional[BoundingBox] = None,
+    cell_size: float = 0.5
+) -> CachedPayload:
+    """Map data as a JSON body with its ETag, served from the dashboard cache."""
+    area = ",".join(f"{value:g}" for value in bbox) if bbox else ""
+    return get_dashboard_cache().get_or_compute(
+        f"map:{area}:{cell_size:g}", days, district,
+        lambda: get_map_data(db, days, district, bbox, cell_size).model_dump_json().encode(),
+    )
+
+def get_cached_alerts(
+    db: Session,
+    days: int = 30,
+    district: Optional[str] = None,
+    scope: Optional[AlertScope] = None
+) -> CachedPayload:
+    """Outbreak alerts as a JSON body with its ETag, served from the dashboard cache."""
+    return get_dashboard_cache().get_or_compute(
+        f"alerts:{scope.value if scope else ''}", days, district,
+        lambda: _ALERTS.dump_json(get_alerts(db, days, district, scope)),
+    )
+
+def get_cached_model_performance(
+    db: Session,
+    days: int = 90,
+    district: Optional[str] = None,
+    clinic_id: Optional[UUID] = None,
+    model_version: Optional[str] = None,
+    by_clinic: bool = False,
+    granularity: Optional[Granularity] = None
+) -> CachedPayload:
+    """Model performance as a JSON body with its ETag, served from the dashboard cache."""
+    breakdown = f"{clinic_id or ''}:{model_version or ''}:{int(by_clinic)}:{granularity.value if granularity else ''}"
+    return get_dashboard_cache().get_or_compute(
+        f"model-performance:{breakdown}", days, district,
+        lambda: _MODEL_PERFORMANCE.dump_json(get_model_performance(db, days, district, clinic_id, model_version, by_clinic, granularity)),
+    )
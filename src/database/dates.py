@@ -0,0 +1,119 @@
+"""
+Portable calendar functions
+Local dates and period buckets as SQL expressions on PostgreSQL and SQLite.
+"""
+
+import enum
+import sqlite3
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from sqlalchemy import Date, Integer, Interval, cast, event, extract, func, literal, literal_column, select
+from sqlalchemy.engine import Engine
+
+class Granularity(str, enum.Enum):
+    Day = "day"
+    Week = "week"            # ISO week, starting Monday
+    EpiWeek = "epi_week"     # Epidemiological week, starting Sunday
+    Month = "month"
+
+def dialect_name(db) -> str:
+    """Dialect of a Session or Connection."""
+    return db.get_bind().dialect.name if hasattr(db, "get_bind") else db.dialect.name
+
+@lru_cache(maxsize=None)
+def _zone(name: str) -> ZoneInfo:
+    return ZoneInfo(name)
+
+def is_valid_timezone(name: str) -> bool:
+    try:
+        _zone(name)
+        return True
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+
+def to_local_date(value: datetime, tz: str) -> date:
+    """Calendar date of a UTC timestamp (naive timestamps are UTC) in timezone tz."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(_zone(tz)).date()
+
+def local_date(dialect: str, timestamp, tz):
+    """SQL date of a UTC timestamp column in the IANA timezone given by tz."""
+    if dialect == "postgresql":
+        return cast(func.timezone(tz, func.timezone("UTC", timestamp)), Date)
+    # SQLite has no timezone database; see _register_sqlite_functions
+    return func.local_date(timestamp, tz, type_=Date)
+
+def bucket_start(day: date, granularity: Granularity) -> date:
+    """First day of the bucket containing day."""
+    if granularity == Granularity.Week:
+        return day - timedelta(days=day.weekday())
+    if granularity == Granularity.EpiWeek:
+        return day - timedelta(days=(day.weekday() + 1) % 7)
+    if granularity == Granularity.Month:
+        return day.replace(day=1)
+    return day
+
+def count_buckets(first: date, last: date, granularity: Granularity) -> int:
+    """Number of buckets from the one containing first to the one containing last."""
+    if granularity == Granularity.Month:
+        return (last.year - first.year) * 12 + last.month - first.month + 1
+    step = 7 if granularity in (Granularity.Week, Granularity.EpiWeek) else 1
+    return (bucket_start(last, granularity) - bucket_start(first, granularity)).days // step + 1
+
+def bucket_start_sql(dialect: str, day, granularity: Granularity):
+    """SQL equivalent of bucket_start for a Date column."""
+    if dialect == "postgresql":
+        if granularity == Granularity.Week:
+            return cast(func.date_trunc("week", day), Date)
+        if granularity == Granularity.EpiWeek:
+            return cast(day - cast(extract("dow", day), Integer), Date)
+        if granularity == Granularity.Month:
+            return cast(func.date_trunc("month", day), Date)
+        return day
+    if granularity == Granularity.Week:
+        return func.date(day, "weekday 0", "-6 days", type_=Date)
+    if granularity == Granularity.EpiWeek:
+        return func.date(day, "weekday 6", "-6 days", type_=Date)
+    if granularity == Granularity.Month:
+        return func.date(day, "start of month", type_=Date)
+    return day
+
+def next_bucket_sql(dialect: str, day, granularity: Granularity):
+    """SQL expression for the first day of the bucket after the one starting on day."""
+    step = {
+        Granularity.Day: "1 day",
+        Granularity.Week: "7 days",
+        Granularity.EpiWeek: "7 days",
+        Granularity.Month: "1 month",
+    }[granularity]
+    if dialect == "postgresql":
+        return cast(day + literal_column(f"INTERVAL '{step}'", Interval), Date)
+    return func.date(day, f"+{step}", type_=Date)
+
+def calendar(dialect: str, first: date, last: date, granularity: Granularity, name: str = "calendar"):
+    """
+    Recursive CTE with one row (column "bucket") per bucket start from first to last,
+    both bucket starts, for gap-filling series with an outer join.
+    """
+    buckets = select(literal(first, Date).label("bucket")).cte(name, recursive=True)
+    return buckets.union_all(
+        select(next_bucket_sql(dialect, buckets.c.bucket, granularity)).where(buckets.c.bucket < literal(last, Date))
+    )
+
+def _local_date(value, tz):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    try:
+        return to_local_date(value, tz or "UTC").isoformat()
+    except (ZoneInfoNotFoundError, ValueError):
+        return to_local_date(value, "UTC").isoformat()
+
+def _register_sqlite_functions(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function("local_date", 2, _local_date, deterministic=True)
+
+event.listen(Engine, "connect", _register_sqlite_functions)
@@ -0,0 +1,48 @@
+"""
+Keyset pagination helpers
+Pages are fetched with WHERE (created_at, id) > (last_created_at, last_id) instead of OFFSET,
+so each page costs the same regardless of how deep into the table it is.
+"""
+
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
+from uuid import UUID
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query
+
+Keyset = Tuple[datetime, UUID]
+
+def after_keyset(created_column, id_column, keyset: Keyset):
+    """Filter clause selecting rows strictly after keyset in (created_at, id) order."""
+    created_at, row_id = keyset
+    return or_(
+        created_column > created_at,
+        and_(created_column == created_at, id_column > row_id),
+    )
+
+def fetch_page(query: Query, created_column, id_column, limit: int, after: Optional[Keyset] = None) -> List:
+    """Fetch one page of query in (created_at, id) order, starting after the given keyset."""
+    if after is not None:
+        query = query.filter(after_keyset(created_column, id_column, after))
+    return query.order_by(created_column, id_column).limit(limit).all()
+
+def encode_cursor(keyset: Keyset) -> str:
+    """Encode a keyset as an opaque URL-safe cursor string."""
+    created_at, row_id = keyset
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Keyset:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.split("|")
+        return datetime.fromisoformat(created_at), UUID(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
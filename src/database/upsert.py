@@ -0,0 +1,54 @@
+"""
+Dialect-aware bulk upsert
+INSERT ... ON CONFLICT (pk) DO UPDATE in one statement on PostgreSQL and SQLite.
+"""
+
+from typing import Iterable, List, Dict, Any, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects import postgresql, sqlite
+
+_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+def upsert_statement(db: Session, entity, columns: Iterable[str] = None, preserve: Iterable[str] = ()):
+    """
+    Build an INSERT for entity that updates the given non-key columns (default: all) on a
+    primary key conflict, except those in preserve, which keep their stored value.
+    Execute it with a list of row dicts for a single executemany round trip.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect not in _INSERTS:
+        raise NotImplementedError(f"Upsert is not supported on {dialect}")
+
+    table = entity.__table__
+    statement = _INSERTS[dialect](table)
+    key = [column.name for column in table.primary_key.columns]
+    columns = set(columns) if columns is not None else set(table.columns.keys())
+    updates = {
+        column.name: statement.excluded[column.name]
+        for column in table.columns
+        if column.name in columns and column.name not in key and column.name not in preserve
+    }
+    if not updates:
+        return statement.on_conflict_do_nothing(index_elements=key)
+    return statement.on_conflict_do_update(index_elements=key, set_=updates)
+
+def upsert_rows(db: Session, entity, rows: List[Dict[str, Any]], preserve: Iterable[str] = ()) -> int:
+    """
+    Insert or update rows of entity by primary key.
+
+    Rows are plain column dicts; columns a row leaves out get their default on insert and
+    are left alone on update. ORM flush events do not fire.
+
+    Returns:
+        Number of rows written
+    """
+    # executemany needs the same columns in every row
+    groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+    for row in rows:
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+    for columns, group in groups.items():
+        db.execute(upsert_statement(db, entity, columns, preserve), group)
+    return len(rows)
@@ -0,0 +1,42 @@
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Enum, Text
+from sqlalchemy.dialects.postgresql import UUID
+import uuid
+import enum
+from datetime import datetime, timezone
+from ..database.core import Base 
+
+class JobStatus(enum.Enum):
+    Queued = "queued"
+    Running = "running"
+    Completed = "completed"
+    Failed = "failed"
+
+class AnalysisJob(Base):
+    __tablename__ = 'analysis_jobs'
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    status = Column(Enum(JobStatus), nullable=False, default=JobStatus.Queued, index=True)
+
+    # Analysis request
+    patient_id = Column(UUID(as_uuid=True), ForeignKey('patients.id'), nullable=False)
+    clinic_id = Column(UUID(as_uuid=True), ForeignKey('clinics.id'), nullable=False)
+    health_worker_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False)
+    notes = Column(Text, nullable=True)
+    symptoms = Column(String, nullable=True)
+
+    # Uploaded image, held in storage staging until the result is committed
+    image_path = Column(String, nullable=False)
+    image_filename = Column(String, nullable=False)
+    image_hash = Column(String(64), nullable=True)
+
+    # Outcome
+    test_result_id = Column(UUID(as_uuid=True), ForeignKey('test_results.id'), nullable=True)
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+
+    created_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    started_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<AnalysisJob(id='{self.id}', status='{self.status}', patient_id='{self.patient_id}')>"
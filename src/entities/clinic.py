@@ -14,6 +14,8 @@ class Clinic(Base):
     longitude = Column(Float, nullable=True)
     contact_phone = Column(String, nullable=True)
     contact_email = Column(String, nullable=True)
+    # IANA timezone name; dashboard statistics count tests on the clinic's local calendar days
+    timezone = Column(String, nullable=False, default="UTC", server_default="UTC")
 
     def __repr__(self):
         return f"<Clinic(name='{self.name}', district='{self.district}', region='{self.region}')>"
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Date, Integer, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID
+from ..database.core import Base
+
+class DailyClinicStats(Base):
+    """
+    Test counts per clinic per day (in the clinic's timezone), derived from test_results.
+    Maintained on every flush that touches test results; see src/dashboard/rollups.py.
+    """
+    __tablename__ = 'daily_clinic_stats'
+
+    day = Column(Date, primary_key=True)
+    clinic_id = Column(UUID(as_uuid=True), ForeignKey('clinics.id'), primary_key=True, index=True)
+
+    total_tests = Column(Integer, nullable=False, default=0)
+    positive_cases = Column(Integer, nullable=False, default=0)
+    negative_cases = Column(Integer, nullable=False, default=0)
+    inconclusive_cases = Column(Integer, nullable=False, default=0)
+
+    # Subset of the above that a health worker has confirmed
+    confirmed_tests = Column(Integer, nullable=False, default=0)
+    confirmed_positive = Column(Integer, nullable=False, default=0)
+    confirmed_negative = Column(Integer, nullable=False, default=0)
+    confirmed_inconclusive = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<DailyClinicStats(day='{self.day}', clinic_id='{self.clinic_id}', total={self.total_tests})>"
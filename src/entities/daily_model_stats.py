@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Date, Float, Integer, String, ForeignKey, Enum
+from sqlalchemy.dialects.postgresql import UUID
+from ..database.core import Base
+from .test_result import TestStatus
+
+# model_version of results analyzed without one recorded
+UNKNOWN_MODEL_VERSION = "unknown"
+
+# confidence_bin of results without a confidence score
+NO_CONFIDENCE_BIN = -1
+
+class DailyModelStats(Base):
+    """
+    Confirmed test results per clinic per day (in the clinic's timezone), counted by
+    model version, AI prediction, confirmed result and AI confidence bin. The source of
+    model performance analytics; maintained with daily_clinic_stats, see src/dashboard/rollups.py.
+    """
+    __tablename__ = 'daily_model_stats'
+
+    day = Column(Date, primary_key=True)
+    clinic_id = Column(UUID(as_uuid=True), ForeignKey('clinics.id'), primary_key=True, index=True)
+    model_version = Column(String, primary_key=True)
+    ai_result = Column(Enum(TestStatus), primary_key=True)
+    confirmed_result = Column(Enum(TestStatus), primary_key=True)
+    confidence_bin = Column(Integer, primary_key=True)  # floor(confidence * CALIBRATION_BINS)
+
+    tests = Column(Integer, nullable=False, default=0)
+    confidence_sum = Column(Float, nullable=False, default=0.0)  # For mean confidence per bin
+
+    def __repr__(self):
+        return f"<DailyModelStats(day='{self.day}', clinic_id='{self.clinic_id}', model_version='{self.model_version}', tests={self.tests})>"
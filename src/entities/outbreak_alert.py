@@ -0,0 +1,42 @@
+from sqlalchemy import Column, String, Integer, Float, Date, DateTime, ForeignKey, Enum, Index
+from sqlalchemy.dialects.postgresql import UUID
+import uuid
+import enum
+from datetime import datetime, timezone
+from ..database.core import Base
+
+class AlertScope(enum.Enum):
+    Clinic = "clinic"
+    District = "district"
+
+class AlertMethod(enum.Enum):
+    Ewma = "ewma"    # Day far above the exponentially weighted baseline
+    Cusum = "cusum"  # Sustained run of days above the baseline
+
+class OutbreakAlert(Base):
+    """
+    A day on which a clinic's or district's positivity was anomalously high.
+    Written by the anomaly detector (see src/dashboard/anomalies.py).
+    """
+    __tablename__ = 'outbreak_alerts'
+    __table_args__ = (
+        Index('ix_outbreak_alerts_day_district', 'day', 'district'),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    scope = Column(Enum(AlertScope), nullable=False)
+    method = Column(Enum(AlertMethod), nullable=False)
+    day = Column(Date, nullable=False)
+    district = Column(String, nullable=False)
+    clinic_id = Column(UUID(as_uuid=True), ForeignKey('clinics.id'), nullable=True)  # Clinic alerts only
+
+    positive_cases = Column(Integer, nullable=False)
+    total_tests = Column(Integer, nullable=False)
+    positivity_rate = Column(Float, nullable=False)
+    expected_rate = Column(Float, nullable=False)
+    score = Column(Float, nullable=False)  # z-score (ewma) or cumulative sum (cusum)
+
+    created_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f"<OutbreakAlert(scope='{self.scope}', district='{self.district}', day='{self.day}', method='{self.method}')>"
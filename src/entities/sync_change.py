@@ -0,0 +1,38 @@
+from sqlalchemy import Column, String, Integer, DateTime
+from sqlalchemy.dialects.postgresql import UUID
+import enum
+from datetime import datetime, timezone
+from ..database.core import Base
+
+class ChangeOperation(enum.Enum):
+    Upsert = "upsert"
+    Delete = "delete"
+
+class ChangeLog(Base):
+    """
+    Append-only record of mutations to synced entities.
+    seq is a monotonic change sequence; rows up to the server's watermark are pruned.
+    """
+    __tablename__ = 'change_log'
+    # AUTOINCREMENT on SQLite so sequence numbers are never reused after pruning
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    entity_type = Column(String, nullable=False)  # test_result, patient, clinic
+    entity_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    operation = Column(String, nullable=False)  # ChangeOperation value
+    changed_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f"<ChangeLog(seq={self.seq}, entity='{self.entity_type}', id='{self.entity_id}', op='{self.operation}')>"
+
+class SyncState(Base):
+    """Sync progress per central server: the highest change seq the server has acknowledged."""
+    __tablename__ = 'sync_state'
+
+    name = Column(String, primary_key=True)
+    watermark = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=True, onupdate=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f"<SyncState(name='{self.name}', watermark={self.watermark})>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, DateTime, ForeignKey, Enum, Boolean, Text
+from sqlalchemy import Column, String, Float, DateTime, ForeignKey, Enum, Boolean, Text, JSON
 from sqlalchemy.dialects.postgresql import UUID
 import uuid
 import enum
@@ -25,23 +25,26 @@ class TestResult(Base):
     
     # Test information
     test_date = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
-    result = Column(Enum(TestStatus), nullable=False)
+    result = Column(Enum(TestStatus), nullable=False)  # The confirmed result once is_confirmed
+    ai_result = Column(Enum(TestStatus), nullable=True)  # The model's prediction, kept when a technician overrides it
     confidence_score = Column(Float, nullable=True)  # AI model confidence (0-1)
     
     # Image information
     image_path = Column(String, nullable=False)  # Path to stored blood smear image
     image_filename = Column(String, nullable=False)
+    image_hash = Column(String(64), nullable=True)  # SHA-256 of the stored image, keys derivative cache
     
     # AI analysis metadata
     model_version = Column(String, nullable=True)
     processing_time_ms = Column(Float, nullable=True)
+    detections = Column(JSON, nullable=True)  # Bounding boxes returned by the model, used for overlays
     
     # Additional notes
     notes = Column(Text, nullable=True)
     symptoms = Column(String, nullable=True)  # Comma-separated symptoms
     
     # Sync status for offline capability
-    sync_status = Column(Enum(SyncStatus), nullable=False, default=SyncStatus.Pending)
+    sync_status = Column(Enum(SyncStatus), nullable=False, default=SyncStatus.Pending, index=True)
     synced_at = Column(DateTime, nullable=True)
 
     # Confirmation workflow
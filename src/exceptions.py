@@ -49,6 +49,32 @@ class TestResultCreationError(TestResultError):
     def __init__(self, error: str):
         super().__init__(status_code=500, detail=f"Failed to create test result: {error}")
 
+class BatchAnalysisError(TestResultError):
+    def __init__(self, error: str):
+        super().__init__(status_code=422, detail=f"Invalid batch analysis request: {error}")
+
+class AnalysisJobNotFoundError(TestResultError):
+    def __init__(self, job_id=None):
+        message = "Analysis job not found" if job_id is None else f"Analysis job with id {job_id} not found"
+        super().__init__(status_code=404, detail=message)
+
+class TestResultImageNotFoundError(TestResultError):
+    def __init__(self, result_id=None):
+        message = "Test result image not found" if result_id is None else f"Image for test result with id {result_id} not found"
+        super().__init__(status_code=404, detail=message)
+
+class InvalidCursorError(TestResultError):
+    def __init__(self, cursor: str):
+        super().__init__(status_code=400, detail=f"Invalid pagination cursor: {cursor}")
+
+class InvalidExportRequestError(TestResultError):
+    def __init__(self, error: str):
+        super().__init__(status_code=422, detail=f"Invalid export request: {error}")
+
+class ExportFormatUnavailableError(TestResultError):
+    def __init__(self, export_format: str, requirement: str):
+        super().__init__(status_code=501, detail=f"{export_format} export is not available on this server (requires {requirement})")
+
 # Clinic-related exceptions
 class ClinicError(HTTPException):
     """Base exception for clinic-related errors"""
@@ -62,3 +88,57 @@ class ClinicNotFoundError(ClinicError):
 class ClinicCreationError(ClinicError):
     def __init__(self, error: str):
         super().__init__(status_code=500, detail=f"Failed to create clinic: {error}")
+
+# Dashboard-related exceptions
+class DashboardError(HTTPException):
+    """Base exception for dashboard-related errors"""
+    pass
+
+class TimeSeriesTooLongError(DashboardError):
+    def __init__(self, buckets: int, max_buckets: int):
+        super().__init__(
+            status_code=400,
+            detail=f"Time series would have {buckets} points (at most {max_buckets}); use a coarser granularity or fewer days",
+        )
+
+class InvalidBoundingBoxError(DashboardError):
+    def __init__(self, bbox: str):
+        super().__init__(status_code=400, detail=f"Invalid bbox {bbox!r}; expected min_lon,min_lat,max_lon,max_lat")
+
+# Sync-related exceptions
+class SyncError(HTTPException):
+    """Base exception for sync-related errors"""
+    pass
+
+class SyncNotConfiguredError(SyncError):
+    def __init__(self):
+        super().__init__(status_code=503, detail="Central sync server is not configured (set CENTRAL_SERVER_URL)")
+
+class InvalidSyncPayloadError(SyncError):
+    def __init__(self, error: str):
+        super().__init__(status_code=400, detail=f"Invalid sync payload: {error}")
+
+class UnsupportedSyncFormatError(SyncError):
+    def __init__(self, content_type: str):
+        super().__init__(status_code=415, detail=f"Unsupported sync payload format: {content_type}")
+
+class SyncIngestBusyError(SyncError):
+    def __init__(self, retry_after_seconds: int):
+        super().__init__(
+            status_code=503,
+            detail="Sync ingestion is at capacity, retry later",
+            headers={"Retry-After": str(retry_after_seconds)},
+        )
+
+class SyncModelNotFoundError(SyncError):
+    def __init__(self):
+        super().__init__(status_code=404, detail="Model artifact is not published")
+
+class ImageUploadNotFoundError(SyncError):
+    def __init__(self, image_hash: str):
+        super().__init__(status_code=404, detail=f"No upload in progress for image {image_hash}")
+
+class ImageChecksumMismatchError(SyncError):
+    def __init__(self, error: str):
+        # 460 Checksum Mismatch, as in the tus checksum extension
+        super().__init__(status_code=460, detail=f"Image checksum mismatch: {error}")
@@ -0,0 +1,27 @@
+from fastapi import Request, Response
+
+
+# Content-addressed responses (keyed by a content hash) never change for a given URL + ETag
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+# Responses that may change at any time: clients keep them but revalidate with the ETag before each use
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+
+def format_etag(key: str) -> str:
+    return f'"{key}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check an If-None-Match header against a quoted ETag (weak comparison)."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag.removeprefix("W/") in candidates
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
@@ -5,6 +5,7 @@ Supports both placeholder mode (for testing) and real YOLOv11 inference.
 
 import time
 import random
+import threading
 from typing import Tuple, Optional, List, Dict
 from PIL import Image
 import numpy as np
@@ -12,6 +13,7 @@ import logging
 from enum import Enum
 from pathlib import Path
 import os
+from .model_updater import read_active_model
 
 class InferenceResult(Enum):
     POSITIVE = "positive"
@@ -30,18 +32,26 @@ class MalariaInferenceService:
         if not Path(default_model).exists():
             default_model = "models/malaria_yolov11.onnx"
         
-        self.model_path = model_path or os.getenv("YOLO_MODEL_PATH", default_model)
         self.model_version = "malaria-yolo8-v1.0.0"
+        # A model installed by a sync update takes precedence over the bundled one
+        active_model = read_active_model() if model_path is None and not os.getenv("YOLO_MODEL_PATH") else None
+        if active_model is not None:
+            model_path = active_model["path"]
+            self.model_version = active_model["version"]
+
+        self.model_path = model_path or os.getenv("YOLO_MODEL_PATH", default_model)
         self.is_loaded = False
         self.model = None
         self.use_placeholder = False
         self.use_onnx = False
         self.ultralytics_model = None
+        self._swap_lock = threading.Lock()
 
         # YOLOv11 configuration
         self.confidence_threshold = float(os.getenv("YOLO_CONFIDENCE_THRESHOLD", "0.25"))
         self.iou_threshold = float(os.getenv("YOLO_IOU_THRESHOLD", "0.45"))
         self.image_size = int(os.getenv("YOLO_IMAGE_SIZE", "640"))
+        self.batch_size = int(os.getenv("YOLO_BATCH_SIZE", "8"))
 
         logging.info(f"Initializing Malaria Inference Service with model: {self.model_path}")
 
@@ -109,6 +119,35 @@ class MalariaInferenceService:
             self.use_placeholder = True
             self.is_loaded = True
 
+    def swap_model(self, model_path: str, model_version: str) -> bool:
+        """
+        Switch to another model file without restarting.
+
+        The new model is loaded alongside the current one; only if it loads are the
+        references replaced, so inference in progress finishes on the old model.
+
+        Returns:
+            True if the new model is now active, False if it failed to load
+        """
+        candidate = MalariaInferenceService(model_path)
+        candidate.load_model()
+        if candidate.use_placeholder:
+            logging.error(f"Model {model_version} at {model_path} failed to load; keeping {self.model_version}")
+            return False
+
+        with self._swap_lock:
+            # Model handles before flags, so a concurrent reader never sees a flag without its model
+            self.ultralytics_model = candidate.ultralytics_model
+            self.model = candidate.model
+            self.use_onnx = candidate.use_onnx
+            self.model_path = model_path
+            self.model_version = model_version
+            self.use_placeholder = False
+            self.is_loaded = True
+
+        logging.info(f"Swapped inference model to {model_version} ({model_path})")
+        return True
+
     def preprocess_image(self, image: Image.Image) -> np.ndarray:
         """
         Preprocess blood smear image for model inference.
@@ -126,6 +165,52 @@ class MalariaInferenceService:
 
         return image
 
+    def _parse_yolo_result(self, result) -> Tuple[InferenceResult, float, List[Dict]]:
+        """
+        Convert one ultralytics result into a diagnosis and detection list.
+
+        Returns:
+            Tuple of (result, confidence_score, detections)
+        """
+        detections = []
+        max_confidence = 0.0
+
+        for box in result.boxes:
+            conf = float(box.conf[0])
+            cls = int(box.cls[0])
+            class_name = result.names[cls] if cls in result.names else f"class_{cls}"
+            
+            # Get bounding box coordinates
+            xyxy = box.xyxy[0].tolist()  # [x1, y1, x2, y2]
+
+            detection = {
+                "class": class_name,
+                "confidence": conf,
+                "bbox": xyxy,
+                "x1": xyxy[0],
+                "y1": xyxy[1],
+                "x2": xyxy[2],
+                "y2": xyxy[3]
+            }
+            detections.append(detection)
+
+            if conf > max_confidence:
+                max_confidence = conf
+
+        # Determine result based on detections
+        if len(detections) > 0:
+            if max_confidence > 0.7:
+                inference_result = InferenceResult.POSITIVE
+            elif max_confidence > 0.4:
+                inference_result = InferenceResult.INCONCLUSIVE
+            else:
+                inference_result = InferenceResult.NEGATIVE
+        else:
+            inference_result = InferenceResult.NEGATIVE
+            max_confidence = 0.95  # High confidence in negative result
+
+        return inference_result, max_confidence, detections
+
     def _run_yolo_inference(self, image_path: str) -> Tuple[InferenceResult, float, float, Optional[List[Dict]]]:
         """
         Run YOLOv8 inference on the image.
@@ -133,68 +218,39 @@ class MalariaInferenceService:
         Returns:
             Tuple of (result, confidence_score, processing_time_ms, detections)
         """
+        return self._run_yolo_batch_inference([image_path])[0]
+
+    def _run_yolo_batch_inference(self, image_paths: List[str]) -> List[Tuple[InferenceResult, float, float, Optional[List[Dict]]]]:
+        """
+        Run YOLOv8 inference on several images in one model call.
+        Processing time is the batch wall time split evenly across images.
+
+        Returns:
+            List of (result, confidence_score, processing_time_ms, detections), in input order
+        """
         start_time = time.time()
 
         try:
-            # Use ultralytics model if available
-            if self.ultralytics_model is not None:
-                # Run inference
-                results = self.ultralytics_model.predict(
-                    source=image_path,
-                    conf=self.confidence_threshold,
-                    iou=self.iou_threshold,
-                    imgsz=self.image_size,
-                    verbose=False
-                )
-
-                # Process results
-                detections = []
-                max_confidence = 0.0
-
-                if len(results) > 0:
-                    result = results[0]
-                    boxes = result.boxes
-
-                    for box in boxes:
-                        conf = float(box.conf[0])
-                        cls = int(box.cls[0])
-                        class_name = result.names[cls] if cls in result.names else f"class_{cls}"
-                        
-                        # Get bounding box coordinates
-                        xyxy = box.xyxy[0].tolist()  # [x1, y1, x2, y2]
-
-                        detection = {
-                            "class": class_name,
-                            "confidence": conf,
-                            "bbox": xyxy,
-                            "x1": xyxy[0],
-                            "y1": xyxy[1],
-                            "x2": xyxy[2],
-                            "y2": xyxy[3]
-                        }
-                        detections.append(detection)
-
-                        if conf > max_confidence:
-                            max_confidence = conf
-
-                # Determine result based on detections
-                if len(detections) > 0:
-                    if max_confidence > 0.7:
-                        inference_result = InferenceResult.POSITIVE
-                    elif max_confidence > 0.4:
-                        inference_result = InferenceResult.INCONCLUSIVE
-                    else:
-                        inference_result = InferenceResult.NEGATIVE
-                else:
-                    inference_result = InferenceResult.NEGATIVE
-                    max_confidence = 0.95  # High confidence in negative result
-
-            processing_time = (time.time() - start_time) * 1000
-
-            logging.info(f"YOLOv8 inference: {inference_result.value} (confidence: {max_confidence:.2f}, "
-                        f"detections: {len(detections)}, time: {processing_time:.2f}ms)")
-
-            return inference_result, max_confidence, processing_time, detections
+            # Run inference
+            results = self.ultralytics_model.predict(
+                source=image_paths,
+                conf=self.confidence_threshold,
+                iou=self.iou_threshold,
+                imgsz=self.image_size,
+                batch=min(self.batch_size, len(image_paths)),
+                verbose=False
+            )
+
+            parsed = [self._parse_yolo_result(result) for result in results]
+            processing_time = (time.time() - start_time) * 1000 / max(len(image_paths), 1)
+
+            outputs = []
+            for inference_result, max_confidence, detections in parsed:
+                logging.info(f"YOLOv8 inference: {inference_result.value} (confidence: {max_confidence:.2f}, "
+                            f"detections: {len(detections)}, time: {processing_time:.2f}ms)")
+                outputs.append((inference_result, max_confidence, processing_time, detections))
+
+            return outputs
 
         except Exception as e:
             logging.error(f"Error during YOLOv8 inference: {str(e)}")
@@ -293,6 +349,27 @@ class MalariaInferenceService:
             logging.error(f"Error during image analysis: {str(e)}")
             raise
     
+    def analyze_images(self, image_paths: List[str]) -> List[Tuple[InferenceResult, float, float, Optional[List[Dict]]]]:
+        """
+        Analyze several blood smear images, batching model calls by batch_size.
+
+        Args:
+            image_paths: Paths to the blood smear images
+
+        Returns:
+            List of (result, confidence_score, processing_time_ms, detections), in input order
+        """
+        if not self.is_loaded:
+            self.load_model()
+
+        if self.use_placeholder:
+            return [self._run_placeholder_inference(path) for path in image_paths]
+
+        outputs = []
+        for start in range(0, len(image_paths), self.batch_size):
+            outputs.extend(self._run_yolo_batch_inference(image_paths[start:start + self.batch_size]))
+        return outputs
+
     def validate_image(self, image_path: str) -> bool:
         """
         Validate that the image is suitable for analysis.
@@ -0,0 +1,73 @@
+"""
+Change tracking for delta sync
+Records every ORM mutation of synced entities in the change log, in the same transaction.
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, Set
+from sqlalchemy import event, insert, inspect
+from sqlalchemy.orm import Session
+from src.entities.test_result import TestResult, SyncStatus
+from src.entities.patient import Patient
+from src.entities.clinic import Clinic
+from src.entities.sync_change import ChangeLog, ChangeOperation
+
+# Entity classes tracked for sync, by wire name
+TRACKED_ENTITIES: Dict[str, type] = {
+    "clinic": Clinic,
+    "patient": Patient,
+    "test_result": TestResult,
+}
+ENTITY_TYPES = {cls: name for name, cls in TRACKED_ENTITIES.items()}
+
+# Local bookkeeping columns: changing only these is not a change to sync
+UNTRACKED_COLUMNS: Dict[type, Set[str]] = {
+    TestResult: {"sync_status", "synced_at"},
+}
+
+def has_tracked_changes(obj) -> bool:
+    """Whether a persistent object has changes to columns that are synced."""
+    ignored = UNTRACKED_COLUMNS.get(type(obj), set())
+    state = inspect(obj)
+    return any(
+        attr.history.has_changes()
+        for attr in state.attrs
+        if attr.key not in ignored
+    )
+
+def _before_flush(session: Session, flush_context, instances) -> None:
+    # Edits to an already synced result must be sent again
+    for obj in session.dirty:
+        if isinstance(obj, TestResult) and obj.sync_status != SyncStatus.Pending and has_tracked_changes(obj):
+            obj.sync_status = SyncStatus.Pending
+
+def _after_flush(session: Session, flush_context) -> None:
+    now = datetime.now(timezone.utc)
+    changes = []
+    for obj in session.new:
+        if type(obj) in ENTITY_TYPES:
+            changes.append((obj, ChangeOperation.Upsert))
+    for obj in session.dirty:
+        if type(obj) in ENTITY_TYPES and has_tracked_changes(obj):
+            changes.append((obj, ChangeOperation.Upsert))
+    for obj in session.deleted:
+        if type(obj) in ENTITY_TYPES:
+            changes.append((obj, ChangeOperation.Delete))
+
+    if changes:
+        # Parents before children for upserts, children before parents for deletes
+        rank = {cls: i for i, cls in enumerate(TRACKED_ENTITIES.values())}
+        changes.sort(key=lambda change: (
+            change[1] == ChangeOperation.Delete,
+            -rank[type(change[0])] if change[1] == ChangeOperation.Delete else rank[type(change[0])],
+        ))
+        session.connection().execute(
+            insert(ChangeLog.__table__),
+            [
+                {"entity_type": ENTITY_TYPES[type(obj)], "entity_id": obj.id, "operation": operation.value, "changed_at": now}
+                for obj, operation in changes
+            ],
+        )
+
+event.listen(Session, "before_flush", _before_flush)
+event.listen(Session, "after_flush", _after_flush)
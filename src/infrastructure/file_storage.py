@@ -4,6 +4,7 @@ File Storage Service for blood smear images
 
 import os
 import uuid
+import hashlib
 from pathlib import Path
 from typing import Tuple
 import shutil
@@ -13,11 +14,15 @@ from datetime import datetime
 class FileStorageService:
     """Service for storing and managing blood smear images."""
     
+    # Images are written here first and only moved into place once their DB row is committed
+    STAGING_DIR = ".staging"
+
     def __init__(self, base_path: str = "./uploads"):
         self.base_path = Path(base_path)
         self.base_path.mkdir(parents=True, exist_ok=True)
+        self.staging_path = self.base_path / self.STAGING_DIR
         logging.info(f"File storage initialized at: {self.base_path}")
-    
+
     def save_image(self, file_content: bytes, original_filename: str, clinic_id: str) -> Tuple[str, str]:
         """
         Save an uploaded image file.
@@ -30,25 +35,91 @@ class FileStorageService:
         Returns:
             Tuple of (file_path, stored_filename)
         """
-        # Create directory structure: uploads/clinic_id/YYYY-MM/
+        relative_path, unique_filename = self.stage_image(file_content, original_filename, clinic_id)
+        self.promote_image(relative_path)
+        return relative_path, unique_filename
+
+    def stage_image(self, file_content: bytes, original_filename: str, clinic_id: str) -> Tuple[str, str]:
+        """
+        Durably write an image to the staging area without making it visible.
+        Call promote_image once the referencing row is committed, or
+        discard_staged_image if the commit fails.
+
+        Args:
+            file_content: Binary content of the file
+            original_filename: Original filename from upload
+            clinic_id: ID of the clinic for organization
+
+        Returns:
+            Tuple of (final_relative_path, stored_filename)
+        """
+        # Final directory structure: uploads/clinic_id/YYYY-MM/
         date_path = datetime.now().strftime("%Y-%m")
-        clinic_dir = self.base_path / str(clinic_id) / date_path
-        clinic_dir.mkdir(parents=True, exist_ok=True)
         
         # Generate unique filename
         file_extension = Path(original_filename).suffix
         unique_filename = f"{uuid.uuid4()}{file_extension}"
-        file_path = clinic_dir / unique_filename
-        
-        # Save file
-        with open(file_path, 'wb') as f:
+        relative_path = str(Path(str(clinic_id)) / date_path / unique_filename)
+
+        staged_path = self.get_staged_path(relative_path)
+        staged_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # fsync so a committed row never points at a truncated file after a power loss
+        with open(staged_path, 'wb') as f:
             f.write(file_content)
-        
-        logging.info(f"Image saved: {file_path}")
-        
-        # Return relative path from base
-        relative_path = str(file_path.relative_to(self.base_path))
+            f.flush()
+            os.fsync(f.fileno())
+
+        logging.info(f"Image staged: {staged_path}")
         return relative_path, unique_filename
+
+    def get_staged_path(self, relative_path: str) -> Path:
+        """Get the staging location of an image that has not been promoted yet."""
+        return self.staging_path / relative_path
+
+    def promote_image(self, relative_path: str) -> bool:
+        """
+        Atomically move a staged image to its final location.
+
+        Returns:
+            True if the image was promoted, False if nothing was staged
+        """
+        staged_path = self.get_staged_path(relative_path)
+        file_path = self.get_image_path(relative_path)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.replace(staged_path, file_path)
+        except FileNotFoundError:
+            logging.warning(f"No staged image to promote: {staged_path}")
+            return False
+
+        logging.info(f"Image saved: {file_path}")
+        return True
+
+    def discard_staged_image(self, relative_path: str) -> None:
+        """Remove a staged image whose row was never committed."""
+        try:
+            self.get_staged_path(relative_path).unlink()
+            logging.info(f"Discarded staged image: {relative_path}")
+        except FileNotFoundError:
+            pass
+
+    def iter_staged_images(self):
+        """Yield (relative_path, full_path) for every staged image."""
+        if not self.staging_path.exists():
+            return
+        for file_path in self.staging_path.rglob("*"):
+            if file_path.is_file():
+                yield str(file_path.relative_to(self.staging_path)), file_path
+
+    def iter_stored_images(self):
+        """Yield (relative_path, full_path) for every promoted image, skipping hidden entries."""
+        for file_path in self.base_path.rglob("*"):
+            relative = file_path.relative_to(self.base_path)
+            if any(part.startswith(".") for part in relative.parts):
+                continue
+            if file_path.is_file():
+                yield str(relative), file_path
     
     def get_image_path(self, relative_path: str) -> Path:
         """
@@ -62,6 +133,28 @@ class FileStorageService:
         """
         return self.base_path / relative_path
     
+    @staticmethod
+    def content_hash(file_content: bytes) -> str:
+        """Return the SHA-256 hex digest of an image's content."""
+        return hashlib.sha256(file_content).hexdigest()
+
+    def hash_image(self, relative_path: str) -> str:
+        """
+        Compute the SHA-256 hex digest of a stored image.
+        Used for rows saved before hashes were recorded at upload time.
+
+        Args:
+            relative_path: Relative path from base storage
+
+        Returns:
+            Hex digest of the file content
+        """
+        digest = hashlib.sha256()
+        with open(self.get_image_path(relative_path), 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
     def delete_image(self, relative_path: str) -> bool:
         """
         Delete an image file.
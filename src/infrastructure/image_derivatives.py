@@ -0,0 +1,186 @@
+"""
+Image Derivative Service for result thumbnails and detection overlays
+Derivatives are rendered once from the original image and cached on disk.
+"""
+
+import os
+import re
+import json
+import hashlib
+import logging
+import tempfile
+from pathlib import Path
+from typing import Optional, List, Dict, Any
+from PIL import Image, ImageDraw
+
+from .file_storage import FileStorageService, get_storage_service
+
+class DerivativeKind:
+    THUMBNAIL = "thumb"
+    OVERLAY = "overlay"
+
+class ImageDerivativeService:
+    """
+    Generates and caches downscaled renders of stored blood smear images.
+    Cache entries are keyed by image content hash, kind and size, so they never go stale.
+    """
+
+    # Allowed output sizes (longest edge in pixels); requests snap up to the next size
+    SIZES = (128, 256, 512, 1024)
+    JPEG_QUALITY = 80
+
+    # Image hashes become cache file names, so only hex SHA-256 digests are accepted
+    HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+    def __init__(self, storage_service: FileStorageService, cache_path: str = None):
+        self.storage_service = storage_service
+        self.cache_path = Path(cache_path or os.getenv("DERIVATIVE_CACHE_PATH", "./storage/derivatives"))
+        self.cache_path.mkdir(parents=True, exist_ok=True)
+        logging.info(f"Image derivative cache initialized at: {self.cache_path}")
+
+    def normalize_size(self, size: int) -> int:
+        """Snap a requested size to the nearest allowed size at or above it."""
+        for allowed in self.SIZES:
+            if size <= allowed:
+                return allowed
+        return self.SIZES[-1]
+
+    @staticmethod
+    def detections_digest(detections: Optional[List[Dict[str, Any]]]) -> str:
+        """Short digest of a detection list, so overlays change if detections do."""
+        payload = json.dumps(detections or [], sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode()).hexdigest()[:12]
+
+    def cache_key(self, image_hash: str, kind: str, size: int, detections: Optional[List[Dict[str, Any]]] = None) -> str:
+        """
+        Build the cache key for a derivative.
+
+        Args:
+            image_hash: SHA-256 of the original image
+            kind: DerivativeKind value
+            size: Normalized output size
+            detections: Detections drawn on overlays (ignored for thumbnails)
+
+        Returns:
+            Key string, also used as the HTTP ETag
+
+        Raises:
+            ValueError: If image_hash is not a hex SHA-256 digest
+        """
+        if not isinstance(image_hash, str) or not self.HASH_PATTERN.match(image_hash):
+            raise ValueError(f"Invalid image hash: {image_hash!r}")
+        key = f"{image_hash}-{kind}-{size}"
+        if kind == DerivativeKind.OVERLAY:
+            key = f"{key}-{self.detections_digest(detections)}"
+        return key
+
+    def get_cached_path(self, key: str) -> Path:
+        """Get the on-disk location for a cache key (sharded by hash prefix)."""
+        return self.cache_path / key[:2] / f"{key}.jpg"
+
+    def get_thumbnail(self, relative_path: str, image_hash: str, size: int) -> tuple[Path, str]:
+        """
+        Get a thumbnail of a stored image, rendering it on first request.
+
+        Returns:
+            Tuple of (derivative_path, cache_key)
+        """
+        size = self.normalize_size(size)
+        key = self.cache_key(image_hash, DerivativeKind.THUMBNAIL, size)
+        path = self.get_cached_path(key)
+        if not path.exists():
+            self._render(relative_path, size, path)
+        return path, key
+
+    def get_overlay(
+        self,
+        relative_path: str,
+        image_hash: str,
+        detections: Optional[List[Dict[str, Any]]],
+        size: int,
+    ) -> tuple[Path, str]:
+        """
+        Get a downscaled render of a stored image with detection boxes drawn on it.
+
+        Returns:
+            Tuple of (derivative_path, cache_key)
+        """
+        size = self.normalize_size(size)
+        key = self.cache_key(image_hash, DerivativeKind.OVERLAY, size, detections)
+        path = self.get_cached_path(key)
+        if not path.exists():
+            self._render(relative_path, size, path, detections or [])
+        return path, key
+
+    def generate_all(self, relative_path: str, image_hash: str, detections: Optional[List[Dict[str, Any]]]) -> None:
+        """Eagerly render the default thumbnail and overlay for a new result."""
+        try:
+            self.get_thumbnail(relative_path, image_hash, 256)
+            self.get_overlay(relative_path, image_hash, detections, 512)
+        except Exception as e:
+            logging.error(f"Failed to pre-generate derivatives for {relative_path}: {str(e)}")
+
+    def _render(
+        self,
+        relative_path: str,
+        size: int,
+        target: Path,
+        detections: Optional[List[Dict[str, Any]]] = None,
+    ) -> None:
+        """Decode the original once at reduced scale and write a JPEG derivative atomically."""
+        source = self.storage_service.get_image_path(relative_path)
+
+        with Image.open(source) as image:
+            original_width, original_height = image.size
+            # Let the JPEG decoder downscale during decode instead of decoding full resolution
+            image.draft("RGB", (size, size))
+            image = image.convert("RGB")
+            image.thumbnail((size, size))
+
+            if detections is not None:
+                self._draw_detections(image, detections, image.width / original_width, image.height / original_height)
+
+            target.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=target.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    image.save(f, format="JPEG", quality=self.JPEG_QUALITY, optimize=True)
+                os.replace(temp_path, target)
+            except Exception:
+                if os.path.exists(temp_path):
+                    os.unlink(temp_path)
+                raise
+
+        logging.info(f"Rendered derivative {target.name} from {relative_path}")
+
+    @staticmethod
+    def _draw_detections(image: Image.Image, detections: List[Dict[str, Any]], scale_x: float, scale_y: float) -> None:
+        """Draw detection bounding boxes, scaled from original image coordinates."""
+        draw = ImageDraw.Draw(image)
+        line_width = max(1, image.width // 200)
+
+        for detection in detections:
+            bbox = detection.get("bbox")
+            if bbox is None and "x1" in detection:
+                bbox = [detection["x1"], detection["y1"], detection["x2"], detection["y2"]]
+            if not bbox or len(bbox) != 4:
+                continue
+
+            x1, y1, x2, y2 = bbox
+            box = [min(x1, x2) * scale_x, min(y1, y2) * scale_y, max(x1, x2) * scale_x, max(y1, y2) * scale_y]
+            draw.rectangle(box, outline=(220, 38, 38), width=line_width)
+
+            confidence = detection.get("confidence")
+            if confidence is not None:
+                draw.text((box[0] + 2, box[1] + 2), f"{float(confidence):.2f}", fill=(220, 38, 38))
+
+
+# Singleton instance
+_derivative_service = None
+
+def get_derivative_service() -> ImageDerivativeService:
+    """Get or create the singleton image derivative service instance."""
+    global _derivative_service
+    if _derivative_service is None:
+        _derivative_service = ImageDerivativeService(get_storage_service())
+    return _derivative_service
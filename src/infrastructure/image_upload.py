@@ -0,0 +1,121 @@
+"""
+Resumable image uploads for sync
+Sends blood smear images to the central server in checksummed chunks that resume after a drop.
+"""
+
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional
+from .file_storage import FileStorageService
+from .sync_transport import SyncTransport, SyncTransportError
+
+class ImageUploader:
+    """
+    Uploads images by content hash.
+
+    The server reports how many bytes of each image it already holds, so images it
+    has are skipped (dedupe across devices and re-syncs) and interrupted uploads
+    continue from the last accepted chunk. Up to max_in_flight images upload at once.
+    """
+
+    def __init__(
+        self,
+        transport: SyncTransport,
+        storage_service: FileStorageService,
+        chunk_size: int = None,
+        max_in_flight: int = None,
+        max_attempts: int = 3,
+    ):
+        self.transport = transport
+        self.storage_service = storage_service
+        self.chunk_size = chunk_size or int(os.getenv("SYNC_CHUNK_SIZE", str(256 * 1024)))
+        self.max_in_flight = max_in_flight or int(os.getenv("SYNC_UPLOAD_CONCURRENCY", "2"))
+        self.max_attempts = max_attempts
+
+    def upload(self, image_hash: str, relative_path: str, filename: str) -> bool:
+        """
+        Upload one image, resuming from the server's offset.
+
+        Returns:
+            True if bytes were sent, False if the server already had the image
+            or the local file is missing
+
+        Raises:
+            SyncTransportError: If a chunk kept failing or the server kept not advancing
+                its offset after max_attempts tries
+        """
+        file_path = self.storage_service.get_image_path(relative_path)
+        try:
+            size = file_path.stat().st_size
+        except FileNotFoundError:
+            logging.warning(f"Image {relative_path} is missing locally; syncing its result without it")
+            return False
+
+        offset = self.transport.get_upload_offset(image_hash, size, filename)
+        if offset >= size:
+            return False
+        if offset > 0:
+            logging.info(f"Resuming upload of {relative_path} at byte {offset} of {size}")
+
+        attempts = 0
+        with open(file_path, "rb") as f:
+            while offset < size:
+                f.seek(offset)
+                chunk = f.read(self.chunk_size)
+                sent = offset
+                try:
+                    offset = self.transport.upload_chunk(image_hash, offset, chunk)
+                except SyncTransportError:
+                    attempts += 1
+                    if attempts >= self.max_attempts:
+                        raise
+                    # The chunk may or may not have landed; ask the server where to continue
+                    offset = self.transport.get_upload_offset(image_hash, size, filename)
+                    continue
+                if offset > sent:
+                    attempts = 0
+                    continue
+                # Answered without taking the chunk (e.g. a 409 repeating the same offset)
+                attempts += 1
+                if attempts >= self.max_attempts:
+                    raise SyncTransportError(
+                        f"Central server did not advance upload of {relative_path} past byte {sent} after {attempts} attempts"
+                    )
+
+        logging.info(f"Uploaded image {relative_path} ({size} bytes)")
+        return True
+
+    def upload_all(self, images: List[Dict[str, Optional[str]]]) -> int:
+        """
+        Upload images concurrently, once per distinct hash.
+
+        Args:
+            images: Dicts with "hash", "path" and "filename"
+
+        Returns:
+            Number of images that were actually sent
+
+        Raises:
+            SyncTransportError: If any image failed (finished uploads are kept server-side)
+        """
+        unique = {image["hash"]: image for image in images if image["hash"]}
+        if not unique:
+            return 0
+
+        with ThreadPoolExecutor(max_workers=min(self.max_in_flight, len(unique)), thread_name_prefix="image-upload") as pool:
+            futures = [
+                pool.submit(self.upload, image["hash"], image["path"], image["filename"])
+                for image in unique.values()
+            ]
+            outcomes = []
+            for future in futures:
+                try:
+                    outcomes.append(future.result())
+                except SyncTransportError as e:
+                    outcomes.append(e)
+
+        errors = [outcome for outcome in outcomes if isinstance(outcome, SyncTransportError)]
+        if errors:
+            raise SyncTransportError(f"{len(errors)} of {len(unique)} image uploads failed: {str(errors[0])}")
+        return sum(1 for outcome in outcomes if outcome)
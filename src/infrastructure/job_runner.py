@@ -0,0 +1,50 @@
+"""
+Background Job Runner
+Runs persisted jobs on a bounded thread pool.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+from uuid import UUID
+
+class JobRunner:
+    """
+    Thread pool for long-running jobs whose state lives in the database.
+    The runner only carries job ids; handlers load and update the job row themselves,
+    so a restart loses nothing that the caller cannot re-submit from the table.
+    """
+
+    def __init__(self, name: str, handler: Callable[[UUID], None], max_workers: int):
+        self.name = name
+        self.handler = handler
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Create the worker pool."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+                logging.info(f"Job runner '{self.name}' started with {self.max_workers} workers")
+
+    def stop(self) -> None:
+        """Stop accepting jobs and wait for running ones to finish."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+            logging.info(f"Job runner '{self.name}' stopped")
+
+    def submit(self, job_id: UUID) -> None:
+        """Queue a job for execution, starting the pool if needed."""
+        self.start()
+        self._executor.submit(self._run, job_id)
+
+    def _run(self, job_id: UUID) -> None:
+        try:
+            self.handler(job_id)
+        except Exception as e:
+            logging.error(f"Job {job_id} on runner '{self.name}' crashed: {str(e)}", exc_info=True)
@@ -0,0 +1,145 @@
+"""
+Model updates for edge devices
+Downloads new model versions published by the central server, verifies them and hot-swaps them in.
+"""
+
+import os
+import gzip
+import json
+import shutil
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict, Any, Optional
+from .sync_transport import SyncTransport, SyncTransportError
+
+ACTIVE_MODEL_MANIFEST = "active.json"
+
+def get_model_dir() -> Path:
+    return Path(os.getenv("MODEL_DIR", "models"))
+
+def read_active_model(model_dir: Path = None) -> Optional[Dict[str, Any]]:
+    """
+    The model installed by the last update, if any.
+
+    Returns:
+        Dict with "version", "sha256" and "path", or None
+    """
+    manifest_path = (model_dir or get_model_dir()) / ACTIVE_MODEL_MANIFEST
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if not Path(manifest.get("path", "")).exists():
+        return None
+    return manifest
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ModelUpdater:
+    """
+    Keeps the inference model in step with the version the central server distributes.
+
+    Artifacts are downloaded (optionally gzip-compressed) into a partial file that
+    resumes after a dropped connection, decompressed, checked against the manifest's
+    SHA-256 and moved into place atomically. The inference service then loads the
+    new model alongside the old one and switches over without a restart. The active
+    version is recorded in MODEL_DIR/active.json so it is used after a restart too.
+    """
+
+    def __init__(self, transport: SyncTransport, inference_service=None, model_dir: Path = None):
+        self.transport = transport
+        self._inference_service = inference_service
+        self.model_dir = Path(model_dir) if model_dir is not None else get_model_dir()
+
+    @property
+    def inference_service(self):
+        if self._inference_service is None:
+            from .ai_inference import get_inference_service
+            self._inference_service = get_inference_service()
+        return self._inference_service
+
+    def current_version(self) -> Optional[str]:
+        active = read_active_model(self.model_dir)
+        return active["version"] if active is not None else None
+
+    def check_for_update(self) -> Optional[str]:
+        """
+        Install the central server's current model if it differs from the active one.
+
+        Returns:
+            The newly activated version, or None if nothing changed
+
+        Raises:
+            SyncTransportError: If the download failed or the artifact did not verify
+        """
+        manifest = self.transport.get_latest_model()
+        if manifest is None or manifest["version"] == self.current_version():
+            return None
+
+        model_path = self.install(manifest)
+        if not self.inference_service.swap_model(str(model_path), manifest["version"]):
+            logging.error(f"Model {manifest['version']} was downloaded but could not be loaded; keeping the current model")
+            return None
+
+        self._write_active(manifest, model_path)
+        logging.info(f"Activated model {manifest['version']}")
+        return manifest["version"]
+
+    def install(self, manifest: Dict[str, Any]) -> Path:
+        """
+        Download and verify a model artifact.
+
+        Returns:
+            Path of the verified model file
+
+        Raises:
+            SyncTransportError: If the download is incomplete or the checksum does not match
+        """
+        self.model_dir.mkdir(parents=True, exist_ok=True)
+        expected = manifest["sha256"].lower()
+        # Named by content hash so a manifest cannot point outside the model directory
+        model_path = self.model_dir / f"malaria_{expected[:16]}.onnx"
+        if model_path.exists() and _file_sha256(model_path) == expected:
+            return model_path
+
+        partial_path = self.model_dir / f"{model_path.name}.download"
+        size = self.transport.download(manifest["path"], partial_path)
+        if size < int(manifest["size"]):
+            raise SyncTransportError(f"Model download incomplete: {size} of {manifest['size']} bytes")
+
+        staged_path = self.model_dir / f"{model_path.name}.tmp"
+        try:
+            if manifest.get("compression") == "gzip":
+                with gzip.open(partial_path, "rb") as src, open(staged_path, "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+            else:
+                shutil.copyfile(partial_path, staged_path)
+        except (OSError, EOFError) as e:
+            staged_path.unlink(missing_ok=True)
+            raise SyncTransportError(f"Model {manifest['version']} could not be unpacked: {str(e)}") from e
+        finally:
+            # A corrupt artifact is downloaded again from scratch next time
+            partial_path.unlink(missing_ok=True)
+
+        actual = _file_sha256(staged_path)
+        if actual != expected:
+            staged_path.unlink()
+            raise SyncTransportError(f"Model {manifest['version']} failed verification: sha256 {actual} != {expected}")
+
+        os.replace(staged_path, model_path)
+        logging.info(f"Downloaded model {manifest['version']} to {model_path}")
+        return model_path
+
+    def _write_active(self, manifest: Dict[str, Any], model_path: Path) -> None:
+        manifest_path = self.model_dir / ACTIVE_MODEL_MANIFEST
+        staged_path = manifest_path.with_suffix(".tmp")
+        with open(staged_path, "w") as f:
+            json.dump({"version": manifest["version"], "sha256": manifest["sha256"].lower(), "path": str(model_path)}, f)
+        os.replace(staged_path, manifest_path)
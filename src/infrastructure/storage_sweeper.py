@@ -0,0 +1,150 @@
+"""
+Storage Sweeper for reconciling uploaded images against test results
+Promotes staged images whose rows were committed and removes orphaned files.
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Callable, Dict, Set, Tuple
+from sqlalchemy.orm import Session
+from src.database.core import SessionLocal
+from src.entities.test_result import TestResult
+from src.entities.analysis_job import AnalysisJob, JobStatus
+from .file_storage import FileStorageService, get_storage_service
+
+class StorageSweeper:
+    """
+    Reconciles the uploads directory with test_results.image_path.
+
+    - Staged images referenced by a committed row are promoted (crash between commit and promote).
+    - Staged images of queued or running analysis jobs are left in place.
+    - Staged images with no row are deleted once older than the grace period (failed or abandoned saves).
+    - Promoted images with no row are deleted once older than the grace period.
+    """
+
+    def __init__(
+        self,
+        storage_service: FileStorageService,
+        session_factory: Callable[[], Session],
+        interval_seconds: float = None,
+        grace_seconds: float = None,
+    ):
+        self.storage_service = storage_service
+        self.session_factory = session_factory
+        # Hourly by default; 0 disables the periodic orphan sweep (staged images are still recovered at startup)
+        self.interval_seconds = interval_seconds if interval_seconds is not None else float(os.getenv("STORAGE_SWEEP_INTERVAL_SECONDS", "3600"))
+        self.grace_seconds = grace_seconds if grace_seconds is not None else float(os.getenv("STORAGE_ORPHAN_GRACE_SECONDS", "86400"))
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def get_referenced_paths(self, db: Session) -> Tuple[Set[str], Set[str]]:
+        """
+        Load image paths referenced by test results and by unfinished analysis jobs
+        (single column, streamed).
+
+        Returns:
+            Tuple of (result_paths, pending_job_paths)
+        """
+        rows = db.query(TestResult.image_path).execution_options(yield_per=10000)
+        result_paths = {row.image_path for row in rows}
+
+        jobs = db.query(AnalysisJob.image_path).filter(
+            AnalysisJob.status.in_([JobStatus.Queued, JobStatus.Running])
+        )
+        job_paths = {row.image_path for row in jobs}
+        return result_paths, job_paths
+
+    def recover_staged(self) -> Dict[str, int]:
+        """Promote or clean up staged images only. Cheap enough to run at every startup."""
+        return self.sweep(include_orphans=False)
+
+    def sweep(self, include_orphans: bool = True) -> Dict[str, int]:
+        """
+        Run one reconciliation pass.
+
+        Args:
+            include_orphans: Also scan promoted images for files with no row
+
+        Returns:
+            Dictionary with sweep statistics
+        """
+        stats = {"promoted": 0, "discarded": 0, "orphans_removed": 0}
+        cutoff = time.time() - self.grace_seconds
+
+        db = self.session_factory()
+        try:
+            result_paths, job_paths = self.get_referenced_paths(db)
+        finally:
+            db.close()
+
+        for relative_path, file_path in list(self.storage_service.iter_staged_images()):
+            if relative_path in result_paths:
+                if self.storage_service.promote_image(relative_path):
+                    stats["promoted"] += 1
+            elif relative_path in job_paths:
+                continue
+            elif self._older_than(file_path, cutoff):
+                self.storage_service.discard_staged_image(relative_path)
+                stats["discarded"] += 1
+
+        if include_orphans:
+            for relative_path, file_path in list(self.storage_service.iter_stored_images()):
+                if relative_path not in result_paths and self._older_than(file_path, cutoff):
+                    if self.storage_service.delete_image(relative_path):
+                        stats["orphans_removed"] += 1
+
+        logging.info(
+            f"Storage sweep complete: {stats['promoted']} promoted, {stats['discarded']} staged discarded, "
+            f"{stats['orphans_removed']} orphans removed"
+        )
+        return stats
+
+    @staticmethod
+    def _older_than(file_path, cutoff: float) -> bool:
+        try:
+            return file_path.stat().st_mtime < cutoff
+        except FileNotFoundError:
+            return False
+
+    def start(self) -> None:
+        """Start the background sweeper thread (recovers staged images immediately)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="storage-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background sweeper thread."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        try:
+            self.recover_staged()
+        except Exception as e:
+            logging.error(f"Staged image recovery failed: {str(e)}")
+
+        if self.interval_seconds <= 0:
+            return
+
+        while not self._stop_event.wait(self.interval_seconds):
+            try:
+                self.sweep()
+            except Exception as e:
+                logging.error(f"Storage sweep failed: {str(e)}")
+
+
+# Singleton instance
+_storage_sweeper = None
+
+def get_storage_sweeper() -> StorageSweeper:
+    """Get or create the singleton storage sweeper instance."""
+    global _storage_sweeper
+    if _storage_sweeper is None:
+        _storage_sweeper = StorageSweeper(get_storage_service(), SessionLocal)
+    return _storage_sweeper
@@ -0,0 +1,195 @@
+"""
+Compact columnar encoding for sync change batches
+MessagePack body with a schema version; falls back to JSON when msgpack is unavailable.
+"""
+
+import enum
+from uuid import UUID
+from datetime import datetime, date, timezone, timedelta
+from typing import List, Dict, Any, Optional
+from sqlalchemy import DateTime, Date, Enum as SQLEnum
+from sqlalchemy.types import Uuid
+from .change_tracking import TRACKED_ENTITIES
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+SCHEMA_VERSION = 1
+MSGPACK_CONTENT_TYPE = "application/vnd.introspect.sync+msgpack"
+JSON_CONTENT_TYPE = "application/json"
+
+ENTITY_CODES = list(TRACKED_ENTITIES)
+OPERATION_CODES = ["upsert", "delete"]
+
+_EPOCH = datetime(1970, 1, 1)
+
+def msgpack_available() -> bool:
+    return msgpack is not None
+
+class _ColumnKind(enum.Enum):
+    Uuid = "uuid"
+    Timestamp = "timestamp"
+    Date = "date"
+    Enum = "enum"
+    Plain = "plain"
+
+def _column_kinds(entity) -> Dict[str, tuple]:
+    """Map each column of an entity to its encoding kind (and enum values where needed)."""
+    kinds = {}
+    for column in entity.__table__.columns:
+        column_type = column.type
+        if isinstance(column_type, Uuid):
+            kinds[column.key] = (_ColumnKind.Uuid, None)
+        elif isinstance(column_type, DateTime):
+            kinds[column.key] = (_ColumnKind.Timestamp, None)
+        elif isinstance(column_type, Date):
+            kinds[column.key] = (_ColumnKind.Date, None)
+        elif isinstance(column_type, SQLEnum) and column_type.enum_class is not None:
+            kinds[column.key] = (_ColumnKind.Enum, [member.value for member in column_type.enum_class])
+        else:
+            kinds[column.key] = (_ColumnKind.Plain, None)
+    return kinds
+
+_KINDS = {entity_type: _column_kinds(entity) for entity_type, entity in TRACKED_ENTITIES.items()}
+
+def _to_micros(value: str) -> int:
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    delta = parsed - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+def _from_micros(value: int) -> str:
+    seconds, micros = divmod(value, 1_000_000)
+    days, seconds = divmod(seconds, 86400)
+    return (_EPOCH + timedelta(days=days, seconds=seconds, microseconds=micros)).isoformat()
+
+def _delta_encode(values: List[Optional[int]]) -> List[Optional[int]]:
+    """Store each non-null value as the difference from the previous non-null one."""
+    encoded, previous = [], 0
+    for value in values:
+        if value is None:
+            encoded.append(None)
+        else:
+            encoded.append(value - previous)
+            previous = value
+    return encoded
+
+def _delta_decode(values: List[Optional[int]]) -> List[Optional[int]]:
+    decoded, previous = [], 0
+    for value in values:
+        if value is None:
+            decoded.append(None)
+        else:
+            previous += value
+            decoded.append(previous)
+    return decoded
+
+def _encode_column(kind: _ColumnKind, enum_values, values: List[Any]) -> List[Any]:
+    if kind == _ColumnKind.Uuid:
+        return [UUID(value).bytes if value is not None else None for value in values]
+    if kind == _ColumnKind.Timestamp:
+        return _delta_encode([_to_micros(value) if value is not None else None for value in values])
+    if kind == _ColumnKind.Date:
+        return [date.fromisoformat(value).toordinal() if value is not None else None for value in values]
+    if kind == _ColumnKind.Enum:
+        return [enum_values.index(value) if value is not None else None for value in values]
+    return values
+
+def _decode_column(kind: _ColumnKind, enum_values, values: List[Any]) -> List[Any]:
+    if kind == _ColumnKind.Uuid:
+        return [str(UUID(bytes=value)) if value is not None else None for value in values]
+    if kind == _ColumnKind.Timestamp:
+        return [_from_micros(value) if value is not None else None for value in _delta_decode(values)]
+    if kind == _ColumnKind.Date:
+        return [date.fromordinal(value).isoformat() if value is not None else None for value in values]
+    if kind == _ColumnKind.Enum:
+        return [enum_values[value] if value is not None else None for value in values]
+    return values
+
+def encode_changes(device_id: str, changes: List[Dict[str, Any]]) -> bytes:
+    """
+    Encode a change batch (the JSON wire items) as columnar MessagePack.
+
+    Layout: change headers are parallel arrays (delta-encoded seqs, entity and operation
+    codes, 16-byte ids); record data is grouped per entity into one array per column,
+    with UUIDs as 16 bytes, enums as codes and timestamps as delta-encoded microseconds.
+    """
+    if msgpack is None:
+        raise RuntimeError("msgpack is not installed")
+
+    tables: Dict[str, Dict[str, Any]] = {}
+    for index, change in enumerate(changes):
+        if change["data"] is None:
+            continue
+        table = tables.setdefault(change["entity"], {"rows": [], "data": []})
+        table["rows"].append(index)
+        table["data"].append(change["data"])
+
+    encoded_tables = {}
+    for entity_type, table in tables.items():
+        columns = {}
+        for name, (kind, enum_values) in _KINDS[entity_type].items():
+            if name not in table["data"][0]:
+                continue
+            columns[name] = _encode_column(kind, enum_values, [row[name] for row in table["data"]])
+        encoded_tables[entity_type] = {"rows": table["rows"], "columns": columns}
+
+    body = {
+        "v": SCHEMA_VERSION,
+        "device_id": device_id,
+        "seq": _delta_encode([change["seq"] for change in changes]),
+        "entity": [ENTITY_CODES.index(change["entity"]) for change in changes],
+        "op": [OPERATION_CODES.index(change["op"]) for change in changes],
+        "id": [UUID(change["id"]).bytes for change in changes],
+        "tables": encoded_tables,
+    }
+    return msgpack.packb(body, use_bin_type=True)
+
+def decode_changes(payload: bytes) -> Dict[str, Any]:
+    """
+    Decode a columnar MessagePack batch back into the JSON wire form.
+
+    Returns:
+        {"device_id": ..., "changes": [...]} identical to the JSON request body
+
+    Raises:
+        ValueError: If the payload is malformed or uses an unsupported schema version
+    """
+    if msgpack is None:
+        raise RuntimeError("msgpack is not installed")
+
+    try:
+        body = msgpack.unpackb(payload, raw=False)
+        version = body.get("v")
+        if version != SCHEMA_VERSION:
+            raise ValueError(f"Unsupported sync schema version: {version}")
+
+        seqs = _delta_decode(body["seq"])
+        changes = [
+            {
+                "seq": seq,
+                "entity": ENTITY_CODES[entity],
+                "op": OPERATION_CODES[op],
+                "id": str(UUID(bytes=row_id)),
+                "data": None,
+            }
+            for seq, entity, op, row_id in zip(seqs, body["entity"], body["op"], body["id"])
+        ]
+
+        for entity_type, table in body["tables"].items():
+            kinds = _KINDS[entity_type]
+            # Columns added by a newer device are dropped, as in JSON batches, so the rest still syncs
+            columns = {
+                name: _decode_column(*kinds[name], values)
+                for name, values in table["columns"].items()
+                if name in kinds
+            }
+            for position, index in enumerate(table["rows"]):
+                changes[index]["data"] = {name: values[position] for name, values in columns.items()}
+
+        return {"device_id": body["device_id"], "changes": changes}
+    except (KeyError, IndexError, TypeError, msgpack.UnpackException) as e:
+        raise ValueError(f"Malformed sync payload: {str(e)}") from e
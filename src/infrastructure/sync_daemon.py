@@ -0,0 +1,275 @@
+"""
+Background Sync Daemon
+Ships local changes to the central server whenever it is reachable.
+"""
+
+import os
+import time
+import socket
+import random
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Dict, Any
+from urllib.parse import urlsplit
+from sqlalchemy.orm import Session
+from src.database.core import SessionLocal
+from .sync_service import SyncService, get_sync_service
+from .sync_transport import SyncTransportError
+
+class SyncDaemon:
+    """
+    Always-on sync worker.
+
+    Each cycle it checks connectivity with a TCP connect to the central server,
+    then pushes queued changes batch by batch, pulls central clinic and patient
+    changes and installs a new model version if one is published. Failures back off exponentially
+    with jitter, and an optional byte budget per hour throttles uploads on
+    metered links. A cycle can also be triggered on demand.
+    """
+
+    BUDGET_WINDOW_SECONDS = 3600
+
+    def __init__(
+        self,
+        sync_service: SyncService,
+        session_factory: Callable[[], Session],
+        interval_seconds: float = None,
+        base_backoff_seconds: float = None,
+        max_backoff_seconds: float = None,
+        bandwidth_bytes_per_hour: int = None,
+        connect_timeout_seconds: float = 3.0,
+    ):
+        self.sync_service = sync_service
+        self.session_factory = session_factory
+        self.interval_seconds = interval_seconds if interval_seconds is not None else float(os.getenv("SYNC_INTERVAL_SECONDS", "60"))
+        self.base_backoff_seconds = base_backoff_seconds if base_backoff_seconds is not None else float(os.getenv("SYNC_BACKOFF_SECONDS", "5"))
+        self.max_backoff_seconds = max_backoff_seconds if max_backoff_seconds is not None else float(os.getenv("SYNC_MAX_BACKOFF_SECONDS", "1800"))
+        # 0 disables the budget
+        self.bandwidth_bytes_per_hour = bandwidth_bytes_per_hour if bandwidth_bytes_per_hour is not None else int(os.getenv("SYNC_BANDWIDTH_BYTES_PER_HOUR", "0"))
+        self.connect_timeout_seconds = connect_timeout_seconds
+
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._sent = deque()  # (timestamp, bytes) within the budget window
+        self._consecutive_failures = 0
+        self._progress: Dict[str, Any] = {
+            "state": "stopped",
+            "online": None,
+            "pending": None,
+            "current_run": None,
+            "synced_total": 0,
+            "failed_total": 0,
+            "bytes_sent": 0,
+            "pulled_total": 0,
+            "model_version": None,
+            "consecutive_failures": 0,
+            "last_attempt_at": None,
+            "last_success_at": None,
+            "next_attempt_at": None,
+            "last_error": None,
+        }
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def get_progress(self) -> Dict[str, Any]:
+        """Snapshot of the daemon's state and counters."""
+        with self._lock:
+            progress = dict(self._progress)
+            if progress["current_run"] is not None:
+                progress["current_run"] = dict(progress["current_run"])
+            return progress
+
+    def _update(self, **values) -> None:
+        with self._lock:
+            self._progress.update(values)
+
+    def is_online(self) -> bool:
+        """Cheap connectivity probe: open and close a TCP connection to the central server."""
+        parts = urlsplit(self.sync_service.central_server_url or "")
+        if not parts.hostname:
+            return False
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        try:
+            with socket.create_connection((parts.hostname, port), timeout=self.connect_timeout_seconds):
+                return True
+        except OSError:
+            return False
+
+    def backoff_delay(self, failures: int) -> float:
+        """Exponential backoff capped at max_backoff_seconds, with equal jitter."""
+        delay = min(self.max_backoff_seconds, self.base_backoff_seconds * (2 ** max(failures - 1, 0)))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def budget_wait_seconds(self, now: float = None) -> float:
+        """Seconds until the bandwidth budget allows another batch (0 if it does now)."""
+        if self.bandwidth_bytes_per_hour <= 0:
+            return 0.0
+        now = now if now is not None else time.monotonic()
+        window_start = now - self.BUDGET_WINDOW_SECONDS
+        while self._sent and self._sent[0][0] <= window_start:
+            self._sent.popleft()
+        if sum(size for _, size in self._sent) < self.bandwidth_bytes_per_hour:
+            return 0.0
+        return self._sent[0][0] - window_start
+
+    def run_once(self) -> Dict[str, int]:
+        """
+        Run one sync cycle.
+
+        Returns:
+            Dictionary with cycle statistics, and the errors of the pull and model
+            update steps under "errors"
+
+        Raises:
+            SyncTransportError: If the server is unreachable or a batch was not delivered
+        """
+        self._update(state="syncing", last_attempt_at=datetime.now(timezone.utc), next_attempt_at=None)
+        if not self.is_online():
+            self._update(online=False)
+            raise SyncTransportError("Central server is unreachable")
+        self._update(online=True)
+
+        db = self.session_factory()
+        try:
+            pending = self.sync_service.count_unsynced_changes(db)
+            run = {"total": pending, "synced": 0, "failed": 0, "pulled": 0}
+            self._update(pending=pending, current_run=dict(run))
+
+            for rows in self.sync_service.iter_change_batches(db):
+                wait = self.budget_wait_seconds()
+                if wait > 0:
+                    self._update(state="throttled")
+                    logging.info(f"Sync bandwidth budget exhausted, pausing {wait:.0f}s")
+                    if self._stop_event.wait(wait):
+                        break
+                    self._update(state="syncing")
+                if self._stop_event.is_set():
+                    break
+
+                bytes_before = self.sync_service.transport.bytes_sent
+                batch_stats = self.sync_service.sync_change_batch(db, rows)
+                sent = self.sync_service.transport.bytes_sent - bytes_before
+                self._sent.append((time.monotonic(), sent))
+
+                pending -= len(rows)
+                run["synced"] += batch_stats["synced"]
+                run["failed"] += batch_stats["failed"] + batch_stats["unacknowledged"]
+                with self._lock:
+                    self._progress["current_run"] = dict(run)
+                    self._progress["pending"] = max(pending, 0)
+                    self._progress["synced_total"] += batch_stats["synced"]
+                    self._progress["failed_total"] += batch_stats["failed"]
+                    self._progress["bytes_sent"] += sent
+
+            # Pull and model updates are best effort: a failure is reported but does not
+            # fail the push or grow its backoff
+            run["errors"] = []
+            if not self._stop_event.is_set():
+                try:
+                    pulled = self.sync_service.pull_changes(db)
+                    run["pulled"] = pulled["applied"]
+                    with self._lock:
+                        self._progress["pulled_total"] += pulled["applied"]
+                except Exception as e:
+                    db.rollback()
+                    logging.warning(f"Pulling central changes failed: {str(e)}")
+                    run["errors"].append(f"Pull failed: {str(e)}")
+
+                model_updater = self.sync_service.model_updater
+                if model_updater is not None:
+                    try:
+                        model_updater.check_for_update()
+                    except Exception as e:
+                        logging.warning(f"Model update check failed: {str(e)}")
+                        run["errors"].append(f"Model update failed: {str(e)}")
+                    self._update(model_version=model_updater.current_version())
+            return run
+        finally:
+            db.close()
+
+    def trigger(self) -> None:
+        """Run a cycle as soon as possible instead of waiting for the interval."""
+        self._consecutive_failures = 0
+        self._wake_event.set()
+
+    def start(self) -> None:
+        """Start the daemon thread if a central server is configured."""
+        if not self.sync_service.is_configured:
+            logging.info("Sync daemon not started: no central server configured")
+            return
+        if self.is_running:
+            return
+        self._stop_event.clear()
+        self._wake_event.set()  # first cycle runs immediately
+        self._thread = threading.Thread(target=self._run, name="sync-daemon", daemon=True)
+        self._thread.start()
+        logging.info("Sync daemon started")
+
+    def stop(self) -> None:
+        """Stop the daemon thread after the current batch."""
+        self._stop_event.set()
+        self._wake_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        self._update(state="stopped", next_attempt_at=None)
+
+    def _run(self) -> None:
+        db = self.session_factory()
+        try:
+            self.sync_service.seed_change_log(db)
+        except Exception as e:
+            logging.error(f"Seeding the sync change log failed: {str(e)}")
+        finally:
+            db.close()
+
+        delay = 0.0
+        while not self._stop_event.is_set():
+            self._wake_event.wait(delay)
+            self._wake_event.clear()
+            if self._stop_event.is_set():
+                break
+
+            try:
+                run = self.run_once()
+                self._consecutive_failures = 0
+                self._update(last_success_at=datetime.now(timezone.utc), last_error="; ".join(run["errors"]) or None)
+                if run["total"]:
+                    logging.info(f"Sync daemon cycle: {run['synced']} synced, {run['failed']} failed out of {run['total']}")
+                delay = self.interval_seconds
+            except SyncTransportError as e:
+                self._consecutive_failures += 1
+                delay = self.backoff_delay(self._consecutive_failures)
+                if e.retry_after is not None:
+                    # An overloaded server says when to come back; never retry sooner
+                    delay = max(delay, e.retry_after)
+                logging.warning(f"Sync daemon cycle failed ({self._consecutive_failures} in a row), retrying in {delay:.0f}s: {str(e)}")
+                self._update(last_error=str(e))
+            except Exception as e:
+                self._consecutive_failures += 1
+                delay = self.backoff_delay(self._consecutive_failures)
+                logging.error(f"Sync daemon cycle crashed: {str(e)}", exc_info=True)
+                self._update(last_error=str(e))
+
+            self._update(
+                state="idle",
+                consecutive_failures=self._consecutive_failures,
+                next_attempt_at=datetime.fromtimestamp(time.time() + delay, timezone.utc),
+            )
+
+
+# Singleton instance
+_sync_daemon = None
+
+def get_sync_daemon() -> SyncDaemon:
+    """Get or create the singleton sync daemon instance."""
+    global _sync_daemon
+    if _sync_daemon is None:
+        _sync_daemon = SyncDaemon(get_sync_service(), SessionLocal)
+    return _sync_daemon
@@ -1,143 +1,568 @@
 """
 Sync Service for offline-first capability
-Handles synchronization of test results when connection is available
+Handles synchronization of local changes when connection is available
 """
 
-from datetime import datetime, timezone
+import os
+import enum
+from uuid import UUID
+from datetime import datetime, date, timezone
+from sqlalchemy import select, insert, delete, literal, exists, func, and_, DateTime, Date, Enum as SQLEnum
+from sqlalchemy.types import Uuid
 from sqlalchemy.orm import Session
-from typing import List, Dict
+from typing import Iterator, List, Dict, Any, Tuple
 from src.entities.test_result import TestResult, SyncStatus
+from src.entities.sync_change import ChangeLog, ChangeOperation, SyncState
+from src.exceptions import SyncNotConfiguredError
+from src.database.upsert import upsert_rows
+from src.dashboard.rollups import clinics_changing_timezone, refresh_clinic_stats
+from .change_tracking import TRACKED_ENTITIES
+from .sync_transport import SyncTransport, SyncTransportError
+from .image_upload import ImageUploader
+from .model_updater import ModelUpdater
+from .file_storage import get_storage_service
 import logging
 
 class SyncService:
     """
-    Service for synchronizing offline test results.
-    In a production environment, this would sync with a central server.
+    Service for delta synchronization with the central server.
+
+    Every mutation of a clinic, patient or test result is recorded in the change log
+    with a monotonic sequence number (see change_tracking). Sync ships only changes
+    after the watermark the server last acknowledged, so an incremental sync costs
+    O(changes) rather than O(table). Acknowledged log entries are pruned.
+
+    In the other direction, central changes to clinics and patients are pulled from
+    the server's change feed after a separately stored cursor, so the patient registry
+    is available locally without a connection.
     """
-    
-    def __init__(self, central_server_url: str = None):
-        self.central_server_url = central_server_url or "https://api.introspect.example.com"
-        logging.info(f"Sync service initialized with server: {self.central_server_url}")
-    
-    def get_pending_results(self, db: Session) -> List[TestResult]:
-        """Get all test results pending synchronization."""
-        pending = db.query(TestResult).filter(
-            TestResult.sync_status == SyncStatus.Pending
-        ).all()
-        logging.info(f"Found {len(pending)} results pending sync")
-        return pending
-    
-    def sync_result(self, db: Session, result: TestResult) -> bool:
-        """
-        Sync a single test result to the central server.
-        
-        Args:
-            db: Database session
-            result: TestResult to sync
-            
+
+    STATE_NAME = "central"
+    PULL_STATE_NAME = "central_pull"
+
+    # Entities the central server is authoritative for, parents first
+    PULLED_ENTITIES = ("clinic", "patient")
+
+    # Local-only columns that are never sent
+    PAYLOAD_EXCLUDED_COLUMNS = {
+        TestResult: {"image_path", "sync_status", "synced_at"},
+    }
+
+    def __init__(
+        self,
+        central_server_url: str = None,
+        transport: SyncTransport = None,
+        batch_size: int = None,
+        image_uploader: ImageUploader = None,
+        model_updater: ModelUpdater = None,
+    ):
+        self.central_server_url = central_server_url or os.getenv("CENTRAL_SERVER_URL")
+        self.batch_size = batch_size or int(os.getenv("SYNC_BATCH_SIZE", "100"))
+        self.transport = transport
+        if self.transport is None and self.central_server_url:
+            self.transport = SyncTransport(self.central_server_url)
+        self.image_uploader = image_uploader
+        if self.image_uploader is None and self.transport is not None:
+            self.image_uploader = ImageUploader(self.transport, get_storage_service())
+        self.model_updater = model_updater
+        if self.model_updater is None and self.transport is not None:
+            self.model_updater = ModelUpdater(self.transport)
+
+        if self.transport is None:
+            logging.warning("Sync service initialized without a central server; sync is disabled")
+        else:
+            logging.info(f"Sync service initialized with server: {self.transport.base_url}")
+
+    @property
+    def is_configured(self) -> bool:
+        return self.transport is not None
+
+    @classmethod
+    def payload_columns(cls, entity) -> list:
+        """Columns of an entity that are sent to the central server."""
+        excluded = cls.PAYLOAD_EXCLUDED_COLUMNS.get(entity, set())
+        return [getattr(entity, column.key) for column in entity.__table__.columns if column.key not in excluded]
+
+    @staticmethod
+    def serialize_row(row, columns) -> Dict[str, Any]:
+        """Convert a loaded row (ORM object or column tuple) to JSON-compatible values."""
+        data = {}
+        for column in columns:
+            value = getattr(row, column.key)
+            if isinstance(value, UUID):
+                value = str(value)
+            elif isinstance(value, (datetime, date)):
+                value = value.isoformat()
+            elif isinstance(value, enum.Enum):
+                value = value.value
+            data[column.key] = value
+        return data
+
+    @staticmethod
+    def deserialize_row(entity, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Convert wire data back to column values of entity; the inverse of serialize_row.
+        Keys that are not columns are dropped, and columns missing from data are left out.
+
+        Raises:
+            ValueError: If a value does not parse as its column's type
+        """
+        values = {}
+        for column in entity.__table__.columns:
+            if column.key not in data:
+                continue
+            value = data[column.key]
+            if value is not None:
+                column_type = column.type
+                if isinstance(column_type, Uuid):
+                    value = UUID(value)
+                elif isinstance(column_type, DateTime):
+                    value = datetime.fromisoformat(value)
+                elif isinstance(column_type, Date):
+                    value = date.fromisoformat(value)
+                elif isinstance(column_type, SQLEnum) and column_type.enum_class is not None:
+                    value = column_type.enum_class(value)
+            values[column.key] = value
+        return values
+
+    @classmethod
+    def serialize_result(cls, result) -> Dict[str, Any]:
+        """Build the sync payload for one test result."""
+        return cls.serialize_row(result, cls.payload_columns(TestResult))
+
+    # Watermark
+
+    def get_watermark(self, db: Session) -> int:
+        """Highest change seq acknowledged by the central server."""
+        state = db.get(SyncState, self.STATE_NAME)
+        return state.watermark if state is not None else 0
+
+    def _set_watermark(self, db: Session, watermark: int) -> None:
+        state = db.get(SyncState, self.STATE_NAME)
+        if state is None:
+            db.add(SyncState(name=self.STATE_NAME, watermark=watermark))
+        elif watermark < state.watermark:
+            # Log entries below our watermark were already pruned; never move backwards
+            logging.warning(f"Central server watermark {watermark} is behind local watermark {state.watermark}")
+        else:
+            state.watermark = watermark
+
+    def seed_change_log(self, db: Session) -> int:
+        """
+        Backfill the change log from existing rows the first time sync runs.
+
+        Enqueues every clinic and patient and every test result not yet synced,
+        parents first. Does nothing once sync state exists.
+
         Returns:
-            True if sync successful, False otherwise
-        """
-        try:
-            # PLACEHOLDER: In production, this would make an HTTP request to central server
-            # Example:
-            # import requests
-            # response = requests.post(
-            #     f"{self.central_server_url}/api/sync/results",
-            #     json={
-            #         "id": str(result.id),
-            #         "patient_id": str(result.patient_id),
-            #         "clinic_id": str(result.clinic_id),
-            #         "result": result.result.value,
-            #         "confidence_score": result.confidence_score,
-            #         "test_date": result.test_date.isoformat(),
-            #         # ... other fields
-            #     },
-            #     headers={"Authorization": f"Bearer {api_token}"}
-            # )
-            # if response.status_code != 200:
-            #     raise Exception(f"Sync failed: {response.text}")
-            
-            # Simulate successful sync
-            result.sync_status = SyncStatus.Synced
-            result.synced_at = datetime.now(timezone.utc)
-            db.commit()
-            
-            logging.info(f"Successfully synced result {result.id}")
-            return True
-            
-        except Exception as e:
-            logging.error(f"Failed to sync result {result.id}: {str(e)}")
-            result.sync_status = SyncStatus.Failed
-            db.commit()
-            return False
-    
+            Number of changes enqueued
+        """
+        if db.get(SyncState, self.STATE_NAME) is not None:
+            return 0
+
+        now = datetime.now(timezone.utc)
+        seeded = 0
+        for entity_type, entity in TRACKED_ENTITIES.items():
+            source = select(literal(entity_type), entity.id, literal(ChangeOperation.Upsert.value), literal(now))
+            if entity is TestResult:
+                source = source.where(TestResult.sync_status != SyncStatus.Synced)
+            result = db.execute(insert(ChangeLog).from_select(
+                ["entity_type", "entity_id", "operation", "changed_at"], source
+            ))
+            seeded += result.rowcount
+
+        db.add(SyncState(name=self.STATE_NAME, watermark=0))
+        db.commit()
+        logging.info(f"Seeded change log with {seeded} existing records")
+        return seeded
+
+    # Change batches
+
+    def count_unsynced_changes(self, db: Session) -> int:
+        """Number of change log entries after the watermark."""
+        return db.query(ChangeLog).filter(ChangeLog.seq > self.get_watermark(db)).count()
+
+    def iter_change_batches(self, db: Session) -> Iterator[List]:
+        """
+        Stream change log entries after the watermark, batch_size at a time, in seq order.
+
+        Each batch is a separate keyset query (seq > last seq), so the caller can commit
+        between batches and memory stays flat however large the backlog is.
+        """
+        after = self.get_watermark(db)
+        while True:
+            rows = db.query(ChangeLog.seq, ChangeLog.entity_type, ChangeLog.entity_id, ChangeLog.operation).filter(
+                ChangeLog.seq > after
+            ).order_by(ChangeLog.seq).limit(self.batch_size).all()
+            if not rows:
+                return
+            yield rows
+            if len(rows) < self.batch_size:
+                return
+            after = rows[-1].seq
+
+    @classmethod
+    def build_changes(cls, db: Session, rows: List) -> Tuple[List[Dict[str, Any]], Dict[Tuple[str, UUID], List[int]]]:
+        """
+        Build wire items for a batch of change log rows.
+
+        Multiple changes to the same entity collapse into one item carrying its current
+        state and the latest seq. Entities that no longer exist are sent as deletes.
+
+        Returns:
+            Tuple of (items, seqs covered by each (entity_type, entity_id))
+        """
+        latest: Dict[Tuple[str, UUID], Any] = {}
+        covered: Dict[Tuple[str, UUID], List[int]] = {}
+        for row in rows:
+            key = (row.entity_type, row.entity_id)
+            latest[key] = row
+            covered.setdefault(key, []).append(row.seq)
+
+        # Load the current state of every upserted entity, one query per entity type
+        states: Dict[Tuple[str, UUID], Dict[str, Any]] = {}
+        for entity_type, entity in TRACKED_ENTITIES.items():
+            ids = [key[1] for key, row in latest.items() if key[0] == entity_type and row.operation == ChangeOperation.Upsert.value]
+            if not ids:
+                continue
+            columns = cls.payload_columns(entity)
+            for state in db.query(*columns).filter(entity.id.in_(ids)):
+                states[(entity_type, state.id)] = cls.serialize_row(state, columns)
+
+        items = []
+        for key, row in sorted(latest.items(), key=lambda item: item[1].seq):
+            data = states.get(key)
+            items.append({
+                "seq": row.seq,
+                "entity": row.entity_type,
+                "op": ChangeOperation.Upsert.value if data is not None else ChangeOperation.Delete.value,
+                "id": str(row.entity_id),
+                "data": data,
+            })
+        return items, covered
+
+    def upload_images(self, db: Session, items: List[Dict[str, Any]]) -> int:
+        """
+        Upload the images of the test results upserted in a batch of change items.
+        Fills in image_hash on items whose row predates image hashing.
+
+        Returns:
+            Number of images sent (images the server already has are skipped)
+
+        Raises:
+            SyncTransportError: If an image upload failed; completed chunks are kept for resuming
+        """
+        results = {item["id"]: item for item in items if item["entity"] == "test_result" and item["data"] is not None}
+        if not results or self.image_uploader is None:
+            return 0
+
+        storage_service = self.image_uploader.storage_service
+        images = []
+        rows = db.query(TestResult.id, TestResult.image_path, TestResult.image_filename, TestResult.image_hash).filter(
+            TestResult.id.in_([UUID(result_id) for result_id in results])
+        )
+        for row in rows:
+            image_hash = row.image_hash
+            if image_hash is None:
+                try:
+                    image_hash = storage_service.hash_image(row.image_path)
+                except FileNotFoundError:
+                    logging.warning(f"Image for result {row.id} is missing locally; syncing the result without it")
+                    continue
+                results[str(row.id)]["data"]["image_hash"] = image_hash
+            images.append({"hash": image_hash, "path": row.image_path, "filename": row.image_filename})
+
+        return self.image_uploader.upload_all(images)
+
+    def sync_change_batch(self, db: Session, rows: List) -> Dict[str, int]:
+        """
+        Push one batch of changes and record the server's acknowledgements.
+
+        Test results whose change was accepted are marked synced (unless edited again
+        meanwhile) and rejected ones failed, with one set-based UPDATE each. Acknowledged log entries
+        are pruned and the local watermark moves to the server's, capped below the lowest
+        entry still unacknowledged, all in one commit. Stats count change log entries.
+
+        Raises:
+            SyncNotConfiguredError: If no central server is configured
+            SyncTransportError: If the batch was not delivered
+        """
+        if not self.is_configured:
+            raise SyncNotConfiguredError()
+
+        items, covered = self.build_changes(db, rows)
+        # Images go first: a result is only useful centrally with its smear
+        self.upload_images(db, items)
+        acks, watermark = self.transport.post_changes(items)
+
+        stats = {"synced": 0, "failed": 0, "unacknowledged": 0}
+        accepted, rejected = [], []
+        for item in items:
+            key = (item["entity"], UUID(item["id"]))
+            count = len(covered[key])
+            if item["seq"] not in acks:
+                stats["unacknowledged"] += count
+                continue
+            if acks[item["seq"]] is None:
+                stats["synced"] += count
+                if item["entity"] == "test_result":
+                    accepted.append(key[1])
+            else:
+                logging.error(f"Central server rejected {item['entity']} {item['id']}: {acks[item['seq']]}")
+                stats["failed"] += count
+                if item["entity"] == "test_result":
+                    rejected.append(key[1])
+
+        # A result changed again after this batch was read has a newer change queued; keep it pending
+        not_changed_since = ~exists().where(ChangeLog.entity_id == TestResult.id, ChangeLog.seq > rows[-1].seq)
+        self._set_sync_status(db, accepted, SyncStatus.Synced, not_changed_since, synced_at=datetime.now(timezone.utc))
+        self._set_sync_status(db, rejected, SyncStatus.Failed, not_changed_since)
+
+        acknowledged = [seq for item in items if item["seq"] in acks for seq in covered[(item["entity"], UUID(item["id"]))]]
+        db.query(ChangeLog).filter(ChangeLog.seq.in_(acknowledged)).delete(synchronize_session=False)
+        # Whatever is left at or below the server's watermark was never acknowledged (in this
+        # batch or an earlier one); stop short of it so it is sent again
+        unacknowledged = db.query(func.min(ChangeLog.seq)).filter(ChangeLog.seq <= watermark).scalar()
+        if unacknowledged is not None:
+            watermark = unacknowledged - 1
+        self._set_watermark(db, watermark)
+        db.commit()
+        return stats
+
+    @staticmethod
+    def _set_sync_status(db: Session, result_ids: List, status: SyncStatus, *criteria, **values) -> int:
+        """Flip the sync status of many results with one UPDATE ... WHERE id IN (...), without loading them."""
+        if not result_ids:
+            return 0
+        return db.query(TestResult).filter(TestResult.id.in_(result_ids), *criteria).update(
+            {TestResult.sync_status: status, **{getattr(TestResult, k): v for k, v in values.items()}},
+            synchronize_session=False,
+        )
+
+    def _sync_in_batches(self, db: Session, total: int) -> Dict[str, int]:
+        """
+        Send unsynced changes batch by batch, one commit per batch.
+        Stops at the first batch that cannot be delivered; it and the rest stay queued.
+        """
+        stats = {"synced": 0, "failed": 0}
+        processed = 0
+        for rows in self.iter_change_batches(db):
+            try:
+                batch_stats = self.sync_change_batch(db, rows)
+            except SyncTransportError as e:
+                remaining = max(total - processed, len(rows))
+                logging.error(f"Sync batch failed, {remaining} changes left queued: {str(e)}")
+                stats["failed"] += remaining
+                db.rollback()
+                break
+            processed += len(rows)
+            stats["synced"] += batch_stats["synced"]
+            stats["failed"] += batch_stats["failed"] + batch_stats["unacknowledged"]
+        return stats
+
     def sync_all_pending(self, db: Session) -> Dict[str, int]:
         """
-        Sync all pending test results.
-        
+        Ship every change after the watermark in batches of batch_size.
+
         Returns:
-            Dictionary with sync statistics
+            Dictionary with sync statistics (counted in changes)
         """
-        pending_results = self.get_pending_results(db)
-        
+        if not self.is_configured:
+            raise SyncNotConfiguredError()
+
+        total = self.count_unsynced_changes(db)
+        logging.info(f"Found {total} changes pending sync")
+        batch_stats = self._sync_in_batches(db, total)
+
         stats = {
-            "total": len(pending_results),
-            "synced": 0,
-            "failed": 0
+            "total": total,
+            "synced": batch_stats["synced"],
+            "failed": batch_stats["failed"]
         }
-        
-        for result in pending_results:
-            if self.sync_result(db, result):
-                stats["synced"] += 1
-            else:
-                stats["failed"] += 1
-        
+
         logging.info(f"Sync complete: {stats['synced']} synced, {stats['failed']} failed out of {stats['total']}")
         return stats
-    
+
     def retry_failed_syncs(self, db: Session) -> Dict[str, int]:
         """
         Retry synchronization for previously failed results.
-        
+        Failed results are re-queued in the change log and set pending, then the queue is drained.
+
         Returns:
             Dictionary with retry statistics
         """
-        failed_results = db.query(TestResult).filter(
-            TestResult.sync_status == SyncStatus.Failed
-        ).all()
-        
+        if not self.is_configured:
+            raise SyncNotConfiguredError()
+
+        failed_ids = [row.id for row in db.query(TestResult.id).filter(TestResult.sync_status == SyncStatus.Failed)]
+        if failed_ids:
+            source = select(
+                literal("test_result"), TestResult.id, literal(ChangeOperation.Upsert.value), literal(datetime.now(timezone.utc))
+            ).where(TestResult.sync_status == SyncStatus.Failed)
+            db.execute(insert(ChangeLog).from_select(["entity_type", "entity_id", "operation", "changed_at"], source))
+            self._set_sync_status(db, failed_ids, SyncStatus.Pending)
+            db.commit()
+
+            self._sync_in_batches(db, self.count_unsynced_changes(db))
+
+        synced = 0
+        for start in range(0, len(failed_ids), self.batch_size):
+            synced += db.query(TestResult).filter(
+                TestResult.id.in_(failed_ids[start:start + self.batch_size]),
+                TestResult.sync_status == SyncStatus.Synced,
+            ).count()
+
         stats = {
-            "total": len(failed_results),
-            "synced": 0,
-            "still_failed": 0
+            "total": len(failed_ids),
+            "synced": synced,
+            "still_failed": len(failed_ids) - synced
         }
-        
-        for result in failed_results:
-            # Reset to pending before retry
-            result.sync_status = SyncStatus.Pending
-            db.commit()
-            
-            if self.sync_result(db, result):
-                stats["synced"] += 1
-            else:
-                stats["still_failed"] += 1
-        
+
         logging.info(f"Retry complete: {stats['synced']} synced, {stats['still_failed']} still failed")
         return stats
-    
+
+    # Pull
+
+    def get_pull_cursor(self, db: Session) -> int:
+        """Position in the central server's change feed up to which changes are applied."""
+        state = db.get(SyncState, self.PULL_STATE_NAME)
+        return state.watermark if state is not None else 0
+
+    @staticmethod
+    def _not_referenced(entity):
+        """Criteria matching rows of entity no other local row points to."""
+        criteria = []
+        for table in entity.__table__.metadata.tables.values():
+            for foreign_key in table.foreign_keys:
+                if foreign_key.column is entity.__table__.c.id:
+                    criteria.append(~exists().where(foreign_key.parent == entity.id))
+        return criteria
+
+    def apply_remote_changes(self, db: Session, changes: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Apply central changes to clinics and patients.
+
+        Writes are bulk upserts and deletes on the tables, so they do not enter the local
+        change log and are not echoed back. Records with local changes the server has not
+        acknowledged yet are left alone; the server sees those edits on the next push.
+        Deletes of records still referenced locally (e.g. by test results) are skipped.
+        Does not commit.
+
+        Returns:
+            Dictionary with applied and skipped change counts
+        """
+        # Several changes to one record in a page collapse to the latest
+        latest: Dict[Tuple[str, UUID], Dict[str, Any]] = {}
+        counts: Dict[Tuple[str, UUID], int] = {}
+        for change in changes:
+            if change["entity"] in self.PULLED_ENTITIES:
+                key = (change["entity"], UUID(change["id"]))
+                latest[key] = change
+                counts[key] = counts.get(key, 0) + 1
+        skipped = len(changes) - sum(counts.values())
+
+        if latest:
+            unpushed = {
+                (row.entity_type, row.entity_id)
+                for row in db.query(ChangeLog.entity_type, ChangeLog.entity_id).filter(
+                    ChangeLog.seq > self.get_watermark(db),
+                    ChangeLog.entity_id.in_([key[1] for key in latest]),
+                )
+            }
+            for key in unpushed & latest.keys():
+                skipped += counts[key]
+                del latest[key]
+
+        moved_clinics = []
+        for entity_type in self.PULLED_ENTITIES:
+            entity = TRACKED_ENTITIES[entity_type]
+            rows = [
+                self.deserialize_row(entity, change["data"])
+                for (kind, _), change in latest.items()
+                if kind == entity_type and change["op"] == ChangeOperation.Upsert.value
+            ]
+            if entity_type == "clinic":
+                moved_clinics = clinics_changing_timezone(db, rows)
+            upsert_rows(db, entity, rows)
+        if moved_clinics:
+            # Bulk writes bypass the rollup listener
+            refresh_clinic_stats(db, moved_clinics)
+
+        for entity_type in reversed(self.PULLED_ENTITIES):
+            entity = TRACKED_ENTITIES[entity_type]
+            ids = [
+                entity_id for (kind, entity_id), change in latest.items()
+                if kind == entity_type and change["op"] == ChangeOperation.Delete.value
+            ]
+            if ids:
+                kept = set(ids) - {
+                    row.id for row in db.execute(
+                        delete(entity).where(and_(entity.id.in_(ids), *self._not_referenced(entity))).returning(entity.id)
+                    )
+                }
+                skipped += sum(counts[(entity_type, entity_id)] for entity_id in kept)
+
+        return {"applied": len(changes) - skipped, "skipped": skipped}
+
+    def pull_changes(self, db: Session) -> Dict[str, int]:
+        """
+        Download and apply central clinic and patient changes since the pull cursor.
+        Each page is applied and its cursor stored in one commit, so an interrupted pull resumes.
+
+        Returns:
+            Dictionary with applied and skipped change counts
+
+        Raises:
+            SyncNotConfiguredError: If no central server is configured
+            SyncTransportError: If a page could not be fetched
+        """
+        if not self.is_configured:
+            raise SyncNotConfiguredError()
+
+        stats = {"applied": 0, "skipped": 0}
+        cursor = self.get_pull_cursor(db)
+        while True:
+            changes, next_cursor, has_more = self.transport.get_changes(cursor, self.batch_size)
+            try:
+                page_stats = self.apply_remote_changes(db, changes)
+                state = db.get(SyncState, self.PULL_STATE_NAME)
+                if state is None:
+                    db.add(SyncState(name=self.PULL_STATE_NAME, watermark=next_cursor))
+                else:
+                    state.watermark = next_cursor
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+
+            stats["applied"] += page_stats["applied"]
+            stats["skipped"] += page_stats["skipped"]
+            if not has_more or not changes:
+                break
+            cursor = next_cursor
+
+        if stats["applied"]:
+            logging.info(f"Pulled {stats['applied']} central changes ({stats['skipped']} skipped)")
+        return stats
+
     def get_sync_status(self, db: Session) -> Dict[str, int]:
         """
         Get overall sync status statistics.
-        
+
         Returns:
             Dictionary with sync status counts
         """
-        total = db.query(TestResult).count()
-        pending = db.query(TestResult).filter(TestResult.sync_status == SyncStatus.Pending).count()
-        synced = db.query(TestResult).filter(TestResult.sync_status == SyncStatus.Synced).count()
-        failed = db.query(TestResult).filter(TestResult.sync_status == SyncStatus.Failed).count()
-        
+        # One grouped scan over the sync_status index instead of a COUNT per status
+        counts = dict(
+            db.query(TestResult.sync_status, func.count())
+            .group_by(TestResult.sync_status)
+            .all()
+        )
+        pending = counts.get(SyncStatus.Pending, 0)
+        synced = counts.get(SyncStatus.Synced, 0)
+        failed = counts.get(SyncStatus.Failed, 0)
+        total = sum(counts.values())
+
         return {
             "total_results": total,
             "pending": pending,
@@ -146,6 +571,11 @@ class SyncService:
             "sync_percentage": round((synced / total * 100) if total > 0 else 0, 2)
         }
 
+    def close(self) -> None:
+        """Release pooled HTTP connections."""
+        if self.transport is not None:
+            self.transport.close()
+
 
 # Singleton instance
 _sync_service = None
@@ -156,4 +586,3 @@ def get_sync_service() -> SyncService:
     if _sync_service is None:
         _sync_service = SyncService()
     return _sync_service
-
@@ -0,0 +1,298 @@
+"""
+HTTP transport for sync with the central server
+Uses one pooled keep-alive client and gzip-compressed columnar MessagePack or JSON bodies.
+"""
+
+import os
+import gzip
+import json
+import base64
+import hashlib
+import socket
+import logging
+import threading
+from pathlib import Path
+from typing import List, Dict, Optional, Any, Tuple
+import httpx
+from . import sync_codec
+
+class SyncTransportError(Exception):
+    """Raised when a whole batch could not be delivered (network error, 5xx, bad response)."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        # Seconds the server asked us to wait (Retry-After), if it said
+        self.retry_after = retry_after
+
+class SyncTransport:
+    """
+    Client for the central server's sync API.
+
+    Wire format for POST /api/sync/changes:
+        request:  {"device_id": "...", "changes": [{"seq": 1, "entity": "test_result", "op": "upsert", "id": "...", "data": {...}}]}
+                  (gzip, JSON; or the columnar MessagePack encoding in sync_codec)
+        response: {"items": [{"seq": 1, "status": "accepted" | "rejected", "error": "..."}], "watermark": 1}
+
+    watermark is the highest change seq the server has durably applied for this device.
+
+    Change batches are sent as columnar MessagePack (schema version in X-Sync-Schema-Version)
+    when msgpack is installed. A server that answers 415 is sent JSON from then on.
+
+    Images use resumable uploads keyed by SHA-256 (tus-style offsets):
+        POST  /api/sync/images           {"hash": "...", "size": n, "filename": "..."} -> {"offset": n}
+        PATCH /api/sync/images/{hash}    Upload-Offset, Upload-Checksum: sha256 <base64>, raw chunk
+                                         -> 200 {"offset": n}, or 409 {"offset": n} on an offset mismatch
+    An offset equal to the size means the server already has the image.
+
+    Devices pull central changes to clinics and patients in the same item format:
+        GET /api/sync/pull?after=<cursor>&limit=n -> {"changes": [...], "cursor": n, "has_more": bool}
+
+    and new model versions:
+        GET /api/sync/models/latest -> 200 {"version", "sha256", "size", "compression", "path"}, or 204
+        GET <path>                  -> the artifact; Range requests resume a partial download
+    """
+
+    CHANGES_PATH = "/api/sync/changes"
+    IMAGES_PATH = "/api/sync/images"
+    PULL_PATH = "/api/sync/pull"
+    LATEST_MODEL_PATH = "/api/sync/models/latest"
+
+    def __init__(
+        self,
+        base_url: str,
+        api_token: str = None,
+        device_id: str = None,
+        timeout_seconds: float = None,
+        max_connections: int = None,
+        transport: httpx.BaseTransport = None,
+        payload_format: str = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.device_id = device_id or os.getenv("SYNC_DEVICE_ID") or socket.gethostname()
+        api_token = api_token or os.getenv("SYNC_API_TOKEN")
+        timeout_seconds = timeout_seconds or float(os.getenv("SYNC_TIMEOUT_SECONDS", "30"))
+        max_connections = max_connections or int(os.getenv("SYNC_MAX_CONNECTIONS", "4"))
+
+        headers = {"X-Device-Id": self.device_id, "Accept-Encoding": "gzip"}
+        if api_token:
+            headers["Authorization"] = f"Bearer {api_token}"
+
+        # One long-lived client: TCP/TLS connections are reused across batches
+        self.client = httpx.Client(
+            base_url=self.base_url,
+            headers=headers,
+            timeout=httpx.Timeout(timeout_seconds, connect=min(timeout_seconds, 10.0)),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=60.0,
+            ),
+            transport=transport,
+        )
+        self.bytes_sent = 0
+        # Images upload from several threads at once
+        self._bytes_lock = threading.Lock()
+
+        payload_format = payload_format or os.getenv("SYNC_PAYLOAD_FORMAT", "msgpack")
+        if payload_format == "msgpack" and not sync_codec.msgpack_available():
+            logging.warning("msgpack not installed; sync payloads fall back to JSON. Install with: pip install msgpack")
+            payload_format = "json"
+        self.payload_format = payload_format
+        logging.info(f"Sync transport initialized for {self.base_url} as device {self.device_id}")
+
+    @staticmethod
+    def encode_json(payload: Dict[str, Any]) -> bytes:
+        """Serialize a payload as compact, gzip-compressed JSON."""
+        body = json.dumps(payload, separators=(",", ":"), default=str).encode()
+        return gzip.compress(body, compresslevel=6)
+
+    def post_changes(self, changes: List[Dict[str, Any]]) -> Tuple[Dict[int, Optional[str]], int]:
+        """
+        Send a batch of changes.
+
+        Args:
+            changes: Change items, each with a "seq" key
+
+        Returns:
+            Tuple of (mapping of seq to None (accepted) or an error message (rejected),
+            server watermark). Seqs the server did not acknowledge are omitted.
+
+        Raises:
+            SyncTransportError: If the batch was not delivered
+        """
+        if self.payload_format == "msgpack":
+            body = gzip.compress(sync_codec.encode_changes(self.device_id, changes), compresslevel=6)
+            response = self._post(
+                self.CHANGES_PATH, body, sync_codec.MSGPACK_CONTENT_TYPE,
+                headers={"X-Sync-Schema-Version": str(sync_codec.SCHEMA_VERSION)},
+                accept=(200, 415),
+            )
+            if response.status_code != 415:
+                return self._parse_acks(response)
+            logging.warning("Central server does not accept the binary sync format; falling back to JSON")
+            self.payload_format = "json"
+
+        body = self.encode_json({"device_id": self.device_id, "changes": changes})
+        response = self._post(self.CHANGES_PATH, body, sync_codec.JSON_CONTENT_TYPE)
+        return self._parse_acks(response)
+
+    def get_upload_offset(self, image_hash: str, size: int, filename: str) -> int:
+        """
+        Open (or look up) the server-side upload for an image.
+
+        Returns:
+            Bytes of the image the server already has; equal to size if it is complete
+
+        Raises:
+            SyncTransportError: If the request failed
+        """
+        response = self._send(
+            "POST", self.IMAGES_PATH,
+            json={"hash": image_hash, "size": size, "filename": filename},
+        )
+        return self._parse_offset(response)
+
+    def upload_chunk(self, image_hash: str, offset: int, chunk: bytes) -> int:
+        """
+        Upload one chunk of an image at the given offset, with a SHA-256 checksum.
+
+        Returns:
+            The server's offset after the request; on an offset mismatch this is the
+            server's current offset, so the caller can continue from there
+
+        Raises:
+            SyncTransportError: If the chunk was not accepted
+        """
+        checksum = base64.b64encode(hashlib.sha256(chunk).digest()).decode()
+        response = self._send(
+            "PATCH", f"{self.IMAGES_PATH}/{image_hash}",
+            content=chunk,
+            headers={
+                "Content-Type": "application/offset+octet-stream",
+                "Upload-Offset": str(offset),
+                "Upload-Checksum": f"sha256 {checksum}",
+            },
+            accept=(200, 409),
+        )
+        self._count_sent(len(chunk))
+        return self._parse_offset(response)
+
+    def get_changes(self, after: int, limit: int) -> Tuple[List[Dict[str, Any]], int, bool]:
+        """
+        Fetch central changes after a pull cursor.
+
+        Returns:
+            Tuple of (change items, cursor to resume from, whether more changes are waiting)
+
+        Raises:
+            SyncTransportError: If the request failed
+        """
+        response = self._send("GET", self.PULL_PATH, params={"after": after, "limit": limit})
+        try:
+            body = response.json()
+            return list(body["changes"]), int(body["cursor"]), bool(body.get("has_more", False))
+        except (ValueError, KeyError, TypeError) as e:
+            raise SyncTransportError(f"Malformed pull response from central server: {str(e)}") from e
+
+    def get_latest_model(self) -> Optional[Dict[str, Any]]:
+        """
+        Look up the model version the central server currently distributes.
+
+        Returns:
+            Manifest with "version", "sha256", "size", "compression" and "path", or None if there is none
+
+        Raises:
+            SyncTransportError: If the request failed
+        """
+        response = self._send("GET", self.LATEST_MODEL_PATH, accept=(200, 204))
+        if response.status_code == 204:
+            return None
+        try:
+            manifest = response.json()
+            for key in ("version", "sha256", "size", "path"):
+                if key not in manifest:
+                    raise KeyError(key)
+            return manifest
+        except (ValueError, KeyError, TypeError) as e:
+            raise SyncTransportError(f"Malformed model manifest from central server: {str(e)}") from e
+
+    def download(self, path: str, destination: Path) -> int:
+        """
+        Download a file, resuming from the bytes already in destination.
+
+        Returns:
+            Size of destination after the download
+
+        Raises:
+            SyncTransportError: If the download failed; the bytes received so far are kept
+        """
+        offset = destination.stat().st_size if destination.exists() else 0
+        headers = {"Accept-Encoding": "identity"}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+
+        try:
+            with self.client.stream("GET", path, headers=headers) as response:
+                if response.status_code == 416:
+                    return offset
+                if response.status_code not in (200, 206):
+                    raise SyncTransportError(f"Central server returned {response.status_code} for {path}")
+                # 200 means the server ignored the range; start over
+                mode = "ab" if response.status_code == 206 else "wb"
+                with open(destination, mode) as f:
+                    for chunk in response.iter_raw():
+                        f.write(chunk)
+        except httpx.HTTPError as e:
+            raise SyncTransportError(f"Download of {path} failed: {str(e)}") from e
+        return destination.stat().st_size
+
+    def _post(self, path: str, body: bytes, content_type: str, headers: Dict[str, str] = None, accept: tuple = (200,)) -> httpx.Response:
+        response = self._send(
+            "POST", path,
+            content=body,
+            headers={"Content-Type": content_type, "Content-Encoding": "gzip", **(headers or {})},
+            accept=accept,
+        )
+        self._count_sent(len(body))
+        return response
+
+    def _count_sent(self, size: int) -> None:
+        with self._bytes_lock:
+            self.bytes_sent += size
+
+    def _send(self, method: str, path: str, accept: tuple = (200,), **kwargs) -> httpx.Response:
+        try:
+            response = self.client.request(method, path, **kwargs)
+        except httpx.HTTPError as e:
+            raise SyncTransportError(f"Request to {path} failed: {str(e)}") from e
+
+        if response.status_code not in accept:
+            retry_after = response.headers.get("Retry-After")
+            raise SyncTransportError(
+                f"Central server returned {response.status_code} for {path}: {response.text[:200]}",
+                retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None,
+            )
+        return response
+
+    @staticmethod
+    def _parse_offset(response: httpx.Response) -> int:
+        try:
+            return int(response.json()["offset"])
+        except (ValueError, KeyError, TypeError) as e:
+            raise SyncTransportError(f"Malformed upload response from central server: {str(e)}") from e
+
+    @staticmethod
+    def _parse_acks(response: httpx.Response) -> Tuple[Dict[int, Optional[str]], int]:
+        try:
+            body = response.json()
+            acks = {
+                int(item["seq"]): None if item.get("status") == "accepted" else (item.get("error") or "rejected")
+                for item in body["items"]
+            }
+            return acks, int(body["watermark"])
+        except (ValueError, KeyError, TypeError) as e:
+            raise SyncTransportError(f"Malformed acknowledgement from central server: {str(e)}") from e
+
+    def close(self) -> None:
+        """Close pooled connections."""
+        self.client.close()
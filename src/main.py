@@ -1,24 +1,65 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from .database.core import engine, Base
+from sqlalchemy.exc import SQLAlchemyError
+from .database.core import engine, Base, SessionLocal
 # Import all entities to register them with SQLAlchemy
 from .entities.user import User
 from .entities.clinic import Clinic
 from .entities.patient import Patient
 from .entities.test_result import TestResult
+from .entities.analysis_job import AnalysisJob
+from .entities.sync_change import ChangeLog, SyncState
+from .entities.daily_clinic_stats import DailyClinicStats
+from .entities.daily_model_stats import DailyModelStats
+from .entities.outbreak_alert import OutbreakAlert
+# Register flush listeners that record changes for delta sync
+from .infrastructure import change_tracking
+# Register the flush listeners that maintain the dashboard's daily rollups and invalidate its cache
+from .dashboard import rollups, cache
 from .api import register_routes
 from .app_logging import configure_logging, LogLevels
 from .frontend.controller import router as frontend_router
+from .infrastructure.storage_sweeper import get_storage_sweeper
+from .infrastructure.sync_daemon import get_sync_daemon
+from .dashboard.anomalies import get_anomaly_detector
+from .dashboard.live import get_dashboard_publisher
+from .results.service import get_analysis_job_runner, recover_analysis_jobs
 from pathlib import Path
+import logging
 
 
 configure_logging(LogLevels.info)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """ Start background workers on startup and stop them on shutdown """
+    storage_sweeper = get_storage_sweeper()
+    storage_sweeper.start()
+    analysis_job_runner = get_analysis_job_runner()
+    analysis_job_runner.start()
+    recover_analysis_jobs()
+    sync_daemon = get_sync_daemon()
+    sync_daemon.start()
+    anomaly_detector = get_anomaly_detector()
+    anomaly_detector.start()
+    dashboard_publisher = get_dashboard_publisher()
+    dashboard_publisher.start()
+    yield
+    dashboard_publisher.stop()
+    anomaly_detector.stop()
+    sync_daemon.stop()
+    analysis_job_runner.stop()
+    storage_sweeper.stop()
+
+
 app = FastAPI(
     title="introspect - Malaria Diagnostics API",
     description="API for malaria diagnostics and surveillance using AI-powered blood smear analysis",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS for Flutter frontend
@@ -33,6 +74,14 @@ app.add_middleware(
 """ Create tables if they don't exist (for SQLite and local development) """
 Base.metadata.create_all(bind=engine)
 
+""" Fill rollup tables added to a database that already has test results """
+try:
+    with SessionLocal() as db:
+        rollups.backfill_rollups(db)
+except SQLAlchemyError as e:
+    # e.g. a pending migration; the dashboard reads zeros until rebuild_rollups.py is run
+    logging.error(f"Backfilling dashboard rollups failed: {str(e)}")
+
 # Mount static files
 static_dir = Path(__file__).parent / "frontend" / "static"
 app.mount("/static", StaticFiles(directory=str(static_dir)), name="static")
@@ -1,37 +1,57 @@
-from fastapi import APIRouter, status, Query, UploadFile, File, Form
-from fastapi.responses import StreamingResponse, Response
+from fastapi import APIRouter, status, Query, UploadFile, File, Form, BackgroundTasks, Request
+from fastapi.responses import StreamingResponse, Response, FileResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from starlette.background import BackgroundTask
 from typing import List, Optional
 from uuid import UUID
 import io
+import os
+import asyncio
 import logging
+from datetime import date
+from email.utils import parsedate_to_datetime
 
 from ..database.core import DbSession
 from . import models
 from . import service
+from .export import ExportFormat, MEDIA_TYPES
 from ..auth.service import CurrentUser
 from src.entities.test_result import TestStatus
+from src.entities.analysis_job import JobStatus
 from src.infrastructure.camera_service import get_camera_service
+from src.http_cache import IMMUTABLE_CACHE_CONTROL, format_etag, etag_matches, not_modified
 
 logger = logging.getLogger(__name__)
 
+JOB_EVENTS_POLL_SECONDS = 1.0
+
 router = APIRouter(
     prefix="/api/results",
     tags=["Test Results"]
 )
 
-@router.post("/analyze", response_model=models.AnalysisResponse, status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/analyze",
+    response_model=models.AnalysisResponse,
+    status_code=status.HTTP_201_CREATED,
+    responses={status.HTTP_202_ACCEPTED: {"model": models.AnalysisJobResponse, "description": "Analysis queued (async=true)"}},
+)
 async def analyze_image(
     db: DbSession,
     current_user: CurrentUser,
+    background_tasks: BackgroundTasks,
     image: UploadFile = File(..., description="Blood smear image"),
     patient_id: UUID = Form(...),
     clinic_id: UUID = Form(...),
     notes: Optional[str] = Form(None),
     symptoms: Optional[str] = Form(None),
+    run_async: bool = Query(False, alias="async", description="Queue the analysis and return a job id immediately"),
 ):
     """
     Upload and analyze a blood smear image for malaria detection.
     Returns the analysis result and creates a test result record.
+    With async=true, returns 202 with a job id as soon as the upload is stored;
+    poll GET /api/results/jobs/{job_id} or subscribe to /api/results/jobs/{job_id}/events.
     """
     logger.info(f"Analyze endpoint called - patient_id: {patient_id}, clinic_id: {clinic_id}, image: {image.filename}")
     
@@ -42,10 +62,25 @@ async def analyze_image(
         symptoms=symptoms
     )
 
+    if run_async:
+        job = service.create_analysis_job(current_user, db, analysis_request, image)
+        service.get_analysis_job_runner().submit(job.id)
+        job_status = service.get_analysis_job(current_user, db, job.id)
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=job_status.model_dump(mode="json"),
+            headers={"Location": f"/api/results/jobs/{job.id}"},
+        )
+
     test_result, confidence, processing_time, detections = service.create_test_result_from_analysis(
         current_user, db, analysis_request, image
     )
 
+    # Render thumbnail and overlay now so list and review pages hit the cache
+    background_tasks.add_task(
+        service.generate_result_derivatives, test_result.image_path, test_result.image_hash, detections
+    )
+
     return models.AnalysisResponse(
         test_result_id=test_result.id,
         result=test_result.result,
@@ -57,10 +92,35 @@ async def analyze_image(
     )
 
 
+@router.post("/analyze/batch", status_code=status.HTTP_200_OK)
+async def analyze_batch(
+    db: DbSession,
+    current_user: CurrentUser,
+    images: List[UploadFile] = File(..., description="Blood smear images, or a single zip archive of images"),
+    metadata: str = Form(..., description="JSON array of {patient_id, clinic_id, notes, symptoms, filename} per image"),
+):
+    """
+    Upload and analyze many blood smear images in one request.
+    Streams NDJSON: one line per image as its inference completes, then a summary line.
+    All test results are inserted in one transaction; they exist only if the summary reports committed.
+    """
+    uploads = [(image.filename, await image.read()) for image in images]
+    batch = service.prepare_batch(uploads, metadata)
+    logger.info(f"Batch analyze endpoint called - {len(batch)} images")
+
+    derivative_jobs = []
+    return StreamingResponse(
+        service.analyze_batch(current_user, db, batch, derivative_jobs),
+        media_type="application/x-ndjson",
+        background=BackgroundTask(service.generate_batch_derivatives, derivative_jobs),
+    )
+
+
 @router.post("/capture-and-analyze", response_model=models.AnalysisResponse, status_code=status.HTTP_201_CREATED)
 async def capture_and_analyze(
     db: DbSession,
     current_user: CurrentUser,
+    background_tasks: BackgroundTasks,
     patient_id: UUID = Form(...),
     clinic_id: UUID = Form(...),
     notes: Optional[str] = Form(None),
@@ -82,6 +142,11 @@ async def capture_and_analyze(
         current_user, db, analysis_request
     )
 
+    # Render thumbnail and overlay now so list and review pages hit the cache
+    background_tasks.add_task(
+        service.generate_result_derivatives, test_result.image_path, test_result.image_hash, detections
+    )
+
     return models.AnalysisResponse(
         test_result_id=test_result.id,
         result=test_result.result,
@@ -106,9 +171,89 @@ def get_test_results(
 
 
 @router.get("/pending-sync", response_model=List[models.TestResultResponse])
-def get_pending_sync_results(db: DbSession, current_user: CurrentUser):
-    """Get all test results pending synchronization."""
-    return service.get_pending_sync_results(current_user, db)
+def get_pending_sync_results(
+    db: DbSession,
+    current_user: CurrentUser,
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000, description="Maximum results per page"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's X-Next-Cursor header"),
+):
+    """
+    Get test results pending synchronization, oldest first, one page at a time.
+    When more results remain, the X-Next-Cursor response header carries the cursor for the next page.
+    """
+    results, next_cursor = service.get_pending_sync_results(current_user, db, limit, cursor)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return results
+
+
+@router.get("/export", response_class=StreamingResponse)
+def export_test_results(
+    db: DbSession,
+    current_user: CurrentUser,
+    format: ExportFormat = Query(ExportFormat.Csv, description="csv or parquet"),
+    start_date: Optional[date] = Query(None, description="First test date (UTC), inclusive"),
+    end_date: Optional[date] = Query(None, description="Last test date (UTC), inclusive"),
+    district: Optional[str] = Query(None, description="Filter by district"),
+    clinic_id: Optional[UUID] = Query(None, description="Filter by clinic ID"),
+):
+    """
+    Download test results for reporting as CSV or zstd-compressed Parquet.
+    Rows are streamed in batches straight from the database, so exports of any size use
+    constant memory on the server.
+    """
+    stream = service.export_test_results(current_user, db, format, start_date, end_date, district, clinic_id)
+    filename = f"test_results_{start_date or 'all'}_{end_date or 'now'}.{format.value}"
+    return StreamingResponse(
+        stream,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=models.AnalysisJobResponse)
+def get_analysis_job(db: DbSession, job_id: UUID, current_user: CurrentUser):
+    """Get the status of an asynchronous analysis job."""
+    return service.get_analysis_job(current_user, db, job_id)
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_analysis_job_events(request: Request, db: DbSession, job_id: UUID, current_user: CurrentUser):
+    """
+    Server-sent events for an analysis job.
+    Emits a `status` event whenever the job changes and closes once it completes or fails.
+    """
+    def load_status():
+        try:
+            return service.get_analysis_job(current_user, db, job_id)
+        finally:
+            # Return the connection to the pool between polls
+            db.close()
+
+    job_status = await run_in_threadpool(load_status)
+
+    async def event_stream():
+        nonlocal job_status
+        last_sent = None
+        while True:
+            if job_status != last_sent:
+                yield f"event: status\ndata: {job_status.model_dump_json()}\n\n"
+                last_sent = job_status
+            else:
+                yield ": keep-alive\n\n"
+
+            if job_status.status in (JobStatus.Completed, JobStatus.Failed) or await request.is_disconnected():
+                break
+
+            await asyncio.sleep(JOB_EVENTS_POLL_SECONDS)
+            job_status = await run_in_threadpool(load_status)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/{result_id}", response_model=models.TestResultResponse)
@@ -117,6 +262,78 @@ def get_test_result(db: DbSession, result_id: UUID, current_user: CurrentUser):
     return service.get_test_result_by_id(current_user, db, result_id)
 
 
+@router.api_route("/{result_id}/image", methods=["GET", "HEAD"], response_class=FileResponse)
+def get_result_image(request: Request, db: DbSession, result_id: UUID, current_user: CurrentUser):
+    """
+    Download the original blood smear image for a test result.
+    Supports Range requests for resuming over poor links, and conditional GETs
+    (If-None-Match / If-Modified-Since). The file is streamed by the server directly,
+    using zero-copy sendfile where the ASGI server supports it.
+    """
+    path, image_hash = service.get_result_image(current_user, db, result_id)
+    stat_result = os.stat(path)
+    etag = format_etag(image_hash)
+
+    if etag_matches(request, etag) or _not_modified_since(request, stat_result.st_mtime):
+        return not_modified(etag, IMMUTABLE_CACHE_CONTROL)
+
+    return FileResponse(
+        path,
+        stat_result=stat_result,
+        headers={"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL},
+    )
+
+
+def _not_modified_since(request: Request, mtime: float) -> bool:
+    # If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+    if "if-none-match" in request.headers:
+        return False
+    if_modified_since = request.headers.get("if-modified-since")
+    if not if_modified_since:
+        return False
+    try:
+        return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+@router.get("/{result_id}/thumbnail", response_class=FileResponse)
+def get_result_thumbnail(
+    request: Request,
+    db: DbSession,
+    result_id: UUID,
+    current_user: CurrentUser,
+    size: int = Query(256, ge=32, le=1024, description="Longest edge in pixels"),
+):
+    """Get a cached JPEG thumbnail of a test result image."""
+    path, key = service.get_result_thumbnail(current_user, db, result_id, size)
+    return _derivative_response(request, path, key)
+
+
+@router.get("/{result_id}/overlay", response_class=FileResponse)
+def get_result_overlay(
+    request: Request,
+    db: DbSession,
+    result_id: UUID,
+    current_user: CurrentUser,
+    size: int = Query(512, ge=32, le=1024, description="Longest edge in pixels"),
+):
+    """Get a cached JPEG render of a test result image with detection boxes drawn on it."""
+    path, key = service.get_result_overlay(current_user, db, result_id, size)
+    return _derivative_response(request, path, key)
+
+
+def _derivative_response(request: Request, path, key: str) -> Response:
+    etag = format_etag(key)
+    if etag_matches(request, etag):
+        return not_modified(etag, IMMUTABLE_CACHE_CONTROL)
+    return FileResponse(
+        path,
+        media_type="image/jpeg",
+        headers={"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL},
+    )
+
+
 @router.put("/{result_id}", response_model=models.TestResultResponse)
 def update_test_result(
     db: DbSession,
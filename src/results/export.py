@@ -0,0 +1,161 @@
+"""
+Bulk export of test results
+Streams CSV or Parquet from a server-side cursor in fixed-size batches, in constant memory.
+"""
+
+import io
+import csv
+import enum
+import os
+from datetime import date, datetime, time, timedelta
+from typing import Iterator, List, Optional, Sequence
+from uuid import UUID
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from src.entities.test_result import TestResult
+from src.entities.clinic import Clinic
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+
+class ExportFormat(str, enum.Enum):
+    Csv = "csv"
+    Parquet = "parquet"
+
+MEDIA_TYPES = {
+    ExportFormat.Csv: "text/csv; charset=utf-8",
+    ExportFormat.Parquet: "application/vnd.apache.parquet",
+}
+
+# (name, column, Parquet type name); identifiers only, no patient details
+EXPORT_COLUMNS = [
+    ("id", TestResult.id, "string"),
+    ("test_date", TestResult.test_date, "timestamp"),
+    ("clinic_id", TestResult.clinic_id, "string"),
+    ("clinic_name", Clinic.name, "string"),
+    ("district", Clinic.district, "string"),
+    ("region", Clinic.region, "string"),
+    ("patient_id", TestResult.patient_id, "string"),
+    ("health_worker_id", TestResult.health_worker_id, "string"),
+    ("result", TestResult.result, "string"),
+    ("ai_result", TestResult.ai_result, "string"),
+    ("confidence_score", TestResult.confidence_score, "float"),
+    ("model_version", TestResult.model_version, "string"),
+    ("is_confirmed", TestResult.is_confirmed, "bool"),
+    ("confirmed_at", TestResult.confirmed_at, "timestamp"),
+    ("created_at", TestResult.created_at, "timestamp"),
+]
+
+def parquet_available() -> bool:
+    return pyarrow is not None
+
+def export_query(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    district: Optional[str] = None,
+    clinic_id: Optional[UUID] = None,
+):
+    """SELECT of the export columns, test dates in [start_date, end_date] (UTC days, inclusive)."""
+    query = select(*(column for _, column, _ in EXPORT_COLUMNS)).outerjoin(Clinic, Clinic.id == TestResult.clinic_id)
+    if start_date:
+        query = query.where(TestResult.test_date >= datetime.combine(start_date, time.min))
+    if end_date:
+        query = query.where(TestResult.test_date < datetime.combine(end_date + timedelta(days=1), time.min))
+    if district:
+        query = query.where(Clinic.district == district)
+    if clinic_id:
+        query = query.where(TestResult.clinic_id == clinic_id)
+    return query.order_by(TestResult.test_date, TestResult.id)
+
+def iter_batches(db: Session, query, batch_size: int = None) -> Iterator[Sequence]:
+    """
+    Run query on a server-side cursor and yield its rows batch_size at a time.
+    Only one batch is held in memory; on PostgreSQL rows are fetched as they are consumed.
+    """
+    batch_size = batch_size or EXPORT_BATCH_SIZE
+    result = db.execute(query.execution_options(stream_results=True, yield_per=batch_size))
+    try:
+        yield from result.partitions()
+    finally:
+        result.close()
+
+def _plain(value):
+    # Enums by value and UUIDs as strings, in both formats
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return _plain(value)
+
+def stream_csv(db: Session, query, batch_size: int = None) -> Iterator[bytes]:
+    """Yield the query's rows as CSV with a header, one chunk per batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _, _ in EXPORT_COLUMNS])
+    for rows in iter_batches(db, query, batch_size):
+        writer.writerows([_csv_value(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands what was written so far to the caller on request."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def _parquet_schema():
+    types = {
+        "string": pyarrow.string(),
+        "timestamp": pyarrow.timestamp("us"),
+        "float": pyarrow.float64(),
+        "bool": pyarrow.bool_(),
+    }
+    return pyarrow.schema([(name, types[kind]) for name, _, kind in EXPORT_COLUMNS])
+
+def stream_parquet(db: Session, query, batch_size: int = None) -> Iterator[bytes]:
+    """
+    Yield the query's rows as a zstd-compressed Parquet file, one row group per batch.
+
+    Raises:
+        RuntimeError: If pyarrow is not installed
+    """
+    if pyarrow is None:
+        raise RuntimeError("Parquet export requires pyarrow")
+    schema = _parquet_schema()
+    sink = _ChunkSink()
+    with pyarrow.parquet.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for rows in iter_batches(db, query, batch_size):
+            arrays = [
+                pyarrow.array([_plain(value) for value in values], type=field.type)
+                for field, values in zip(schema, zip(*rows))
+            ]
+            writer.write_table(pyarrow.Table.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+    yield sink.drain()
@@ -3,6 +3,7 @@ from typing import Optional, List, Dict, Any
 from uuid import UUID
 from pydantic import BaseModel, ConfigDict
 from src.entities.test_result import TestStatus, SyncStatus
+from src.entities.analysis_job import JobStatus
 
 class Detection(BaseModel):
     """Detection model for individual parasite detections."""
@@ -36,6 +37,7 @@ class TestResultResponse(TestResultBase):
     test_date: datetime
     image_path: str
     image_filename: str
+    ai_result: Optional[TestStatus] = None
     model_version: Optional[str] = None
     processing_time_ms: Optional[float] = None
     sync_status: SyncStatus
@@ -66,6 +68,49 @@ class AnalysisResponse(BaseModel):
     image_path: str
     detections: Optional[List[Dict[str, Any]]] = None
 
+class AnalysisJobResponse(BaseModel):
+    """Status of an asynchronous analysis job."""
+    job_id: UUID
+    status: JobStatus
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    test_result_id: Optional[UUID] = None
+    result: Optional[TestStatus] = None
+    confidence_score: Optional[float] = None
+    error: Optional[str] = None
+
+class BatchAnalysisItem(BaseModel):
+    """Per-image metadata for batch analysis, matched by filename or position."""
+    patient_id: UUID
+    clinic_id: UUID
+    notes: Optional[str] = None
+    symptoms: Optional[str] = None
+    filename: Optional[str] = None
+
+class BatchItemResult(BaseModel):
+    """One NDJSON line of a batch analysis stream."""
+    type: str = "item"
+    index: int
+    filename: str
+    status: str  # "analyzed" or "failed"
+    test_result_id: Optional[UUID] = None
+    result: Optional[TestStatus] = None
+    confidence_score: Optional[float] = None
+    processing_time_ms: Optional[float] = None
+    image_path: Optional[str] = None
+    detections: Optional[List[Dict[str, Any]]] = None
+    error: Optional[str] = None
+
+class BatchSummary(BaseModel):
+    """Final NDJSON line of a batch analysis stream."""
+    type: str = "summary"
+    total: int
+    analyzed: int
+    failed: int
+    committed: bool
+    error: Optional[str] = None
+
 class ConfirmResultRequest(BaseModel):
     """Request model for confirming a test result."""
     confirmed_result: TestStatus
@@ -1,19 +1,46 @@
-from uuid import UUID
-from datetime import datetime, timezone
+from uuid import UUID, uuid4
+from datetime import date, datetime, timezone, timedelta
 from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterator, Callable
 from fastapi import UploadFile
+from pathlib import Path
+from pydantic import TypeAdapter, ValidationError
 from . import models
+from . import export
+from src.database.core import SessionLocal
+from src.database.pagination import fetch_page, encode_cursor, decode_cursor
 from src.entities.test_result import TestResult, TestStatus, SyncStatus
+from src.entities.analysis_job import AnalysisJob, JobStatus
 from src.auth.models import TokenData
 from src.infrastructure.ai_inference import get_inference_service, InferenceResult
-from src.infrastructure.file_storage import get_storage_service
+from src.infrastructure.file_storage import get_storage_service, FileStorageService
 from src.infrastructure.camera_service import get_camera_service
-from src.exceptions import TestResultNotFoundError, TestResultCreationError
+from src.infrastructure.image_derivatives import get_derivative_service
+from src.infrastructure.job_runner import JobRunner
+from src.exceptions import (
+    TestResultNotFoundError,
+    TestResultCreationError,
+    TestResultImageNotFoundError,
+    BatchAnalysisError,
+    AnalysisJobNotFoundError,
+    InvalidCursorError,
+    InvalidExportRequestError,
+    ExportFormatUnavailableError,
+)
 import logging
 import tempfile
+import zipfile
+import io
 import os
 
+BATCH_IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+MAX_BATCH_IMAGES = int(os.getenv("MAX_BATCH_IMAGES", "100"))
+# Uncompressed size limits for images unpacked from a zip archive
+MAX_BATCH_IMAGE_BYTES = int(os.getenv("MAX_BATCH_IMAGE_BYTES", str(10 * 1024 * 1024)))
+MAX_BATCH_ZIP_BYTES = int(os.getenv("MAX_BATCH_ZIP_BYTES", str(256 * 1024 * 1024)))
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "2"))
+ANALYSIS_JOB_STALE_SECONDS = int(os.getenv("ANALYSIS_JOB_STALE_SECONDS", "600"))
+
 def create_test_result_from_analysis(
     current_user: TokenData,
     db: Session,
@@ -58,12 +85,13 @@ def create_test_result_from_analysis(
             }
             test_status = result_mapping[inference_result]
             
-            # Save image to permanent storage
-            image_path, image_filename = storage_service.save_image(
+            # Stage image; it is promoted to permanent storage once the row is committed
+            image_path, image_filename = storage_service.stage_image(
                 file_content,
                 image_file.filename,
                 str(analysis_request.clinic_id)
             )
+            image_hash = storage_service.content_hash(file_content)
 
             # Get health worker UUID
             health_worker_id = current_user.get_uuid()
@@ -75,20 +103,21 @@ def create_test_result_from_analysis(
                 clinic_id=analysis_request.clinic_id,
                 health_worker_id=health_worker_id,
                 result=test_status,
+                ai_result=test_status,
                 confidence_score=confidence,
                 image_path=image_path,
                 image_filename=image_filename,
+                image_hash=image_hash,
                 model_version=inference_service.model_version,
                 processing_time_ms=processing_time,
+                detections=detections,
                 notes=analysis_request.notes,
                 symptoms=analysis_request.symptoms,
                 sync_status=SyncStatus.Pending,
                 is_confirmed=False,
             )
             
-            db.add(new_result)
-            db.commit()
-            db.refresh(new_result)
+            _commit_with_staged_image(db, storage_service, new_result)
             
             logging.info(f"Created test result {new_result.id} with status {test_status.value}")
             return new_result, confidence, processing_time, detections
@@ -104,6 +133,23 @@ def create_test_result_from_analysis(
         raise TestResultCreationError(str(e))
 
 
+def _commit_with_staged_image(db: Session, storage_service: FileStorageService, new_result: TestResult) -> None:
+    """
+    Insert a result whose image is staged, then promote the image.
+    A failed commit discards the staged file; a crash after the commit leaves the file
+    staged, and the storage sweeper promotes it because the row references it.
+    """
+    try:
+        db.add(new_result)
+        db.commit()
+    except Exception:
+        storage_service.discard_staged_image(new_result.image_path)
+        raise
+
+    storage_service.promote_image(new_result.image_path)
+    db.refresh(new_result)
+
+
 def create_test_result_from_camera_capture(
     current_user: TokenData,
     db: Session,
@@ -151,12 +197,13 @@ def create_test_result_from_camera_capture(
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"camera_capture_{timestamp}.jpg"
 
-            # Save image to permanent storage
-            image_path, image_filename = storage_service.save_image(
+            # Stage image; it is promoted to permanent storage once the row is committed
+            image_path, image_filename = storage_service.stage_image(
                 file_content,
                 filename,
                 str(analysis_request.clinic_id)
             )
+            image_hash = storage_service.content_hash(file_content)
 
             # Get health worker UUID
             health_worker_id = current_user.get_uuid()
@@ -168,20 +215,21 @@ def create_test_result_from_camera_capture(
                 clinic_id=analysis_request.clinic_id,
                 health_worker_id=health_worker_id,
                 result=test_status,
+                ai_result=test_status,
                 confidence_score=confidence,
                 image_path=image_path,
                 image_filename=image_filename,
+                image_hash=image_hash,
                 model_version=inference_service.model_version,
                 processing_time_ms=processing_time,
+                detections=detections,
                 notes=analysis_request.notes,
                 symptoms=analysis_request.symptoms,
                 sync_status=SyncStatus.Pending,
                 is_confirmed=False,
             )
 
-            db.add(new_result)
-            db.commit()
-            db.refresh(new_result)
+            _commit_with_staged_image(db, storage_service, new_result)
 
             logging.info(f"Created test result {new_result.id} from camera capture with status {test_status.value}")
             return new_result, confidence, processing_time, detections
@@ -197,6 +245,402 @@ def create_test_result_from_camera_capture(
         raise TestResultCreationError(str(e))
 
 
+def create_analysis_job(
+    current_user: TokenData,
+    db: Session,
+    analysis_request: models.AnalysisRequest,
+    image_file: UploadFile,
+) -> AnalysisJob:
+    """
+    Persist an uploaded image and queue it for background analysis.
+    The image stays in storage staging until the job commits its test result.
+    """
+    storage_service = get_storage_service()
+    file_content = image_file.file.read()
+
+    image_path, image_filename = storage_service.stage_image(
+        file_content,
+        image_file.filename,
+        str(analysis_request.clinic_id)
+    )
+
+    try:
+        job = AnalysisJob(
+            patient_id=analysis_request.patient_id,
+            clinic_id=analysis_request.clinic_id,
+            health_worker_id=current_user.get_uuid(),
+            notes=analysis_request.notes,
+            symptoms=analysis_request.symptoms,
+            image_path=image_path,
+            image_filename=image_filename,
+            image_hash=storage_service.content_hash(file_content),
+            status=JobStatus.Queued,
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+    except Exception as e:
+        logging.error(f"Failed to queue analysis job. Error: {str(e)}", exc_info=True)
+        db.rollback()
+        storage_service.discard_staged_image(image_path)
+        raise TestResultCreationError(str(e))
+
+    logging.info(f"Queued analysis job {job.id} for patient {analysis_request.patient_id}")
+    return job
+
+
+def get_analysis_job(current_user: TokenData, db: Session, job_id: UUID) -> models.AnalysisJobResponse:
+    """Get the status of an analysis job, including its result once completed."""
+    # Jobs are updated by worker threads through other sessions, so always re-read the row
+    job = db.query(AnalysisJob).filter(AnalysisJob.id == job_id).populate_existing().first()
+    if not job:
+        logging.warning(f"Analysis job {job_id} not found")
+        raise AnalysisJobNotFoundError(job_id)
+
+    response = models.AnalysisJobResponse(
+        job_id=job.id,
+        status=job.status,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        completed_at=job.completed_at,
+        test_result_id=job.test_result_id,
+        error=job.error,
+    )
+    if job.test_result_id:
+        result = db.query(TestResult.result, TestResult.confidence_score).filter(TestResult.id == job.test_result_id).first()
+        if result:
+            response.result = result.result
+            response.confidence_score = result.confidence_score
+    return response
+
+
+def run_analysis_job(job_id: UUID, session_factory: Callable[[], Session] = SessionLocal) -> None:
+    """
+    Execute a queued analysis job (called from the job runner's worker threads).
+    The job is claimed with a conditional UPDATE, so a job recovered by several
+    processes after a restart still runs only once.
+    """
+    db = session_factory()
+    try:
+        claimed = db.query(AnalysisJob).filter(
+            AnalysisJob.id == job_id,
+            AnalysisJob.status == JobStatus.Queued,
+        ).update({
+            AnalysisJob.status: JobStatus.Running,
+            AnalysisJob.started_at: datetime.now(timezone.utc),
+            AnalysisJob.attempts: AnalysisJob.attempts + 1,
+        }, synchronize_session=False)
+        db.commit()
+        if not claimed:
+            logging.info(f"Analysis job {job_id} already claimed or finished")
+            return
+
+        job = db.query(AnalysisJob).filter(AnalysisJob.id == job_id).one()
+        storage_service = get_storage_service()
+        inference_service = get_inference_service()
+        staged_path = str(storage_service.get_staged_path(job.image_path))
+
+        try:
+            if not inference_service.validate_image(staged_path):
+                raise ValueError("Invalid image file")
+
+            inference_result, confidence, processing_time, detections = inference_service.analyze_image(staged_path)
+
+            new_result = TestResult(
+                patient_id=job.patient_id,
+                clinic_id=job.clinic_id,
+                health_worker_id=job.health_worker_id,
+                result=TestStatus(inference_result.value),
+                ai_result=TestStatus(inference_result.value),
+                confidence_score=float(confidence),
+                image_path=job.image_path,
+                image_filename=job.image_filename,
+                image_hash=job.image_hash,
+                model_version=inference_service.model_version,
+                processing_time_ms=processing_time,
+                detections=detections,
+                notes=job.notes,
+                symptoms=job.symptoms,
+                sync_status=SyncStatus.Pending,
+                is_confirmed=False,
+            )
+            db.add(new_result)
+            db.flush()
+
+            # Result row and job completion commit together
+            job.test_result_id = new_result.id
+            job.status = JobStatus.Completed
+            job.completed_at = datetime.now(timezone.utc)
+            db.commit()
+
+        except Exception as e:
+            logging.error(f"Analysis job {job_id} failed. Error: {str(e)}", exc_info=True)
+            db.rollback()
+            db.query(AnalysisJob).filter(AnalysisJob.id == job_id).update({
+                AnalysisJob.status: JobStatus.Failed,
+                AnalysisJob.error: str(e),
+                AnalysisJob.completed_at: datetime.now(timezone.utc),
+            }, synchronize_session=False)
+            db.commit()
+            storage_service.discard_staged_image(job.image_path)
+            return
+
+        storage_service.promote_image(job.image_path)
+        logging.info(f"Analysis job {job_id} completed with test result {new_result.id}")
+        generate_result_derivatives(job.image_path, job.image_hash, detections)
+
+    finally:
+        db.close()
+
+
+def recover_analysis_jobs(session_factory: Callable[[], Session] = SessionLocal) -> int:
+    """
+    Re-queue jobs left over from a previous process.
+    Running jobs are only reset once they are older than ANALYSIS_JOB_STALE_SECONDS,
+    so jobs being processed by another live worker process are left alone.
+
+    Returns:
+        Number of jobs submitted
+    """
+    db = session_factory()
+    try:
+        stale_before = datetime.now(timezone.utc) - timedelta(seconds=ANALYSIS_JOB_STALE_SECONDS)
+        db.query(AnalysisJob).filter(
+            AnalysisJob.status == JobStatus.Running,
+            AnalysisJob.started_at < stale_before,
+        ).update({AnalysisJob.status: JobStatus.Queued}, synchronize_session=False)
+        db.commit()
+
+        job_ids = [row.id for row in db.query(AnalysisJob.id).filter(AnalysisJob.status == JobStatus.Queued)]
+    finally:
+        db.close()
+
+    runner = get_analysis_job_runner()
+    for job_id in job_ids:
+        runner.submit(job_id)
+
+    if job_ids:
+        logging.info(f"Recovered {len(job_ids)} queued analysis jobs")
+    return len(job_ids)
+
+
+# Singleton instance
+_analysis_job_runner = None
+
+def get_analysis_job_runner() -> JobRunner:
+    """Get or create the singleton runner for analysis jobs."""
+    global _analysis_job_runner
+    if _analysis_job_runner is None:
+        _analysis_job_runner = JobRunner("analysis", run_analysis_job, ANALYSIS_WORKERS)
+    return _analysis_job_runner
+
+
+def prepare_batch(
+    uploads: List[tuple[str, bytes]],
+    metadata_json: str,
+) -> List[tuple[models.BatchAnalysisItem, str, bytes]]:
+    """
+    Pair uploaded images with their metadata for batch analysis.
+    Zip archives are expanded into their image entries (in name order).
+    Metadata items are matched by filename when every item has one, otherwise by position.
+
+    Returns:
+        List of (metadata_item, filename, content)
+    """
+    files = []
+    for filename, content in uploads:
+        if Path(filename or "").suffix.lower() == ".zip":
+            files.extend(_expand_zip(content))
+        else:
+            files.append((filename, content))
+
+    try:
+        items = TypeAdapter(List[models.BatchAnalysisItem]).validate_json(metadata_json)
+    except ValidationError as e:
+        raise BatchAnalysisError(f"metadata must be a JSON array of items ({e.error_count()} errors)")
+
+    if not files:
+        raise BatchAnalysisError("no images supplied")
+    if len(files) > MAX_BATCH_IMAGES:
+        raise BatchAnalysisError(f"at most {MAX_BATCH_IMAGES} images per batch, got {len(files)}")
+    if len(items) != len(files):
+        raise BatchAnalysisError(f"{len(files)} images but {len(items)} metadata items")
+
+    if all(item.filename for item in items):
+        # Names must be unique on both sides, or a smear could be filed under the wrong patient
+        image_names = [filename for filename, _ in files]
+        item_names = [item.filename for item in items]
+        for label, names in (("image file", image_names), ("metadata filename", item_names)):
+            repeated = sorted({name for name in names if names.count(name) > 1})
+            if repeated:
+                raise BatchAnalysisError(f"repeated {label} {', '.join(repeated)}")
+        by_name = {item.filename: item for item in items}
+        missing = [filename for filename, _ in files if filename not in by_name]
+        if missing:
+            raise BatchAnalysisError(f"no metadata for {', '.join(missing)}")
+        return [(by_name[filename], filename, content) for filename, content in files]
+
+    return [(item, filename, content) for item, (filename, content) in zip(items, files)]
+
+
+def _expand_zip(content: bytes) -> List[tuple[str, bytes]]:
+    try:
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            entries = sorted(
+                (
+                    info for info in archive.infolist()
+                    if not info.is_dir()
+                    and not info.filename.startswith("__MACOSX/")
+                    and Path(info.filename).suffix.lower() in BATCH_IMAGE_EXTENSIONS
+                ),
+                key=lambda info: info.filename,
+            )
+            if len(entries) > MAX_BATCH_IMAGES:
+                raise BatchAnalysisError(f"at most {MAX_BATCH_IMAGES} images per batch, got {len(entries)}")
+            # Check the declared sizes before decompressing anything; reads stop at the declared size
+            for info in entries:
+                if info.file_size > MAX_BATCH_IMAGE_BYTES:
+                    raise BatchAnalysisError(f"{info.filename} exceeds {MAX_BATCH_IMAGE_BYTES} bytes")
+            if sum(info.file_size for info in entries) > MAX_BATCH_ZIP_BYTES:
+                raise BatchAnalysisError(f"zip archive expands to more than {MAX_BATCH_ZIP_BYTES} bytes")
+            return [(Path(info.filename).name, archive.read(info)) for info in entries]
+    except zipfile.BadZipFile:
+        raise BatchAnalysisError("invalid zip archive")
+
+
+def analyze_batch(
+    current_user: TokenData,
+    db: Session,
+    batch: List[tuple[models.BatchAnalysisItem, str, bytes]],
+    derivative_jobs: List[tuple[str, str, Optional[List[Dict[str, Any]]]]],
+) -> Iterator[str]:
+    """
+    Analyze a batch of images and stream one NDJSON line per image as inference completes.
+    Inference runs in model-sized batches; all rows are inserted in a single transaction,
+    and the final summary line reports whether that transaction committed.
+
+    Args:
+        derivative_jobs: Filled with (image_path, image_hash, detections) for committed
+            results, for derivative pre-rendering after the stream ends
+    """
+    inference_service = get_inference_service()
+    storage_service = get_storage_service()
+    health_worker_id = current_user.get_uuid()
+
+    temp_paths: Dict[int, str] = {}
+    staged: List[str] = []
+    jobs = []
+    analyzed = failed = 0
+    committed = False
+    error = None
+
+    try:
+        # Validate everything up front so the model only sees usable images
+        pending = []
+        for index, (item, filename, content) in enumerate(batch):
+            with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(filename)[1]) as temp_file:
+                temp_file.write(content)
+                temp_paths[index] = temp_file.name
+
+            if inference_service.validate_image(temp_paths[index]):
+                pending.append(index)
+            else:
+                failed += 1
+                yield _ndjson(models.BatchItemResult(index=index, filename=filename, status="failed", error="Invalid image file"))
+
+        for start in range(0, len(pending), inference_service.batch_size):
+            chunk = pending[start:start + inference_service.batch_size]
+            try:
+                outputs = inference_service.analyze_images([temp_paths[index] for index in chunk])
+            except Exception as e:
+                logging.error(f"Batch inference failed for {len(chunk)} images. Error: {str(e)}", exc_info=True)
+                for index in chunk:
+                    failed += 1
+                    yield _ndjson(models.BatchItemResult(index=index, filename=batch[index][1], status="failed", error=str(e)))
+                continue
+
+            for index, (inference_result, confidence, processing_time, detections) in zip(chunk, outputs):
+                item, filename, content = batch[index]
+                test_status = TestStatus(inference_result.value)
+
+                image_path, image_filename = storage_service.stage_image(content, filename, str(item.clinic_id))
+                staged.append(image_path)
+                image_hash = storage_service.content_hash(content)
+
+                new_result = TestResult(
+                    id=uuid4(),
+                    patient_id=item.patient_id,
+                    clinic_id=item.clinic_id,
+                    health_worker_id=health_worker_id,
+                    result=test_status,
+                    ai_result=test_status,
+                    confidence_score=float(confidence),
+                    image_path=image_path,
+                    image_filename=image_filename,
+                    image_hash=image_hash,
+                    model_version=inference_service.model_version,
+                    processing_time_ms=processing_time,
+                    detections=detections,
+                    notes=item.notes,
+                    symptoms=item.symptoms,
+                    sync_status=SyncStatus.Pending,
+                    is_confirmed=False,
+                )
+                db.add(new_result)
+                jobs.append((image_path, image_hash, detections))
+                analyzed += 1
+
+                yield _ndjson(models.BatchItemResult(
+                    index=index,
+                    filename=filename,
+                    status="analyzed",
+                    test_result_id=new_result.id,
+                    result=test_status,
+                    confidence_score=float(confidence),
+                    processing_time_ms=processing_time,
+                    image_path=image_path,
+                    detections=detections,
+                ))
+
+        db.commit()
+        committed = True
+        for image_path in staged:
+            storage_service.promote_image(image_path)
+        derivative_jobs.extend(jobs)
+        logging.info(f"Batch analysis committed {analyzed} test results ({failed} failed)")
+
+    except Exception as e:
+        logging.error(f"Failed to commit batch analysis. Error: {str(e)}", exc_info=True)
+        error = str(e)
+
+    finally:
+        if not committed:
+            db.rollback()
+            for image_path in staged:
+                storage_service.discard_staged_image(image_path)
+        for temp_path in temp_paths.values():
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+
+    yield _ndjson(models.BatchSummary(
+        total=len(batch),
+        analyzed=analyzed,
+        failed=failed,
+        committed=committed,
+        error=error,
+    ))
+
+
+def generate_batch_derivatives(derivative_jobs: List[tuple[str, str, Optional[List[Dict[str, Any]]]]]) -> None:
+    """Pre-render derivatives for every result committed by a batch."""
+    for image_path, image_hash, detections in derivative_jobs:
+        generate_result_derivatives(image_path, image_hash, detections)
+
+
+def _ndjson(model) -> str:
+    return model.model_dump_json() + "\n"
+
+
 def get_test_results(
     current_user: TokenData,
     db: Session,
@@ -221,6 +665,41 @@ def get_test_results(
     return results
 
 
+def export_test_results(
+    current_user: TokenData,
+    db: Session,
+    export_format: export.ExportFormat,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    district: Optional[str] = None,
+    clinic_id: Optional[UUID] = None,
+) -> Iterator[bytes]:
+    """
+    Stream test results as CSV or Parquet, oldest first, in batches from a server-side cursor.
+    The session is closed once the stream is exhausted or abandoned.
+
+    Raises:
+        InvalidExportRequestError: If start_date is after end_date
+        ExportFormatUnavailableError: If Parquet is requested without pyarrow installed
+    """
+    if start_date and end_date and start_date > end_date:
+        raise InvalidExportRequestError("start_date is after end_date")
+    if export_format == export.ExportFormat.Parquet and not export.parquet_available():
+        raise ExportFormatUnavailableError("Parquet", "pyarrow")
+
+    query = export.export_query(start_date, end_date, district, clinic_id)
+    write = export.stream_parquet if export_format == export.ExportFormat.Parquet else export.stream_csv
+    logging.info(f"Exporting test results as {export_format.value} for user {current_user.get_uuid()}")
+
+    def generate() -> Iterator[bytes]:
+        try:
+            yield from write(db, query)
+        finally:
+            db.close()
+
+    return generate()
+
+
 def get_test_result_by_id(current_user: TokenData, db: Session, result_id: UUID) -> TestResult:
     """Get a test result by ID."""
     result = db.query(TestResult).filter(TestResult.id == result_id).first()
@@ -264,13 +743,114 @@ def mark_as_synced(current_user: TokenData, db: Session, result_id: UUID) -> Tes
     return result
 
 
-def get_pending_sync_results(current_user: TokenData, db: Session) -> List[TestResult]:
-    """Get all test results pending sync."""
-    results = db.query(TestResult).filter(
-        TestResult.sync_status == SyncStatus.Pending
-    ).all()
+def get_result_image_hash(db: Session, result: TestResult) -> str:
+    """Get the content hash of a result's image, computing and storing it for older rows."""
+    if result.image_hash:
+        return result.image_hash
+
+    storage_service = get_storage_service()
+    try:
+        result.image_hash = storage_service.hash_image(result.image_path)
+    except FileNotFoundError:
+        logging.warning(f"Image for test result {result.id} missing at {result.image_path}")
+        raise TestResultImageNotFoundError(result.id)
+
+    db.commit()
+    logging.info(f"Backfilled image hash for test result {result.id}")
+    return result.image_hash
+
+
+def _stored_image_path(result: TestResult) -> Path:
+    """Resolve a result's stored image, refusing any path that leaves the storage directory."""
+    storage_service = get_storage_service()
+    image_path = storage_service.get_image_path(result.image_path).resolve()
+    if storage_service.base_path.resolve() not in image_path.parents or not image_path.is_file():
+        logging.warning(f"Image for test result {result.id} missing at {result.image_path}")
+        raise TestResultImageNotFoundError(result.id)
+    return image_path
+
+
+def get_result_image(current_user: TokenData, db: Session, result_id: UUID) -> tuple[Path, str]:
+    """
+    Resolve the stored original image for a test result.
+
+    Returns:
+        Tuple of (image_path, image_hash)
+    """
+    result = get_test_result_by_id(current_user, db, result_id)
+    image_path = _stored_image_path(result)
+    return image_path, get_result_image_hash(db, result)
+
+
+def get_result_thumbnail(current_user: TokenData, db: Session, result_id: UUID, size: int) -> tuple[Path, str]:
+    """
+    Get a cached thumbnail for a test result image.
+
+    Returns:
+        Tuple of (thumbnail_path, cache_key)
+    """
+    result = get_test_result_by_id(current_user, db, result_id)
+    _stored_image_path(result)
+    image_hash = get_result_image_hash(db, result)
+    try:
+        return get_derivative_service().get_thumbnail(result.image_path, image_hash, size)
+    except (FileNotFoundError, ValueError):
+        raise TestResultImageNotFoundError(result_id)
+
+
+def get_result_overlay(current_user: TokenData, db: Session, result_id: UUID, size: int) -> tuple[Path, str]:
+    """
+    Get a cached render of a test result image with its detections drawn on it.
+
+    Returns:
+        Tuple of (overlay_path, cache_key)
+    """
+    result = get_test_result_by_id(current_user, db, result_id)
+    _stored_image_path(result)
+    image_hash = get_result_image_hash(db, result)
+    try:
+        return get_derivative_service().get_overlay(result.image_path, image_hash, result.detections, size)
+    except (FileNotFoundError, ValueError):
+        raise TestResultImageNotFoundError(result_id)
+
+
+def generate_result_derivatives(image_path: str, image_hash: str, detections: Optional[List[Dict[str, Any]]]) -> None:
+    """Pre-render derivatives for a new result (run as a background task after analysis)."""
+    get_derivative_service().generate_all(image_path, image_hash, detections)
+
+
+def get_pending_sync_results(
+    current_user: TokenData,
+    db: Session,
+    limit: int = 100,
+    cursor: Optional[str] = None
+) -> tuple[List[TestResult], Optional[str]]:
+    """
+    Get one page of test results pending sync, oldest first.
+
+    Args:
+        limit: Page size
+        cursor: Cursor returned with the previous page, or None for the first page
+
+    Returns:
+        Tuple of (results, next_cursor); next_cursor is None on the last page
+    """
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise InvalidCursorError(cursor)
+
+    query = db.query(TestResult).filter(TestResult.sync_status == SyncStatus.Pending)
+    # One extra row tells whether another page exists
+    results = fetch_page(query, TestResult.created_at, TestResult.id, limit + 1, after)
+
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        next_cursor = encode_cursor((results[-1].created_at, results[-1].id))
+
     logging.info(f"Retrieved {len(results)} pending sync results")
-    return results
+    return results, next_cursor
 
 
 def confirm_test_result(
@@ -302,7 +882,7 @@ def confirm_test_result(
     result.confirmed_at = datetime.now(timezone.utc)
     result.confirmation_notes = confirmation_notes
 
-    # Update the result if technician changed it
+    # Update the result if technician changed it; ai_result keeps the model's prediction
     if result.result != confirmed_result:
         logging.info(f"Technician changed result from {result.result.value} to {confirmed_result.value}")
         result.result = confirmed_result
@@ -1,9 +1,15 @@
-from fastapi import APIRouter, BackgroundTasks
-from pydantic import BaseModel
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, Header, Query, Response
+from fastapi.responses import FileResponse, JSONResponse
+from pydantic import BaseModel, Field
 
 from ..database.core import DbSession
 from ..auth.service import CurrentUser
 from ..infrastructure.sync_service import get_sync_service
+from ..infrastructure.sync_daemon import get_sync_daemon
+from ..exceptions import SyncNotConfiguredError
+from . import service
 
 router = APIRouter(
     prefix="/api/sync",
@@ -24,22 +30,92 @@ class SyncStatusResponse(BaseModel):
     failed: int
     sync_percentage: float
 
-@router.post("/all", response_model=SyncStats)
-def sync_all_pending(db: DbSession, current_user: CurrentUser, background_tasks: BackgroundTasks):
+class SyncRunProgress(BaseModel):
+    """Progress of the current or last sync daemon cycle."""
+    total: int
+    synced: int
+    failed: int
+    pulled: int = 0
+
+class SyncDaemonStatus(BaseModel):
+    """Background sync daemon state."""
+    state: str
+    online: Optional[bool] = None
+    pending: Optional[int] = None
+    current_run: Optional[SyncRunProgress] = None
+    synced_total: int
+    failed_total: int
+    bytes_sent: int
+    pulled_total: int
+    model_version: Optional[str] = None
+    consecutive_failures: int
+    last_attempt_at: Optional[datetime] = None
+    last_success_at: Optional[datetime] = None
+    next_attempt_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+
+class SyncChangeAck(BaseModel):
+    """Outcome of one ingested change."""
+    seq: int
+    status: str
+    error: Optional[str] = None
+
+class SyncChangesResponse(BaseModel):
+    """Acknowledgement of a change batch from a device."""
+    items: List[SyncChangeAck]
+    watermark: int
+
+class ImageUploadRequest(BaseModel):
+    """Start (or look up) the resumable upload of an image."""
+    hash: str = Field(..., description="SHA-256 of the image, lowercase hex")
+    size: int = Field(..., ge=1)
+    filename: str = ""
+
+class ImageUploadOffset(BaseModel):
+    """Bytes of an image the central server holds."""
+    offset: int
+
+class SyncChangeItem(BaseModel):
+    """One change in the central feed, in the push wire format."""
+    seq: int
+    entity: str
+    op: str
+    id: str
+    data: Optional[Dict[str, Any]] = None
+
+class SyncPullResponse(BaseModel):
+    """Page of central changes for devices."""
+    changes: List[SyncChangeItem]
+    cursor: int
+    has_more: bool
+
+class ModelManifest(BaseModel):
+    """Model version distributed to devices."""
+    version: str
+    sha256: str
+    size: int
+    compression: Optional[str] = None
+    path: str
+
+@router.post("/all", response_model=SyncDaemonStatus, status_code=202)
+def sync_all_pending(current_user: CurrentUser):
     """
     Sync all pending test results to the central server.
-    This operation runs in the background.
+    Wakes the background sync daemon and returns immediately; poll GET /api/sync/daemon for progress.
     """
-    sync_service = get_sync_service()
-    
-    # Run sync in background
-    def sync_task():
-        stats = sync_service.sync_all_pending(db)
-        return stats
-    
-    # For now, run synchronously (in production, use background_tasks.add_task)
-    stats = sync_task()
-    return SyncStats(**stats)
+    sync_daemon = get_sync_daemon()
+    if not sync_daemon.sync_service.is_configured:
+        raise SyncNotConfiguredError()
+
+    sync_daemon.start()
+    sync_daemon.trigger()
+    return SyncDaemonStatus(**sync_daemon.get_progress())
+
+
+@router.get("/daemon", response_model=SyncDaemonStatus)
+def get_sync_daemon_status(current_user: CurrentUser):
+    """Get the background sync daemon's state and progress."""
+    return SyncDaemonStatus(**get_sync_daemon().get_progress())
 
 
 @router.post("/retry", response_model=SyncStats)
@@ -57,3 +133,80 @@ def get_sync_status(db: DbSession, current_user: CurrentUser):
     status = sync_service.get_sync_status(db)
     return SyncStatusResponse(**status)
 
+
+@router.post("/changes", response_model=SyncChangesResponse)
+def receive_changes(db: DbSession, batch: service.ChangeBatch, device: service.SyncDevice):
+    """
+    Central server: apply a change batch pushed by an edge device.
+    Accepts gzip-compressed JSON or the binary sync format; returns an outcome per change.
+    """
+    with service.get_ingest_limiter().slot():
+        items, watermark = service.ingest_changes(db, batch["device_id"], batch["changes"])
+    return SyncChangesResponse(items=items, watermark=watermark)
+
+
+
+@router.post("/images", response_model=ImageUploadOffset)
+def open_image_upload(db: DbSession, upload: ImageUploadRequest, device: service.SyncDevice):
+    """
+    Central server: start or resume an image upload.
+    Returns the bytes already received; an offset equal to the size means the image is stored.
+    """
+    store = service.get_image_upload_store()
+    offset = store.open_upload(db, store.check_hash(upload.hash), upload.size, upload.filename)
+    return ImageUploadOffset(offset=offset)
+
+
+@router.head("/images/{image_hash}")
+def get_image_upload_offset(db: DbSession, image_hash: str, device: service.SyncDevice):
+    """Central server: progress of an image upload, in the Upload-Offset and Upload-Length headers."""
+    store = service.get_image_upload_store()
+    offset, size = store.get_offset(db, store.check_hash(image_hash))
+    return Response(headers={"Upload-Offset": str(offset), "Upload-Length": str(size), "Cache-Control": "no-store"})
+
+
+@router.patch("/images/{image_hash}", response_model=ImageUploadOffset, responses={409: {"model": ImageUploadOffset, "description": "Upload-Offset does not match"}})
+def upload_image_chunk(
+    db: DbSession,
+    image_hash: str,
+    chunk: service.ImageChunk,
+    device: service.SyncDevice,
+    upload_offset: int = Header(..., ge=0),
+    upload_checksum: str = Header(..., description="sha256 <base64 digest of the chunk>"),
+):
+    """
+    Central server: append a chunk to an image upload.
+    Answers 409 with the current offset if Upload-Offset does not match it.
+    """
+    store = service.get_image_upload_store()
+    accepted, offset = store.write_chunk(db, store.check_hash(image_hash), upload_offset, upload_checksum, chunk)
+    if not accepted:
+        return JSONResponse(status_code=409, content={"offset": offset})
+    return ImageUploadOffset(offset=offset)
+
+
+@router.get("/pull", response_model=SyncPullResponse)
+def pull_changes(
+    db: DbSession,
+    device: service.SyncDevice,
+    after: int = Query(0, ge=0, description="Cursor returned by the previous page"),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """Central server: clinic and patient changes after a cursor, for devices to apply locally."""
+    changes, cursor, has_more = service.get_changes_after(db, after, limit)
+    return SyncPullResponse(changes=changes, cursor=cursor, has_more=has_more)
+
+
+@router.get("/models/latest", response_model=ModelManifest, responses={204: {"description": "No model is published"}})
+def get_latest_model(device: service.SyncDevice):
+    """Central server: the model version devices should run, with the SHA-256 they verify it against."""
+    manifest = service.get_published_model()
+    if manifest is None:
+        return Response(status_code=204)
+    return ModelManifest(**manifest)
+
+
+@router.get("/models/{sha256}", response_class=FileResponse)
+def download_model(sha256: str, device: service.SyncDevice):
+    """Central server: download the published model artifact. Supports Range requests to resume."""
+    return FileResponse(service.get_model_artifact(sha256), media_type="application/octet-stream")
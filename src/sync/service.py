@@ -0,0 +1,570 @@
+"""
+Central side of sync
+Receives change batches from edge devices and applies them idempotently,
+and serves them the central change feed and model updates.
+"""
+
+import os
+import gzip
+import hmac
+import json
+import zlib
+import re
+import base64
+import random
+import hashlib
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Annotated, Any, Dict, List, Optional, Tuple
+from uuid import UUID
+from fastapi import Depends, Request
+from sqlalchemy import delete, insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from src.auth.service import oauth2_bearer, verify_token
+from src.dashboard.cache import mark_stale
+from src.dashboard.rollups import rollup_keys, refresh_daily_stats, clinics_changing_timezone, refresh_clinic_stats
+from src.database.upsert import upsert_rows
+from src.entities.sync_change import ChangeLog, ChangeOperation, SyncState
+from src.entities.test_result import TestResult
+from src.exceptions import (
+    InvalidSyncPayloadError, UnsupportedSyncFormatError, SyncIngestBusyError, SyncModelNotFoundError,
+    ImageUploadNotFoundError, ImageChecksumMismatchError,
+)
+from src.infrastructure import sync_codec
+from src.infrastructure.change_tracking import TRACKED_ENTITIES
+from src.infrastructure.sync_service import SyncService
+from src.infrastructure.file_storage import FileStorageService, get_storage_service
+import logging
+
+# Decompressed size limit for one change batch
+MAX_BATCH_BYTES = int(os.getenv("SYNC_INGEST_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# Sync state rows holding each device's watermark are named device:<device_id>
+DEVICE_STATE_PREFIX = "device:"
+
+# Largest image chunk accepted in one PATCH
+MAX_CHUNK_BYTES = int(os.getenv("SYNC_UPLOAD_MAX_CHUNK_BYTES", str(8 * 1024 * 1024)))
+
+# Images uploaded by devices are stored here, named by content hash
+SYNC_IMAGE_DIR = "sync"
+
+# Model artifact distributed to devices; a .gz file is served gzip-compressed
+MODEL_PATH_ENV = "SYNC_MODEL_PATH"
+MODEL_VERSION_ENV = "SYNC_MODEL_VERSION"
+
+# Stored on the device only; the central copy keeps its own value
+PRESERVED_COLUMNS = {
+    TestResult: {"image_path"},
+}
+
+
+def verify_sync_device(token: Annotated[str, Depends(oauth2_bearer)]) -> str:
+    """
+    Authenticate a device by its SYNC_API_TOKEN: one of the tokens in SYNC_DEVICE_TOKENS,
+    or a user access token.
+    """
+    device_tokens = [t.strip() for t in os.getenv("SYNC_DEVICE_TOKENS", "").split(",") if t.strip()]
+    if not any(hmac.compare_digest(token, device_token) for device_token in device_tokens):
+        verify_token(token)
+    return token
+
+SyncDevice = Annotated[str, Depends(verify_sync_device)]
+
+
+class IngestLimiter:
+    """
+    Admission control for change batches.
+
+    At most max_concurrent batches are applied at once so a burst of reconnecting
+    devices cannot exhaust database connections. A batch waits up to queue_seconds
+    for a slot; after that it is turned away with 503 and a randomized Retry-After,
+    which spreads the devices' retries out instead of having them return together.
+    """
+
+    def __init__(self, max_concurrent: int = None, queue_seconds: float = None, retry_after_seconds: int = None):
+        self.max_concurrent = max_concurrent or int(os.getenv("SYNC_INGEST_CONCURRENCY", "8"))
+        self.queue_seconds = queue_seconds if queue_seconds is not None else float(os.getenv("SYNC_INGEST_QUEUE_SECONDS", "2"))
+        self.retry_after_seconds = retry_after_seconds or int(os.getenv("SYNC_INGEST_RETRY_AFTER_SECONDS", "30"))
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+
+    @contextmanager
+    def slot(self):
+        """Hold an ingestion slot for the duration of the block."""
+        if not self._slots.acquire(timeout=self.queue_seconds):
+            raise SyncIngestBusyError(random.randint(max(self.retry_after_seconds // 2, 1), self.retry_after_seconds))
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+
+def _decompress(body: bytes) -> bytes:
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        data = decompressor.decompress(body, MAX_BATCH_BYTES)
+    except zlib.error as e:
+        raise InvalidSyncPayloadError(f"bad gzip body ({str(e)})")
+    if decompressor.unconsumed_tail:
+        raise InvalidSyncPayloadError(f"batch exceeds {MAX_BATCH_BYTES} bytes")
+    return data
+
+
+async def read_change_batch(request: Request) -> Dict[str, Any]:
+    """
+    Read and decode a change batch in either wire format (see SyncTransport).
+
+    Raises:
+        UnsupportedSyncFormatError: For an unknown content type or schema version
+        InvalidSyncPayloadError: If the body cannot be decoded or lacks required fields
+    """
+    body = await request.body()
+    if request.headers.get("Content-Encoding") == "gzip":
+        body = _decompress(body)
+    elif len(body) > MAX_BATCH_BYTES:
+        raise InvalidSyncPayloadError(f"batch exceeds {MAX_BATCH_BYTES} bytes")
+
+    content_type = request.headers.get("Content-Type", "").split(";")[0].strip()
+    if content_type == sync_codec.MSGPACK_CONTENT_TYPE:
+        version = request.headers.get("X-Sync-Schema-Version", str(sync_codec.SCHEMA_VERSION))
+        if not sync_codec.msgpack_available() or version != str(sync_codec.SCHEMA_VERSION):
+            raise UnsupportedSyncFormatError(f"{content_type} version {version}")
+        try:
+            payload = sync_codec.decode_changes(body)
+        except ValueError as e:
+            raise InvalidSyncPayloadError(str(e))
+    elif content_type == sync_codec.JSON_CONTENT_TYPE:
+        try:
+            payload = json.loads(body)
+        except ValueError as e:
+            raise InvalidSyncPayloadError(str(e))
+    else:
+        raise UnsupportedSyncFormatError(content_type or "none")
+
+    if not isinstance(payload, dict) or not isinstance(payload.get("device_id"), str) or not isinstance(payload.get("changes"), list):
+        raise InvalidSyncPayloadError("expected {\"device_id\": ..., \"changes\": [...]}")
+    for change in payload["changes"]:
+        if not isinstance(change, dict) or not isinstance(change.get("seq"), int):
+            raise InvalidSyncPayloadError("every change needs an integer seq")
+    return payload
+
+ChangeBatch = Annotated[Dict[str, Any], Depends(read_change_batch)]
+
+
+def _parse_change(change: Dict[str, Any]) -> Tuple[str, str, UUID, Optional[Dict[str, Any]]]:
+    """
+    Validate one wire item.
+
+    Returns:
+        Tuple of (entity type, operation, id, column values for upserts)
+
+    Raises:
+        ValueError: If the item is malformed
+    """
+    entity_type, operation = change.get("entity"), change.get("op")
+    if entity_type not in TRACKED_ENTITIES:
+        raise ValueError(f"unknown entity {entity_type!r}")
+    entity_id = UUID(str(change.get("id")))
+    if operation == ChangeOperation.Delete.value:
+        return entity_type, operation, entity_id, None
+    if operation != ChangeOperation.Upsert.value or not isinstance(change.get("data"), dict):
+        raise ValueError(f"invalid operation {operation!r}")
+
+    entity = TRACKED_ENTITIES[entity_type]
+    row = SyncService.deserialize_row(entity, change["data"])
+    row["id"] = entity_id
+    if entity is TestResult:
+        # image_path is central-only: a device's own path must never reach the thumbnail routes.
+        # Images arrive separately, keyed by content hash; pointed at the stored file once it is there
+        try:
+            image_hash = ImageUploadStore.check_hash(str(change["data"].get("image_hash")))
+        except InvalidSyncPayloadError as e:
+            raise ValueError(e.detail)
+        row["image_path"] = f"{SYNC_IMAGE_DIR}/{image_hash}"
+    return entity_type, operation, entity_id, row
+
+
+def _write_isolated(db: Session, keys: List, write) -> Dict[Any, Optional[str]]:
+    """
+    Run write(keys) in a savepoint. If the database refuses it, retry key by key,
+    so one bad record only rejects itself.
+
+    Returns:
+        Mapping of key to None (written) or the database error
+    """
+    try:
+        with db.begin_nested():
+            write(keys)
+        return {key: None for key in keys}
+    except SQLAlchemyError:
+        pass
+
+    outcomes = {}
+    for key in keys:
+        try:
+            with db.begin_nested():
+                write([key])
+            outcomes[key] = None
+        except SQLAlchemyError as e:
+            outcomes[key] = str(getattr(e, "orig", None) or e).splitlines()[0]
+    return outcomes
+
+
+def ingest_changes(db: Session, device_id: str, changes: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Apply a device's change batch idempotently.
+
+    Upserts are one INSERT ... ON CONFLICT DO UPDATE per entity type, parents first;
+    deletes are one DELETE per entity type, children first. Replaying a batch leaves
+    the same state. Items that fail validation or a database constraint are rejected
+    individually; the rest of the batch is still applied.
+
+    Returns:
+        Tuple of (per-item outcomes in request order, the device's watermark)
+    """
+    errors: Dict[int, Optional[str]] = {}
+    latest: Dict[Tuple[str, UUID], Tuple[str, Optional[Dict[str, Any]]]] = {}
+    seqs: Dict[Tuple[str, UUID], List[int]] = {}
+    for change in changes:
+        try:
+            entity_type, operation, entity_id, row = _parse_change(change)
+        except (ValueError, TypeError, AttributeError) as e:
+            errors[change["seq"]] = str(e)
+            continue
+        # Several changes to one record collapse to the last; all are acknowledged with it
+        key = (entity_type, entity_id)
+        latest[key] = (operation, row)
+        seqs.setdefault(key, []).append(change["seq"])
+
+    # Bulk writes bypass the ORM, so refresh the dashboard rollups of every touched result explicitly
+    result_ids = [key[1] for key in latest if key[0] == "test_result"]
+    stale_keys = rollup_keys(db, result_ids)
+    moved_clinics = clinics_changing_timezone(db, [row for key, (operation, row) in latest.items() if key[0] == "clinic" and row is not None])
+
+    outcomes: Dict[Tuple[str, UUID], Optional[str]] = {}
+    for entity_type, entity in TRACKED_ENTITIES.items():
+        rows = {key: row for key, (operation, row) in latest.items() if key[0] == entity_type and row is not None}
+        if rows:
+            preserve = PRESERVED_COLUMNS.get(entity, set())
+            outcomes.update(_write_isolated(
+                db, list(rows),
+                lambda keys, entity=entity, rows=rows, preserve=preserve: upsert_rows(db, entity, [rows[key] for key in keys], preserve),
+            ))
+
+    for entity_type, entity in reversed(TRACKED_ENTITIES.items()):
+        keys = [key for key, (operation, row) in latest.items() if key[0] == entity_type and row is None]
+        if keys:
+            outcomes.update(_write_isolated(
+                db, keys,
+                lambda keys, entity=entity: db.execute(delete(entity).where(entity.id.in_([key[1] for key in keys]))),
+            ))
+
+    for key, error in outcomes.items():
+        for seq in seqs[key]:
+            errors[seq] = error
+
+    # Bulk writes bypass change tracking; log accepted clinic and patient changes so the
+    # pull feed hands them on to the other devices
+    pulled = [
+        {"entity_type": key[0], "entity_id": key[1], "operation": latest[key][0], "changed_at": datetime.now(timezone.utc)}
+        for key, error in outcomes.items()
+        if error is None and key[0] in SyncService.PULLED_ENTITIES
+    ]
+    if pulled:
+        db.execute(insert(ChangeLog.__table__), pulled)
+
+    # Images are uploaded before their batch, so new results can point at the stored file
+    image_hashes = {row.get("image_hash") for key, (operation, row) in latest.items() if key[0] == "test_result" and row is not None}
+    upload_store = get_image_upload_store()
+    for image_hash in image_hashes - {None}:
+        stored_path = upload_store.find_stored(db, image_hash)
+        if stored_path is not None:
+            link_stored_image(db, image_hash, stored_path)
+
+    refresh_daily_stats(db, stale_keys | rollup_keys(db, result_ids))
+    if moved_clinics:
+        refresh_clinic_stats(db, moved_clinics)
+    if any(error is None for error in outcomes.values()):
+        mark_stale(db)
+
+    # Every item in the batch has been processed, accepted or rejected
+    state_name = f"{DEVICE_STATE_PREFIX}{device_id}"
+    state = db.get(SyncState, state_name, with_for_update=True)
+    batch_watermark = max((change["seq"] for change in changes), default=0)
+    if state is None:
+        state = SyncState(name=state_name, watermark=batch_watermark)
+        db.add(state)
+    else:
+        state.watermark = max(state.watermark, batch_watermark)
+    db.commit()
+
+    items = [
+        {"seq": change["seq"], "status": "accepted" if errors.get(change["seq"]) is None else "rejected", "error": errors.get(change["seq"])}
+        for change in changes
+    ]
+    rejected = sum(1 for item in items if item["error"] is not None)
+    logging.info(f"Ingested {len(items) - rejected} changes from device {device_id} ({rejected} rejected)")
+    return items, state.watermark
+
+
+def link_stored_image(db: Session, image_hash: str, stored_path: str) -> int:
+    """Point results still waiting for an image (placeholder path) at its stored file. Does not commit."""
+    return db.query(TestResult).filter(TestResult.image_path == f"{SYNC_IMAGE_DIR}/{image_hash}").update(
+        {TestResult.image_path: stored_path}, synchronize_session=False
+    )
+
+
+class ImageUploadStore:
+    """
+    Central side of the resumable image uploads (see SyncTransport).
+
+    An upload is keyed by the image's SHA-256 and its bytes are appended to a partial
+    file in the storage staging area, which the storage sweeper discards if it is
+    abandoned. Each chunk must start at the current offset and match its Upload-Checksum.
+    The complete file is verified against the hash and moved to sync/<hash><ext>. An
+    image already stored, from any device or a local upload, is never uploaded again.
+    """
+
+    HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+    def __init__(self, storage_service: FileStorageService):
+        self.storage_service = storage_service
+        # Serializes offset checks and appends across request threads
+        self._lock = threading.Lock()
+
+    @classmethod
+    def check_hash(cls, image_hash: str) -> str:
+        if not cls.HASH_PATTERN.match(image_hash):
+            raise InvalidSyncPayloadError("image hash must be a lowercase hex SHA-256")
+        return image_hash
+
+    def _partial_path(self, image_hash: str) -> Path:
+        return self.storage_service.get_staged_path(f"{SYNC_IMAGE_DIR}/{image_hash}.part")
+
+    def _info_path(self, image_hash: str) -> Path:
+        return self.storage_service.get_staged_path(f"{SYNC_IMAGE_DIR}/{image_hash}.json")
+
+    def _read_info(self, image_hash: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._info_path(image_hash)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def find_stored(self, db: Session, image_hash: str) -> Optional[str]:
+        """Relative path of a stored copy of the image, or None."""
+        for row in db.query(TestResult.image_path).filter(TestResult.image_hash == image_hash).limit(10):
+            if self.storage_service.get_image_path(row.image_path).is_file():
+                return row.image_path
+        directory = self.storage_service.get_image_path(SYNC_IMAGE_DIR)
+        for file_path in directory.glob(f"{image_hash}*"):
+            if file_path.name == image_hash or file_path.name.startswith(f"{image_hash}."):
+                return f"{SYNC_IMAGE_DIR}/{file_path.name}"
+        return None
+
+    def get_offset(self, db: Session, image_hash: str) -> Tuple[int, int]:
+        """
+        Progress of an upload.
+
+        Returns:
+            Tuple of (bytes received, declared size)
+
+        Raises:
+            ImageUploadNotFoundError: If the image is neither stored nor being uploaded
+        """
+        info = self._read_info(image_hash)
+        if info is not None:
+            partial_path = self._partial_path(image_hash)
+            return (partial_path.stat().st_size if partial_path.exists() else 0), info["size"]
+        stored_path = self.find_stored(db, image_hash)
+        if stored_path is None:
+            raise ImageUploadNotFoundError(image_hash)
+        size = self.storage_service.get_image_path(stored_path).stat().st_size
+        return size, size
+
+    def open_upload(self, db: Session, image_hash: str, size: int, filename: str) -> int:
+        """
+        Start an upload, or look up one that already exists.
+
+        Returns:
+            Bytes already received; size if the image is stored
+        """
+        with self._lock:
+            if self._read_info(image_hash) is None:
+                stored_path = self.find_stored(db, image_hash)
+                if stored_path is not None:
+                    return size
+                info_path = self._info_path(image_hash)
+                info_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(info_path, "w") as f:
+                    json.dump({"size": size, "filename": filename}, f)
+            return self.get_offset(db, image_hash)[0]
+
+    def write_chunk(self, db: Session, image_hash: str, offset: int, checksum: str, chunk: bytes) -> Tuple[bool, int]:
+        """
+        Append a chunk at offset, completing the upload when it reaches the declared size.
+
+        Returns:
+            Tuple of (whether the chunk was accepted, the offset after the request);
+            a chunk that does not start at the current offset is not accepted
+
+        Raises:
+            ImageUploadNotFoundError: If the image is neither stored nor being uploaded
+            ImageChecksumMismatchError: If the chunk or the complete image does not match its hash
+            InvalidSyncPayloadError: If the chunk runs past the declared size
+        """
+        algorithm, _, digest = checksum.partition(" ")
+        try:
+            expected = base64.b64decode(digest, validate=True)
+        except ValueError:
+            expected = None
+        if algorithm != "sha256" or expected != hashlib.sha256(chunk).digest():
+            raise ImageChecksumMismatchError("chunk does not match Upload-Checksum")
+
+        with self._lock:
+            received, size = self.get_offset(db, image_hash)
+            if offset != received or received >= size:
+                return False, received
+            if offset + len(chunk) > size:
+                raise InvalidSyncPayloadError(f"chunk runs past the declared size of {size} bytes")
+
+            partial_path = self._partial_path(image_hash)
+            partial_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(partial_path, "ab") as f:
+                f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+            received += len(chunk)
+            if received == size:
+                self._complete(db, image_hash)
+            return True, received
+
+    def _complete(self, db: Session, image_hash: str) -> str:
+        partial_path = self._partial_path(image_hash)
+        digest = hashlib.sha256()
+        with open(partial_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        if digest.hexdigest() != image_hash:
+            # Start over rather than keep bytes that can never verify
+            partial_path.unlink()
+            raise ImageChecksumMismatchError(f"uploaded image hashes to {digest.hexdigest()}")
+
+        extension = Path(self._read_info(image_hash).get("filename") or "").suffix.lower()
+        if not re.fullmatch(r"\.[a-z0-9]{1,8}", extension):
+            extension = ""
+        stored_path = f"{SYNC_IMAGE_DIR}/{image_hash}{extension}"
+        file_path = self.storage_service.get_image_path(stored_path)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(partial_path, file_path)
+        self._info_path(image_hash).unlink(missing_ok=True)
+
+        # Results synced before their image arrived
+        link_stored_image(db, image_hash, stored_path)
+        db.commit()
+        logging.info(f"Stored synced image {stored_path}")
+        return stored_path
+
+
+async def read_image_chunk(request: Request) -> bytes:
+    """Read the raw body of a chunk upload."""
+    body = await request.body()
+    if len(body) > MAX_CHUNK_BYTES:
+        raise InvalidSyncPayloadError(f"chunk exceeds {MAX_CHUNK_BYTES} bytes")
+    return body
+
+ImageChunk = Annotated[bytes, Depends(read_image_chunk)]
+
+
+def get_changes_after(db: Session, after: int, limit: int) -> Tuple[List[Dict[str, Any]], int, bool]:
+    """
+    Page of the central change feed for devices: clinic and patient changes logged after a cursor.
+
+    Items use the push wire format and carry each record's current state; several changes
+    to one record within the page are sent once.
+
+    Returns:
+        Tuple of (change items, cursor to resume from, whether more changes are waiting)
+    """
+    rows = db.query(ChangeLog.seq, ChangeLog.entity_type, ChangeLog.entity_id, ChangeLog.operation).filter(
+        ChangeLog.seq > after,
+        ChangeLog.entity_type.in_(SyncService.PULLED_ENTITIES),
+    ).order_by(ChangeLog.seq).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    items, _ = SyncService.build_changes(db, rows)
+    return items, rows[-1].seq if rows else after, has_more
+
+
+_model_hashes: Dict[Tuple[str, int, int], str] = {}
+
+def _model_sha256(path: Path) -> str:
+    """SHA-256 of the (decompressed) model, cached until the file changes."""
+    stat_result = path.stat()
+    key = (str(path), stat_result.st_mtime_ns, stat_result.st_size)
+    if key not in _model_hashes:
+        digest = hashlib.sha256()
+        opener = gzip.open if path.suffix == ".gz" else open
+        with opener(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        _model_hashes[key] = digest.hexdigest()
+    return _model_hashes[key]
+
+def get_published_model() -> Optional[Dict[str, Any]]:
+    """
+    Manifest of the model distributed to devices (SYNC_MODEL_PATH), see SyncTransport.
+
+    sha256 is of the model itself, after decompression, and path is where devices
+    download the artifact.
+
+    Returns:
+        Manifest dict, or None if no model is published
+    """
+    model_path = os.getenv(MODEL_PATH_ENV)
+    if not model_path or not Path(model_path).is_file():
+        return None
+    path = Path(model_path)
+    sha256 = _model_sha256(path)
+    return {
+        "version": os.getenv(MODEL_VERSION_ENV) or Path(path.stem if path.suffix == ".gz" else path.name).stem,
+        "sha256": sha256,
+        "size": path.stat().st_size,
+        "compression": "gzip" if path.suffix == ".gz" else None,
+        "path": f"/api/sync/models/{sha256}",
+    }
+
+def get_model_artifact(sha256: str) -> Path:
+    """
+    File of the published model with the given hash.
+
+    Raises:
+        SyncModelNotFoundError: If that model is not the one published
+    """
+    manifest = get_published_model()
+    if manifest is None or manifest["sha256"] != sha256.lower():
+        raise SyncModelNotFoundError()
+    return Path(os.environ[MODEL_PATH_ENV])
+
+
+# Singleton instance
+_ingest_limiter = None
+
+def get_ingest_limiter() -> IngestLimiter:
+    """Get or create the singleton ingest limiter instance."""
+    global _ingest_limiter
+    if _ingest_limiter is None:
+        _ingest_limiter = IngestLimiter()
+    return _ingest_limiter
+
+
+_image_upload_store = None
+
+def get_image_upload_store() -> ImageUploadStore:
+    """Get or create the singleton image upload store instance."""
+    global _image_upload_store
+    if _image_upload_store is None:
+        _image_upload_store = ImageUploadStore(get_storage_service())
+    return _image_upload_store
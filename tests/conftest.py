@@ -12,6 +12,11 @@ from src.entities.test_result import TestResult
 from src.auth.models import TokenData
 from src.auth.service import get_password_hash
 from src.rate_limiter import limiter
+from src.infrastructure import file_storage, image_derivatives
+from src.infrastructure.file_storage import FileStorageService
+from src.infrastructure.image_derivatives import ImageDerivativeService
+import src.main  # noqa: F401 - registers every entity table and session listener before create_all
+from tests.mock_central_server import MockCentralServer
 
 
 @pytest.fixture(scope="function")
@@ -94,4 +99,23 @@ def auth_headers(client, db_session):
     assert response.status_code == 200
     token = response.json()["access_token"]
     
-    return {"Authorization": f"Bearer {token}"} 
\ No newline at end of file
+    return {"Authorization": f"Bearer {token}"} 
+
+@pytest.fixture(scope="function")
+def central_server():
+    """Run a mock central server for the duration of a test."""
+    server = MockCentralServer().start()
+    yield server
+    server.stop()
+
+@pytest.fixture(scope="function")
+def storage(tmp_path, monkeypatch):
+    """Point the storage and derivative singletons at a temporary directory."""
+    storage_service = FileStorageService(base_path=str(tmp_path / "uploads"))
+    monkeypatch.setattr(file_storage, "_storage_service", storage_service)
+    monkeypatch.setattr(
+        image_derivatives,
+        "_derivative_service",
+        ImageDerivativeService(storage_service, cache_path=str(tmp_path / "derivatives")),
+    )
+    return storage_service
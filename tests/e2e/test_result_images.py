@@ -0,0 +1,101 @@
+import io
+import pytest
+from uuid import uuid4
+from PIL import Image
+from fastapi.testclient import TestClient
+from src.entities.test_result import TestResult, TestStatus
+
+@pytest.fixture
+def stored_result(db_session, storage):
+    """Create a test result whose image exists in storage."""
+    buffer = io.BytesIO()
+    Image.new("RGB", (640, 480), (180, 90, 120)).save(buffer, format="JPEG")
+    image_path, image_filename = storage.save_image(buffer.getvalue(), "smear.jpg", "clinic")
+
+    result = TestResult(
+        id=uuid4(),
+        patient_id=uuid4(),
+        clinic_id=uuid4(),
+        health_worker_id=uuid4(),
+        result=TestStatus.Negative,
+        image_path=image_path,
+        image_filename=image_filename,
+    )
+    db_session.add(result)
+    db_session.commit()
+    return result, buffer.getvalue()
+
+def test_get_result_image(client: TestClient, auth_headers, stored_result):
+    result, content = stored_result
+    response = client.get(f"/api/results/{result.id}/image", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.content == content
+    assert response.headers["content-type"] == "image/jpeg"
+    assert response.headers["accept-ranges"] == "bytes"
+    assert "immutable" in response.headers["cache-control"]
+
+def test_get_result_image_range(client: TestClient, auth_headers, stored_result):
+    result, content = stored_result
+    response = client.get(
+        f"/api/results/{result.id}/image",
+        headers={**auth_headers, "Range": "bytes=10-109"},
+    )
+    assert response.status_code == 206
+    assert response.content == content[10:110]
+    assert response.headers["content-range"] == f"bytes 10-109/{len(content)}"
+
+def test_get_result_image_conditional(client: TestClient, auth_headers, stored_result):
+    result, _ = stored_result
+    first = client.get(f"/api/results/{result.id}/image", headers=auth_headers)
+
+    response = client.get(
+        f"/api/results/{result.id}/image",
+        headers={**auth_headers, "If-None-Match": first.headers["etag"]},
+    )
+    assert response.status_code == 304
+
+    response = client.get(
+        f"/api/results/{result.id}/image",
+        headers={**auth_headers, "If-Modified-Since": first.headers["last-modified"]},
+    )
+    assert response.status_code == 304
+
+def test_get_result_thumbnail(client: TestClient, auth_headers, stored_result):
+    result, _ = stored_result
+    response = client.get(f"/api/results/{result.id}/thumbnail?size=128", headers=auth_headers)
+    assert response.status_code == 200
+    assert max(Image.open(io.BytesIO(response.content)).size) == 128
+
+    response = client.get(
+        f"/api/results/{result.id}/thumbnail?size=128",
+        headers={**auth_headers, "If-None-Match": response.headers["etag"]},
+    )
+    assert response.status_code == 304
+
+def test_get_result_image_missing(client: TestClient, auth_headers, db_session, stored_result, storage):
+    result, _ = stored_result
+    storage.delete_image(result.image_path)
+    response = client.get(f"/api/results/{result.id}/image", headers=auth_headers)
+    assert response.status_code == 404
+
+@pytest.mark.parametrize("kind", ["image", "thumbnail", "overlay"])
+def test_result_images_outside_storage_are_refused(client: TestClient, auth_headers, db_session, stored_result, storage, tmp_path, kind):
+    result, content = stored_result
+    (tmp_path / "outside.jpg").write_bytes(content)
+    result.image_path = "../outside.jpg"
+    db_session.commit()
+    response = client.get(f"/api/results/{result.id}/{kind}", headers=auth_headers)
+    assert response.status_code == 404
+
+def test_result_thumbnail_with_invalid_hash_is_refused(client: TestClient, auth_headers, db_session, stored_result, tmp_path):
+    result, _ = stored_result
+    result.image_hash = "../" * 20 + "x" * 4
+    db_session.commit()
+    response = client.get(f"/api/results/{result.id}/thumbnail", headers=auth_headers)
+    assert response.status_code == 404
+    assert not list((tmp_path / "derivatives").rglob("*.jpg"))
+
+def test_result_image_requires_auth(client: TestClient, stored_result):
+    result, _ = stored_result
+    response = client.get(f"/api/results/{result.id}/image")
+    assert response.status_code == 401
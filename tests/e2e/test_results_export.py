@@ -0,0 +1,89 @@
+import csv
+import io
+import pytest
+from datetime import datetime
+from uuid import uuid4
+from fastapi.testclient import TestClient
+from src.entities.clinic import Clinic
+from src.entities.test_result import TestResult, TestStatus
+from src.results import export
+
+@pytest.fixture
+def exported_results(db_session):
+    """Two clinics in different districts with results on consecutive days."""
+    clinics = [
+        Clinic(id=uuid4(), name="Clinic A", district="Gaborone", region="South-East"),
+        Clinic(id=uuid4(), name="Clinic B", district="Francistown", region="North-East"),
+    ]
+    db_session.add_all(clinics)
+    results = [
+        TestResult(
+            id=uuid4(),
+            patient_id=uuid4(),
+            clinic_id=clinics[day % 2].id,
+            health_worker_id=uuid4(),
+            result=TestStatus.Positive if day % 3 == 0 else TestStatus.Negative,
+            confidence_score=0.9,
+            image_path=f"uploads/{day}.jpg",
+            image_filename=f"{day}.jpg",
+            test_date=datetime(2026, 3, day + 1, 9, 30),
+        )
+        for day in range(6)
+    ]
+    db_session.add_all(results)
+    db_session.commit()
+    return [clinic.id for clinic in clinics], [result.id for result in results]
+
+def read_csv(text: str):
+    return list(csv.DictReader(io.StringIO(text)))
+
+def test_export_csv(client: TestClient, auth_headers, exported_results):
+    _, result_ids = exported_results
+    response = client.get("/api/results/export", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert 'filename="test_results_all_now.csv"' in response.headers["content-disposition"]
+
+    rows = read_csv(response.text)
+    assert [row["id"] for row in rows] == [str(result_id) for result_id in result_ids]
+    assert rows[0]["result"] == "positive"
+    assert rows[0]["clinic_name"] == "Clinic A"
+    assert rows[0]["test_date"] == "2026-03-01T09:30:00"
+    assert rows[0]["confirmed_at"] == ""
+
+def test_export_csv_filters(client: TestClient, auth_headers, exported_results):
+    clinic_ids, _ = exported_results
+    response = client.get(
+        "/api/results/export?start_date=2026-03-02&end_date=2026-03-05&district=Gaborone",
+        headers=auth_headers,
+    )
+    rows = read_csv(response.text)
+    assert [row["test_date"][:10] for row in rows] == ["2026-03-03", "2026-03-05"]
+    assert {row["clinic_id"] for row in rows} == {str(clinic_ids[0])}
+
+    response = client.get(f"/api/results/export?clinic_id={clinic_ids[1]}&end_date=2026-01-01", headers=auth_headers)
+    assert response.text.strip() == ",".join(name for name, _, _ in export.EXPORT_COLUMNS)
+
+def test_export_csv_streams_in_batches(db_session, exported_results):
+    chunks = list(export.stream_csv(db_session, export.export_query(), batch_size=4))
+    assert len(chunks) == 2
+    assert len(read_csv(b"".join(chunks).decode())) == 6
+
+def test_export_rejects_inverted_range(client: TestClient, auth_headers):
+    response = client.get("/api/results/export?start_date=2026-03-05&end_date=2026-03-01", headers=auth_headers)
+    assert response.status_code == 422
+
+def test_export_parquet(client: TestClient, auth_headers, exported_results, monkeypatch):
+    if not export.parquet_available():
+        response = client.get("/api/results/export?format=parquet", headers=auth_headers)
+        assert response.status_code == 501
+        return
+    import pyarrow.parquet
+
+    monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 4)
+    response = client.get("/api/results/export?format=parquet", headers=auth_headers)
+    assert response.status_code == 200
+    table = pyarrow.parquet.read_table(io.BytesIO(response.content))
+    assert table.num_rows == 6
+    assert table.column("result").to_pylist()[0] == "positive"
+    assert pyarrow.parquet.ParquetFile(io.BytesIO(response.content)).num_row_groups == 2
@@ -0,0 +1,227 @@
+import os
+import gzip
+import base64
+import hashlib
+import pytest
+from uuid import UUID, uuid4
+from src.entities.clinic import Clinic
+from src.entities.patient import Patient
+from src.entities.test_result import TestResult, TestStatus
+from src.entities.sync_change import SyncState
+from src.entities.daily_clinic_stats import DailyClinicStats
+from src.infrastructure.sync_transport import SyncTransport, SyncTransportError
+from src.infrastructure.model_updater import ModelUpdater
+from src.infrastructure.image_upload import ImageUploader
+from src.infrastructure.file_storage import FileStorageService
+from src.sync import service as sync_ingest
+from src.sync.service import IngestLimiter, ImageUploadStore
+from tests.test_model_updater import RecordingInferenceService
+
+DEVICE_TOKEN = "device-secret"
+
+@pytest.fixture
+def device(client, monkeypatch):
+    """A device transport that talks to the app in-process."""
+    monkeypatch.setenv("SYNC_DEVICE_TOKENS", f"other-token,{DEVICE_TOKEN}")
+    transport = SyncTransport(
+        "http://testserver", api_token=DEVICE_TOKEN, device_id="pi-01",
+        transport=client._transport, payload_format="json",
+    )
+    yield transport
+    transport.close()
+
+@pytest.fixture
+def central_storage(tmp_path, monkeypatch):
+    """Store images uploaded to the app under a temporary directory."""
+    storage = FileStorageService(base_path=str(tmp_path / "central"))
+    monkeypatch.setattr(sync_ingest, "_image_upload_store", ImageUploadStore(storage))
+    return storage
+
+@pytest.fixture
+def uploader(device, tmp_path):
+    """Uploads images from a device-side storage directory in small chunks."""
+    return ImageUploader(device, FileStorageService(base_path=str(tmp_path / "device")), chunk_size=1000)
+
+def record_changes(clinic_id, patient_id, result_id, seq=1):
+    clinic = {"id": str(clinic_id), "name": "Central", "district": "Gaborone", "region": "South-East"}
+    patient = {"id": str(patient_id), "clinic_id": str(clinic_id), "first_name": "Ada", "last_name": "B", "gender": "female"}
+    result = {
+        "id": str(result_id), "patient_id": str(patient_id), "clinic_id": str(clinic_id),
+        "health_worker_id": str(uuid4()), "result": "positive", "confidence_score": 0.91,
+        "image_filename": "smear.jpg", "image_hash": "ab" * 32, "test_date": "2024-03-01T09:30:15",
+    }
+    return [
+        {"seq": seq, "entity": "clinic", "op": "upsert", "id": clinic["id"], "data": clinic},
+        {"seq": seq + 1, "entity": "patient", "op": "upsert", "id": patient["id"], "data": patient},
+        {"seq": seq + 2, "entity": "test_result", "op": "upsert", "id": result["id"], "data": result},
+    ]
+
+def test_batches_are_applied_idempotently_with_per_item_outcomes(db_session, device):
+    """Test a batch is upserted, bad items are rejected alone, and replays change nothing."""
+    clinic_id, patient_id, result_id = uuid4(), uuid4(), uuid4()
+    changes = record_changes(clinic_id, patient_id, result_id)
+    # Devices cannot choose where the central server reads a result's image from
+    changes[2]["data"]["image_path"] = "/etc/passwd"
+    changes += [
+        {"seq": 4, "entity": "user", "op": "upsert", "id": str(uuid4()), "data": {}},
+        {"seq": 5, "entity": "test_result", "op": "upsert", "id": str(uuid4()), "data": {"result": "maybe"}},
+        # Passes parsing but violates NOT NULL constraints in the database
+        {"seq": 6, "entity": "test_result", "op": "upsert", "id": str(uuid4()), "data": {"result": "negative", "image_hash": "cd" * 32}},
+        {"seq": 7, "entity": "test_result", "op": "upsert", "id": str(uuid4()), "data": {**changes[2]["data"], "image_hash": "../../etc/passwd"}},
+    ]
+
+    acks, watermark = device.post_changes(changes)
+    replay_acks, replay_watermark = device.post_changes(changes)
+
+    assert [seq for seq, error in acks.items() if error is None] == [1, 2, 3]
+    assert set(acks) == {1, 2, 3, 4, 5, 6, 7}
+    assert "image hash" in acks[7]
+    assert replay_acks == acks
+    assert watermark == replay_watermark == 7
+    assert db_session.query(Clinic).count() == 1
+    assert db_session.query(TestResult).count() == 1
+    result = db_session.get(TestResult, result_id)
+    assert (result.result, result.image_path) == (TestStatus.Positive, f"sync/{'ab' * 32}")
+    assert db_session.get(SyncState, "device:pi-01").watermark == 7
+    stats = db_session.query(DailyClinicStats).one()
+    assert (stats.clinic_id, stats.total_tests, stats.positive_cases) == (clinic_id, 1, 1)
+
+def test_updates_and_deletes_from_binary_batches(db_session, device):
+    """Test later changes overwrite synced fields, keep central-only ones, and deletes apply."""
+    pytest.importorskip("msgpack")
+    device.payload_format = "msgpack"
+    clinic_id, patient_id, result_id = uuid4(), uuid4(), uuid4()
+    device.post_changes(record_changes(clinic_id, patient_id, result_id))
+    db_session.query(TestResult).filter(TestResult.id == result_id).update({TestResult.image_path: "central/smear.jpg"})
+    db_session.commit()
+
+    changes = record_changes(clinic_id, patient_id, result_id, seq=10)
+    changes[2]["data"]["result"] = "negative"
+    changes[1] = {"seq": 11, "entity": "patient", "op": "delete", "id": str(patient_id), "data": None}
+    changes.append({"seq": 13, "entity": "patient", "op": "upsert", "id": str(uuid4()), "data": {
+        "clinic_id": str(clinic_id), "first_name": "Bo", "last_name": "C", "gender": "male",
+    }})
+    acks, watermark = device.post_changes(changes)
+
+    assert device.payload_format == "msgpack"
+    assert all(error is None for error in acks.values()) and watermark == 13
+    db_session.expire_all()
+    result = db_session.get(TestResult, result_id)
+    assert (result.result, result.image_path) == (TestStatus.Negative, "central/smear.jpg")
+    assert db_session.get(Patient, patient_id) is None
+    assert db_session.query(Patient).count() == 1
+
+def test_ingestion_at_capacity_answers_503_with_retry_after(client, device, monkeypatch):
+    """Test batches beyond the concurrency limit are turned away with a Retry-After hint."""
+    limiter = IngestLimiter(max_concurrent=1, queue_seconds=0, retry_after_seconds=20)
+    monkeypatch.setattr(sync_ingest, "_ingest_limiter", limiter)
+
+    with limiter.slot():
+        with pytest.raises(SyncTransportError) as error:
+            device.post_changes(record_changes(uuid4(), uuid4(), uuid4()))
+
+    assert 10 <= error.value.retry_after <= 20
+    acks, _ = device.post_changes(record_changes(uuid4(), uuid4(), uuid4()))
+    assert all(error is None for error in acks.values())
+
+def test_ingestion_requires_a_device_token(client, monkeypatch):
+    """Test unknown tokens are refused."""
+    monkeypatch.setenv("SYNC_DEVICE_TOKENS", DEVICE_TOKEN)
+
+    response = client.post(
+        "/api/sync/changes",
+        json={"device_id": "pi-01", "changes": []},
+        headers={"Authorization": "Bearer not-a-device"},
+    )
+
+    assert response.status_code == 401
+
+def test_pull_feed_serves_clinic_and_patient_changes_after_a_cursor(db_session, device):
+    """Test devices page through central clinic and patient changes, including ones other devices pushed."""
+    clinic_id, patient_id, result_id = uuid4(), uuid4(), uuid4()
+    device.post_changes(record_changes(clinic_id, patient_id, result_id))
+    local = Clinic(id=uuid4(), name="Central office", district="Gaborone", region="South-East")
+    db_session.add(local)
+    db_session.commit()
+
+    first, cursor, has_more = device.get_changes(0, 2)
+    rest, last_cursor, more = device.get_changes(cursor, 2)
+
+    assert [(c["entity"], c["id"]) for c in first] == [("clinic", str(clinic_id)), ("patient", str(patient_id))]
+    assert has_more and cursor == first[-1]["seq"]
+    assert [(c["entity"], c["op"], c["data"]["name"]) for c in rest] == [("clinic", "upsert", "Central office")]
+    assert not more and last_cursor == rest[-1]["seq"]
+    assert device.get_changes(last_cursor, 2) == ([], last_cursor, False)
+
+def test_published_model_is_served_with_its_hash(device, monkeypatch, tmp_path):
+    """Test devices find, download and verify the model published with SYNC_MODEL_PATH."""
+    assert device.get_latest_model() is None
+    content = b"onnx-model" * 500
+    artifact = tmp_path / "malaria-v3.onnx.gz"
+    artifact.write_bytes(gzip.compress(content))
+    monkeypatch.setenv("SYNC_MODEL_PATH", str(artifact))
+    monkeypatch.setenv("SYNC_MODEL_VERSION", "malaria-v3")
+
+    manifest = device.get_latest_model()
+    inference_service = RecordingInferenceService()
+    updater = ModelUpdater(device, inference_service, model_dir=tmp_path / "device")
+
+    assert (manifest["sha256"], manifest["compression"]) == (hashlib.sha256(content).hexdigest(), "gzip")
+    assert updater.check_for_update() == "malaria-v3"
+    assert inference_service.swaps[0][1] == "malaria-v3"
+    with pytest.raises(SyncTransportError):
+        device.download(f"/api/sync/models/{'0' * 64}", tmp_path / "other")
+
+def test_images_upload_resumably_once_per_hash_and_link_to_results(db_session, device, central_storage, uploader):
+    """Test an uploaded image is verified, stored once, and ingested results point at the stored file."""
+    content = os.urandom(2500)
+    image_hash = hashlib.sha256(content).hexdigest()
+    local_path, _ = uploader.storage_service.save_image(content, "smear.JPG", "clinic")
+
+    assert uploader.upload(image_hash, local_path, "smear.jpg") is True
+    assert uploader.upload(image_hash, local_path, "smear.jpg") is False
+    stored_path = f"sync/{image_hash}.jpg"
+    assert central_storage.get_image_path(stored_path).read_bytes() == content
+
+    changes = record_changes(uuid4(), uuid4(), uuid4())
+    changes[2]["data"]["image_hash"] = image_hash
+    device.post_changes(changes)
+    result = db_session.get(TestResult, UUID(changes[2]["id"]))
+    assert result.image_path == stored_path
+
+def test_chunks_must_match_offset_and_checksum(client, device, central_storage):
+    """Test a chunk at the wrong offset gets 409 with the current offset, and a corrupt chunk 460."""
+    content = os.urandom(1500)
+    image_hash = hashlib.sha256(content).hexdigest()
+    headers = {"Authorization": f"Bearer {DEVICE_TOKEN}"}
+
+    assert device.get_upload_offset(image_hash, len(content), "smear.jpg") == 0
+    assert device.upload_chunk(image_hash, 0, content[:1000]) == 1000
+    assert device.upload_chunk(image_hash, 0, content[:1000]) == 1000
+    corrupt = client.patch(
+        f"/api/sync/images/{image_hash}",
+        content=content[1000:],
+        headers={**headers, "Upload-Offset": "1000", "Upload-Checksum": f"sha256 {base64.b64encode(b'0' * 32).decode()}"},
+    )
+    progress = client.head(f"/api/sync/images/{image_hash}", headers=headers)
+
+    assert corrupt.status_code == 460
+    assert (progress.headers["Upload-Offset"], progress.headers["Upload-Length"]) == ("1000", "1500")
+    assert device.upload_chunk(image_hash, 1000, content[1000:]) == 1500
+    assert client.head(f"/api/sync/images/{'0' * 64}", headers=headers).status_code == 404
+
+def test_result_synced_before_its_image_is_linked_when_it_arrives(db_session, device, central_storage, uploader):
+    """Test a result ingested with a placeholder path points at the image once it is uploaded."""
+    content = os.urandom(1200)
+    image_hash = hashlib.sha256(content).hexdigest()
+    changes = record_changes(uuid4(), uuid4(), uuid4())
+    changes[2]["data"]["image_hash"] = image_hash
+    device.post_changes(changes)
+    result_id = UUID(changes[2]["id"])
+    assert db_session.get(TestResult, result_id).image_path == f"sync/{image_hash}"
+
+    local_path, _ = uploader.storage_service.save_image(content, "smear.png", "clinic")
+    uploader.upload(image_hash, local_path, "smear.png")
+
+    db_session.expire_all()
+    assert db_session.get(TestResult, result_id).image_path == f"sync/{image_hash}.png"
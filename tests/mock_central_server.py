@@ -0,0 +1,235 @@
+"""
+Minimal in-process stand-in for the central sync server.
+Speaks the same wire format as src/infrastructure/sync_transport.py.
+"""
+
+import gzip
+import json
+import base64
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from src.infrastructure import sync_codec
+
+
+class MockCentralServer:
+    """
+    Threaded HTTP server on 127.0.0.1 with a random port.
+
+    Attributes tests can inspect or set:
+        batches: list of decoded request bodies, in arrival order
+        connections: number of TCP connections accepted
+        watermarks: highest change seq applied, per device
+        reject_ids: entity ids to acknowledge as rejected
+        unacknowledged_ids: entity ids left out of the acknowledgements (their seqs still raise the watermark)
+        fail_requests: number of upcoming requests to answer with 503
+        uploads: received image bytes and declared size, by hash
+        chunk_requests: (hash, offset, length) of every accepted chunk
+        fail_chunks: number of upcoming chunk uploads to answer with 503
+        stall_chunks: number of upcoming chunk uploads to answer with 409 and the unchanged offset
+        accept_msgpack: whether binary change batches are accepted (415 otherwise)
+        content_types: Content-Type of every change batch received
+        bytes_received: request body bytes of change batches, as sent on the wire
+        central_changes: change items (with increasing "seq") served by the pull feed
+        pull_requests: "after" cursor of every pull request
+        model_manifest: manifest served as the latest model, or None for 204
+        artifacts: downloadable files by path
+        download_requests: (path, range start) of every artifact download
+    """
+
+    def __init__(self):
+        self.batches = []
+        self.connections = 0
+        self.watermarks = {}
+        self.reject_ids = set()
+        self.unacknowledged_ids = set()
+        self.fail_requests = 0
+        self.uploads = {}
+        self.chunk_requests = []
+        self.fail_chunks = 0
+        self.stall_chunks = 0
+        self.accept_msgpack = True
+        self.content_types = []
+        self.bytes_received = 0
+        self.central_changes = []
+        self.pull_requests = []
+        self.model_manifest = None
+        self.artifacts = {}
+        self.download_requests = []
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    @property
+    def received_changes(self):
+        return [item for batch in self.batches for item in batch["changes"]]
+
+    @property
+    def received_ids(self):
+        return [item["id"] for item in self.received_changes]
+
+    def start(self) -> "MockCentralServer":
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler_class(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with mock.lock:
+                    mock.connections += 1
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload) -> None:
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _read_body(self) -> bytes:
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                self.wire_length = len(body)
+                if self.headers.get("Content-Encoding") == "gzip":
+                    body = gzip.decompress(body)
+                return body
+
+            def do_POST(self):
+                body = self._read_body()
+
+                with mock.lock:
+                    if mock.fail_requests > 0:
+                        mock.fail_requests -= 1
+                        self._send_json(503, {"detail": "unavailable"})
+                        return
+
+                if self.path == "/api/sync/changes":
+                    content_type = self.headers.get("Content-Type")
+                    if content_type == sync_codec.MSGPACK_CONTENT_TYPE:
+                        if not mock.accept_msgpack:
+                            self._send_json(415, {"detail": "unsupported media type"})
+                            return
+                        payload = sync_codec.decode_changes(body)
+                    else:
+                        payload = json.loads(body)
+                    items = []
+                    for change in payload["changes"]:
+                        if change["id"] in mock.unacknowledged_ids:
+                            continue
+                        if change["id"] in mock.reject_ids:
+                            items.append({"seq": change["seq"], "status": "rejected", "error": "invalid record"})
+                        else:
+                            items.append({"seq": change["seq"], "status": "accepted"})
+                    with mock.lock:
+                        mock.batches.append(payload)
+                        mock.content_types.append(content_type)
+                        mock.bytes_received += self.wire_length
+                        device = payload["device_id"]
+                        seqs = [change["seq"] for change in payload["changes"]]
+                        mock.watermarks[device] = max([mock.watermarks.get(device, 0), *seqs])
+                        watermark = mock.watermarks[device]
+                    self._send_json(200, {"items": items, "watermark": watermark})
+                elif self.path == "/api/sync/images":
+                    payload = json.loads(body)
+                    with mock.lock:
+                        upload = mock.uploads.setdefault(payload["hash"], {"size": payload["size"], "data": bytearray()})
+                        offset = len(upload["data"])
+                    self._send_json(200, {"offset": offset})
+                else:
+                    self._send_json(404, {"detail": "not found"})
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                query = parse_qs(url.query)
+
+                if url.path == "/api/sync/pull":
+                    after = int(query["after"][0])
+                    limit = int(query["limit"][0])
+                    with mock.lock:
+                        mock.pull_requests.append(after)
+                        waiting = [change for change in mock.central_changes if change["seq"] > after]
+                    page = waiting[:limit]
+                    cursor = page[-1]["seq"] if page else after
+                    self._send_json(200, {"changes": page, "cursor": cursor, "has_more": len(waiting) > limit})
+                elif url.path == "/api/sync/models/latest":
+                    if mock.model_manifest is None:
+                        self.send_response(204)
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                    else:
+                        self._send_json(200, mock.model_manifest)
+                elif url.path in mock.artifacts:
+                    data = mock.artifacts[url.path]
+                    start = 0
+                    if self.headers.get("Range"):
+                        start = int(self.headers["Range"].split("=", 1)[1].rstrip("-"))
+                    with mock.lock:
+                        mock.download_requests.append((url.path, start))
+                    if start >= len(data):
+                        self.send_response(416)
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    self.send_response(206 if start else 200)
+                    self.send_header("Content-Type", "application/octet-stream")
+                    self.send_header("Content-Length", str(len(data) - start))
+                    self.end_headers()
+                    self.wfile.write(data[start:])
+                else:
+                    self._send_json(404, {"detail": "not found"})
+
+            def do_PATCH(self):
+                body = self._read_body()
+                image_hash = self.path.rsplit("/", 1)[-1]
+
+                with mock.lock:
+                    if mock.fail_chunks > 0 or mock.fail_requests > 0:
+                        if mock.fail_chunks > 0:
+                            mock.fail_chunks -= 1
+                        else:
+                            mock.fail_requests -= 1
+                        self._send_json(503, {"detail": "unavailable"})
+                        return
+
+                    upload = mock.uploads.get(image_hash)
+                    if upload is None:
+                        self._send_json(404, {"detail": "unknown upload"})
+                        return
+
+                    offset = int(self.headers["Upload-Offset"])
+                    if mock.stall_chunks > 0:
+                        mock.stall_chunks -= 1
+                        self._send_json(409, {"offset": len(upload["data"])})
+                        return
+                    if offset != len(upload["data"]):
+                        self._send_json(409, {"offset": len(upload["data"])})
+                        return
+
+                    algorithm, checksum = self.headers["Upload-Checksum"].split(" ", 1)
+                    if algorithm != "sha256" or base64.b64decode(checksum) != hashlib.sha256(body).digest():
+                        self._send_json(460, {"detail": "checksum mismatch"})
+                        return
+
+                    upload["data"].extend(body)
+                    mock.chunk_requests.append((image_hash, offset, len(body)))
+                    self._send_json(200, {"offset": len(upload["data"])})
+
+        return Handler
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from datetime import timedelta
+from uuid import uuid4
+from sqlalchemy.orm import Session
+from src.dashboard import cache
+from src.dashboard.anomalies import AnomalyDetector
+from src.dashboard.cache import DashboardCache, MemoryCacheBackend
+from src.dashboard.service import dashboard_today
+from src.entities.clinic import Clinic
+from src.entities.daily_clinic_stats import DailyClinicStats
+from src.entities.outbreak_alert import OutbreakAlert, AlertScope, AlertMethod
+
+BASELINE_DAYS = 40
+
+@pytest.fixture
+def detector(db_session: Session):
+    return AnomalyDetector(lambda: db_session, interval_seconds=0, baseline_days=BASELINE_DAYS, recheck_days=7)
+
+def steady_counts(days: int, tests: int = 20, positives: int = 2):
+    return np.full((1, days), float(positives)), np.full((1, days), float(tests))
+
+def test_single_day_spike_is_flagged_by_ewma(detector: AnomalyDetector):
+    """Test a day far above a steady baseline raises an EWMA alert on that day only."""
+    positives, totals = steady_counts(50)
+    positives[0, 45] = 12
+
+    alerts = detector.detect(positives, totals, first_scored_day=40)
+
+    ewma = [(day, round(expected, 2)) for _, day, method, expected, _ in alerts if method == AlertMethod.Ewma]
+    assert ewma == [(45, 0.1)]
+
+def test_sustained_moderate_excess_is_flagged_by_cusum(detector: AnomalyDetector):
+    """Test several days each slightly above baseline accumulate into a CUSUM alert."""
+    positives, totals = steady_counts(50)
+    positives[0, 42:48] = 5
+
+    alerts = detector.detect(positives, totals, first_scored_day=40)
+
+    assert not any(method == AlertMethod.Ewma for _, _, method, _, _ in alerts)
+    assert [day for _, day, method, _, _ in alerts if method == AlertMethod.Cusum][0] in (43, 44)
+
+def test_sparse_series_are_not_scored(detector: AnomalyDetector):
+    """Test days and series with too few tests never alert."""
+    positives, totals = steady_counts(50, tests=2, positives=0)
+    positives[0, 45] = 2
+
+    assert detector.detect(positives, totals, first_scored_day=40) == []
+
+def test_run_persists_clinic_and_district_alerts_idempotently(client, auth_headers, db_session: Session, detector: AnomalyDetector, monkeypatch):
+    """Test a run stores alerts for recent days, a rerun replaces them, and the endpoint serves them."""
+    monkeypatch.setattr(cache, "_dashboard_cache", DashboardCache(MemoryCacheBackend(), ttl_seconds=60))
+    today = dashboard_today()
+    clinics = [Clinic(id=uuid4(), name=f"Clinic {i}", district="Gaborone", region="South-East") for i in range(2)]
+    db_session.add_all(clinics)
+    for days_ago in range(BASELINE_DAYS + 7):
+        for i, clinic in enumerate(clinics):
+            spike = i == 0 and days_ago == 2
+            db_session.add(DailyClinicStats(
+                day=today - timedelta(days=days_ago), clinic_id=clinic.id,
+                total_tests=20, positive_cases=14 if spike else 2, negative_cases=6 if spike else 18, inconclusive_cases=0,
+                confirmed_tests=0, confirmed_positive=0, confirmed_negative=0, confirmed_inconclusive=0,
+            ))
+    # An alert from before the recheck window is kept
+    db_session.add(OutbreakAlert(
+        scope=AlertScope.Clinic, method=AlertMethod.Ewma, day=today - timedelta(days=20), district="Gaborone",
+        clinic_id=clinics[1].id, positive_cases=9, total_tests=20, positivity_rate=45.0, expected_rate=10.0, score=6.0,
+    ))
+    db_session.commit()
+
+    stats = detector.run_once()
+    assert detector.run_once() == stats
+    assert stats["clinic_alerts"] >= 1 and stats["district_alerts"] >= 1
+
+    response = client.get("/api/dashboard/alerts?days=7&scope=clinic", headers=auth_headers)
+    alerts = response.json()
+    assert response.status_code == 200
+    assert {(alert["clinic_name"], alert["day"], alert["method"]) for alert in alerts} >= {("Clinic 0", str(today - timedelta(days=2)), "ewma")}
+    assert all(alert["clinic_name"] == "Clinic 0" for alert in alerts)
+    assert alerts[0]["positivity_rate"] == 70.0
+    assert len(client.get("/api/dashboard/alerts?days=30", headers=auth_headers).json()) == stats["clinic_alerts"] + stats["district_alerts"] + 1
@@ -0,0 +1,70 @@
+import time
+import pytest
+from uuid import uuid4
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.websockets import WebSocketDisconnect
+from src.dashboard import cache, live, service
+from src.dashboard.cache import DashboardCache, MemoryCacheBackend
+from src.dashboard.live import DashboardPublisher, merge_patch
+from src.entities.clinic import Clinic
+from src.entities.test_result import TestResult, TestStatus
+
+@pytest.fixture
+def publisher(db_session: Session, monkeypatch):
+    """A fast publisher on the test database, started by the app's lifespan."""
+    monkeypatch.setattr(cache, "_dashboard_cache", DashboardCache(MemoryCacheBackend(), ttl_seconds=60))
+    dashboard_publisher = DashboardPublisher(sessionmaker(bind=db_session.get_bind()), debounce_seconds=0.05, poll_seconds=0.05)
+    monkeypatch.setattr(live, "_dashboard_publisher", dashboard_publisher)
+    return dashboard_publisher
+
+def add_result(db_session: Session, clinic_id, result: TestStatus) -> None:
+    db_session.add(TestResult(
+        id=uuid4(), patient_id=uuid4(), clinic_id=clinic_id, health_worker_id=uuid4(),
+        result=result, image_path="uploads/smear.jpg", image_filename="smear.jpg",
+    ))
+    db_session.commit()
+
+def test_merge_patch():
+    """Test patches recurse into objects, replace lists and null out removed keys."""
+    old = {"summary": {"total": 1, "positive": 0}, "series": [1, 2], "gone": True}
+    new = {"summary": {"total": 2, "positive": 0}, "series": [1, 2, 3]}
+    assert merge_patch(old, new) == {"summary": {"total": 2}, "series": [1, 2, 3], "gone": None}
+    assert merge_patch(new, new) == {}
+
+def test_clients_share_snapshot_and_receive_deltas(publisher, client, auth_headers, db_session: Session, monkeypatch):
+    """Test two clients of one view get a snapshot, then one computed delta per change."""
+    clinic_id = uuid4()
+    db_session.add(Clinic(id=clinic_id, name="Clinic A", district="Gaborone", region="South-East"))
+    add_result(db_session, clinic_id, TestStatus.Negative)
+    # Let the publisher settle the setup writes, which no client is watching yet
+    time.sleep(0.3)
+
+    computed = []
+    compute = service.get_dashboard_data
+    monkeypatch.setattr(service, "get_dashboard_data", lambda *args: computed.append(args[2:]) or compute(*args))
+
+    with client.websocket_connect("/api/dashboard/live?days=7", headers=auth_headers) as first, \
+            client.websocket_connect("/api/dashboard/live?days=7", headers=auth_headers) as second:
+        snapshots = [first.receive_json(), second.receive_json()]
+        assert [message["type"] for message in snapshots] == ["snapshot", "snapshot"]
+        assert snapshots[0]["data"]["summary"]["total_tests"] == 1
+        assert publisher.subscriber_count() == 2
+
+        add_result(db_session, clinic_id, TestStatus.Positive)
+
+        deltas = [first.receive_json(), second.receive_json()]
+        assert deltas[0] == deltas[1]
+        assert deltas[0]["type"] == "delta" and deltas[0]["version"] == 2
+        assert deltas[0]["patch"]["summary"]["total_tests"] == 2
+        assert deltas[0]["patch"]["summary"]["total_positive"] == 1
+        assert "district_stats" in deltas[0]["patch"]
+
+    assert len(computed) == 2
+    assert publisher.subscriber_count() == 0
+
+def test_live_requires_token(publisher, client):
+    """Test connections without a valid access token are refused."""
+    with pytest.raises(WebSocketDisconnect) as exc_info:
+        with client.websocket_connect("/api/dashboard/live?token=invalid") as websocket:
+            websocket.receive_json()
+    assert exc_info.value.code == 1008
@@ -0,0 +1,404 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from src.dashboard import service, rollups, cache
+from src.dashboard.cache import DashboardCache, MemoryCacheBackend
+from src.database.dates import Granularity
+from src.exceptions import TimeSeriesTooLongError
+from src.entities.daily_clinic_stats import DailyClinicStats
+from src.entities.daily_model_stats import DailyModelStats
+from src.entities.clinic import Clinic
+from src.entities.patient import Patient, Gender
+from src.entities.test_result import TestResult, TestStatus
+from src.entities.user import User, UserRole
+from src.auth.models import TokenData
+from src.results import service as results_service
+
+@pytest.fixture
+def test_user():
+    """Create a test user token."""
+    return TokenData(user_id=str(uuid4()))
+
+@pytest.fixture
+def clinics(db_session: Session):
+    """Create two clinics in different districts with a patient and health worker each."""
+    clinics = [
+        Clinic(id=uuid4(), name="Central Clinic", district="Gaborone", region="South-East"),
+        Clinic(id=uuid4(), name="North Clinic", district="Francistown", region="North-East"),
+    ]
+    db_session.add_all(clinics)
+    for i, clinic in enumerate(clinics):
+        db_session.add(Patient(id=uuid4(), clinic_id=clinic.id, first_name="P", last_name=str(i), gender=Gender.Female))
+        db_session.add(User(
+            id=uuid4(), email=f"worker{i}@example.com", first_name="W", last_name=str(i),
+            password_hash="x", role=UserRole.HealthWorker, clinic_id=clinic.id,
+        ))
+    db_session.add(User(id=uuid4(), email="admin@example.com", first_name="A", last_name="A", password_hash="x", role=UserRole.Admin))
+    db_session.commit()
+    return clinics
+
+@pytest.fixture
+def dashboard_cache(monkeypatch):
+    """Give each test an empty in-process dashboard cache."""
+    dashboard_cache = DashboardCache(MemoryCacheBackend(), ttl_seconds=60)
+    monkeypatch.setattr(cache, "_dashboard_cache", dashboard_cache)
+    return dashboard_cache
+
+def add_result(db_session: Session, clinic: Clinic, result: TestStatus, days_ago: int = 0, test_date: datetime = None) -> TestResult:
+    test_result = TestResult(
+        id=uuid4(),
+        patient_id=uuid4(),
+        clinic_id=clinic.id,
+        health_worker_id=uuid4(),
+        result=result,
+        image_path="clinic/x.jpg",
+        image_filename="x.jpg",
+        test_date=test_date or datetime.now(timezone.utc) - timedelta(days=days_ago),
+    )
+    db_session.add(test_result)
+    db_session.commit()
+    return test_result
+
+def test_dashboard_summary_counts(db_session: Session, test_user: TokenData, clinics):
+    """Test summary counts, the 7-day window and the district filter."""
+    add_result(db_session, clinics[0], TestStatus.Positive)
+    add_result(db_session, clinics[0], TestStatus.Negative, days_ago=10)
+    add_result(db_session, clinics[0], TestStatus.Inconclusive, days_ago=2)
+    add_result(db_session, clinics[1], TestStatus.Positive, days_ago=20)
+
+    dashboard = service.get_dashboard_data(test_user, db_session)
+    summary = dashboard.summary
+
+    assert (summary.total_tests, summary.total_positive, summary.total_negative, summary.total_inconclusive) == (4, 2, 1, 1)
+    assert summary.overall_positivity_rate == 50.0
+    assert (summary.total_patients, summary.total_clinics, summary.total_health_workers) == (2, 2, 2)
+    assert dashboard.recent_tests == 2
+
+    filtered = service.get_dashboard_data(test_user, db_session, district="Francistown")
+    assert (filtered.summary.total_tests, filtered.summary.total_positive, filtered.recent_tests) == (1, 1, 0)
+
+def test_dashboard_summary_is_one_scan_and_one_count_query(db_session: Session, test_user: TokenData, clinics):
+    """Test the summary and entity counts take two queries, independent of how many counts there are."""
+    add_result(db_session, clinics[0], TestStatus.Positive)
+    engine = db_session.get_bind()
+    statements = []
+
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record_statement)
+    try:
+        service.get_dashboard_data(test_user, db_session)
+    finally:
+        event.remove(engine, "before_cursor_execute", record_statement)
+
+    # Summary, entity counts, district statistics and time series
+    assert len(statements) == 4
+    assert "FILTER (WHERE" in statements[0]
+
+def rollup_rows(db_session: Session):
+    db_session.expire_all()
+    return {
+        (row.day, row.clinic_id): (row.total_tests, row.positive_cases, row.confirmed_tests, row.confirmed_positive)
+        for row in db_session.query(DailyClinicStats)
+    }
+
+def test_daily_rollups_follow_inserts_confirmations_moves_and_deletes(db_session: Session, clinics):
+    """Test daily_clinic_stats is kept exact by flushes and matches a full rebuild."""
+    first = add_result(db_session, clinics[0], TestStatus.Positive)
+    second = add_result(db_session, clinics[0], TestStatus.Negative)
+    day = first.test_date.date()
+    assert rollup_rows(db_session) == {(day, clinics[0].id): (2, 1, 0, 0)}
+
+    first.is_confirmed = True
+    second.result = TestStatus.Positive
+    db_session.commit()
+    assert rollup_rows(db_session) == {(day, clinics[0].id): (2, 2, 1, 1)}
+
+    second.clinic_id = clinics[1].id
+    second.test_date = second.test_date - timedelta(days=1)
+    db_session.commit()
+    assert rollup_rows(db_session) == {
+        (day, clinics[0].id): (1, 1, 1, 1),
+        (day - timedelta(days=1), clinics[1].id): (1, 1, 0, 0),
+    }
+
+    db_session.delete(first)
+    db_session.commit()
+    incremental = rollup_rows(db_session)
+    assert incremental == {(day - timedelta(days=1), clinics[1].id): (1, 1, 0, 0)}
+
+    assert rollups.rebuild_daily_stats(db_session) == 1
+    assert rollup_rows(db_session) == incremental
+
+def test_empty_rollup_tables_are_backfilled(db_session: Session, clinics):
+    """Test rollup tables added to a database with results are filled, and full ones left alone."""
+    confirmed = add_result(db_session, clinics[0], TestStatus.Positive)
+    add_result(db_session, clinics[1], TestStatus.Negative, days_ago=1)
+    confirmed.ai_result = TestStatus.Positive
+    confirmed.is_confirmed = True
+    db_session.commit()
+    expected = rollup_rows(db_session)
+    model_rows = db_session.query(DailyModelStats).count()
+    db_session.query(DailyClinicStats).delete()
+    db_session.query(DailyModelStats).delete()
+    db_session.commit()
+
+    assert rollups.backfill_rollups(db_session) == ["daily_clinic_stats", "daily_model_stats"]
+    assert rollup_rows(db_session) == expected
+    assert db_session.query(DailyModelStats).count() == model_rows > 0
+    assert rollups.backfill_rollups(db_session) == []
+
+def test_statistics_are_read_from_rollups(db_session: Session, clinics):
+    """Test district, clinic and time series statistics aggregate the rollup rows."""
+    add_result(db_session, clinics[0], TestStatus.Positive)
+    add_result(db_session, clinics[0], TestStatus.Negative, days_ago=1)
+    add_result(db_session, clinics[1], TestStatus.Inconclusive)
+
+    districts = {row.district: row for row in service.get_district_statistics(db_session)}
+    clinic_stats = {row.clinic_name: row for row in service.get_clinic_statistics(db_session, "Gaborone")}
+    series = service.get_time_series_data(db_session, days=7)
+
+    assert (districts["Gaborone"].total_tests, districts["Gaborone"].positivity_rate) == (2, 50.0)
+    assert districts["Francistown"].inconclusive_cases == 1
+    assert list(clinic_stats) == ["Central Clinic"]
+    assert [point.total_tests for point in series] == [0, 0, 0, 0, 0, 0, 1, 2]
+
+def test_district_and_clinic_statistics_in_one_query(db_session: Session, clinics):
+    """Test both levels come from one query, with zero-test clinics and week-over-week changes."""
+    idle = Clinic(id=uuid4(), name="Idle Clinic", district="Gaborone", region="South-East")
+    db_session.add(idle)
+    add_result(db_session, clinics[0], TestStatus.Positive)
+    add_result(db_session, clinics[0], TestStatus.Negative, days_ago=3)
+    add_result(db_session, clinics[0], TestStatus.Negative, days_ago=8)
+    add_result(db_session, clinics[0], TestStatus.Negative, days_ago=9)
+    add_result(db_session, clinics[0], TestStatus.Negative, days_ago=10)
+    add_result(db_session, clinics[0], TestStatus.Positive, days_ago=11)
+    add_result(db_session, clinics[1], TestStatus.Positive, days_ago=1)
+
+    engine = db_session.get_bind()
+    statements = []
+
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record_statement)
+    try:
+        districts, clinic_stats = service.get_statistics(db_session)
+    finally:
+        event.remove(engine, "before_cursor_execute", record_statement)
+
+    assert len(statements) == 1
+    assert [row.district for row in districts] == ["Francistown", "Gaborone"]
+    gaborone = districts[1]
+    assert (gaborone.total_tests, gaborone.clinics_count, gaborone.positivity_rate) == (6, 2, 33.33)
+    assert (gaborone.tests_this_week, gaborone.tests_last_week, gaborone.tests_change, gaborone.positivity_change) == (2, 4, -50.0, 25.0)
+    assert districts[0].tests_change is None
+
+    assert [row.clinic_name for row in clinic_stats] == ["North Clinic", "Central Clinic", "Idle Clinic"]
+    assert (clinic_stats[2].total_tests, clinic_stats[2].positivity_rate, clinic_stats[2].positivity_change) == (0, 0.0, None)
+
+def test_time_series_buckets_are_gap_filled(db_session: Session, clinics):
+    """Test weekly, epidemiological-week and monthly series cover the range without gaps."""
+    add_result(db_session, clinics[0], TestStatus.Positive)
+    add_result(db_session, clinics[0], TestStatus.Negative, days_ago=15)
+    add_result(db_session, clinics[1], TestStatus.Positive, days_ago=15)
+
+    weekly = service.get_time_series_data(db_session, days=28, granularity=Granularity.Week)
+    epi_weekly = service.get_time_series_data(db_session, days=28, granularity=Granularity.EpiWeek)
+    monthly = service.get_time_series_data(db_session, days=400, granularity=Granularity.Month)
+    gaborone = service.get_time_series_data(db_session, days=28, district="Gaborone", granularity=Granularity.Week)
+
+    assert len(weekly) in (5, 6) and len(epi_weekly) in (5, 6) and len(monthly) in (14, 15)
+    assert all(datetime.fromisoformat(point.date).weekday() == 0 for point in weekly)
+    assert all(datetime.fromisoformat(point.date).weekday() == 6 for point in epi_weekly)
+    assert all(point.date.endswith("-01") for point in monthly)
+    for series in (weekly, epi_weekly, monthly):
+        assert sum(point.total_tests for point in series) == 3
+    assert [point.total_tests for point in weekly if point.total_tests] == [2, 1]
+    assert weekly[-1].positive_cases == 1
+    assert sum(point.negative_cases for point in gaborone) == 1 and sum(point.total_tests for point in gaborone) == 2
+
+def test_time_series_length_is_capped(db_session: Session):
+    """Test a daily series over several years is refused rather than computed."""
+    with pytest.raises(TimeSeriesTooLongError):
+        service.get_time_series_data(db_session, days=3 * 365)
+
+    assert len(service.get_time_series_data(db_session, days=3 * 365, granularity=Granularity.Month)) in (37, 38)
+
+def test_rollups_count_tests_on_the_clinic_local_day(db_session: Session, clinics):
+    """Test a late-evening UTC test lands on the next day in a clinic east of UTC, and moves back with the timezone."""
+    clinics[0].timezone = "Africa/Gaborone"
+    db_session.commit()
+    add_result(db_session, clinics[0], TestStatus.Positive, test_date=datetime(2024, 3, 1, 23, 30))
+    add_result(db_session, clinics[1], TestStatus.Positive, test_date=datetime(2024, 3, 1, 23, 30))
+
+    assert set(rollup_rows(db_session)) == {
+        (datetime(2024, 3, 2).date(), clinics[0].id),
+        (datetime(2024, 3, 1).date(), clinics[1].id),
+    }
+
+    clinics[0].timezone = "UTC"
+    db_session.commit()
+    assert set(rollup_rows(db_session)) == {
+        (datetime(2024, 3, 1).date(), clinics[0].id),
+        (datetime(2024, 3, 1).date(), clinics[1].id),
+    }
+
+def test_map_data_bins_clinics_onto_a_grid(db_session: Session, clinics):
+    """Test per-clinic positivity with coordinates, grid cells, and the bounding box filter."""
+    clinics[0].latitude, clinics[0].longitude = -24.65, 25.91
+    clinics[1].latitude, clinics[1].longitude = -21.17, 27.51
+    db_session.add(Clinic(id=uuid4(), name="Tlokweng Clinic", district="Gaborone", region="South-East", latitude=-24.60, longitude=25.95))
+    db_session.add(Clinic(id=uuid4(), name="Unmapped Clinic", district="Gaborone", region="South-East"))
+    db_session.commit()
+    add_result(db_session, clinics[0], TestStatus.Positive)
+    add_result(db_session, clinics[0], TestStatus.Negative, days_ago=3)
+    add_result(db_session, clinics[0], TestStatus.Positive, days_ago=60)
+    add_result(db_session, clinics[1], TestStatus.Negative)
+
+    data = service.get_map_data(db_session, days=30, cell_size=0.5)
+    south = service.get_map_data(db_session, days=30, bbox=service.parse_bbox("25,-25,26.5,-24"))
+
+    by_name = {clinic.clinic_name: clinic for clinic in data.clinics}
+    assert set(by_name) == {"Central Clinic", "North Clinic", "Tlokweng Clinic"}
+    assert (by_name["Central Clinic"].total_tests, by_name["Central Clinic"].positivity_rate) == (2, 50.0)
+    assert by_name["Tlokweng Clinic"].total_tests == 0
+    assert [(cell.latitude, cell.longitude, cell.clinics_count, cell.total_tests) for cell in data.cells] == [
+        (-24.75, 25.75, 2, 2),
+        (-21.25, 27.75, 1, 1),
+    ]
+    assert sorted(clinic.clinic_name for clinic in south.clinics) == ["Central Clinic", "Tlokweng Clinic"]
+
+def test_map_endpoint_rejects_a_malformed_bounding_box(client, auth_headers, dashboard_cache):
+    """Test bbox must be four ordered coordinates."""
+    for bbox in ("1,2,3", "a,b,c,d", "30,-20,25,-25"):
+        assert client.get(f"/api/dashboard/map?bbox={bbox}", headers=auth_headers).status_code == 400
+    assert client.get("/api/dashboard/map?bbox=25,-25,30,-20", headers=auth_headers).json()["clinics"] == []
+
+def test_dashboard_endpoints_bound_the_date_range(client, auth_headers, dashboard_cache):
+    """Test an out-of-range days value is a 422, not a date overflow."""
+    for path in ("/", "/time-series", "/map", "/alerts", "/model-performance"):
+        assert client.get(f"/api/dashboard{path}?days=100000000", headers=auth_headers).status_code == 422
+    assert client.get(f"/api/dashboard/time-series?days={service.MAX_RANGE_DAYS}&granularity=month", headers=auth_headers).status_code == 200
+
+def test_dashboard_responses_are_cached_until_results_change(client, auth_headers, db_session: Session, clinics, dashboard_cache):
+    """Test repeat requests are served from the cache, revalidate to 304, and see new results."""
+    # Requests close the test session, detaching loaded objects
+    second_clinic_id = clinics[1].id
+    add_result(db_session, clinics[0], TestStatus.Positive)
+    engine = db_session.get_bind()
+    statements = []
+
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    first = client.get("/api/dashboard/?days=7", headers=auth_headers)
+    event.listen(engine, "before_cursor_execute", record_statement)
+    try:
+        second = client.get("/api/dashboard/?days=7", headers=auth_headers)
+        revalidated = client.get("/api/dashboard/?days=7", headers={**auth_headers, "If-None-Match": first.headers["ETag"]})
+    finally:
+        event.remove(engine, "before_cursor_execute", record_statement)
+
+    assert first.status_code == second.status_code == 200
+    assert second.content == first.content
+    assert revalidated.status_code == 304
+    assert not any("daily_clinic_stats" in statement for statement in statements)
+
+    result_id = add_result(db_session, db_session.get(Clinic, second_clinic_id), TestStatus.Negative).id
+    changed = client.get("/api/dashboard/?days=7", headers={**auth_headers, "If-None-Match": first.headers["ETag"]})
+    assert changed.status_code == 200
+    assert changed.json()["summary"]["total_tests"] == 2
+    assert changed.headers["ETag"] != first.headers["ETag"]
+
+    # Sync bookkeeping does not change what the dashboard shows
+    etag = changed.headers["ETag"]
+    generation = dashboard_cache.backend.generation()
+    db_session.get(TestResult, result_id).synced_at = datetime.now(timezone.utc)
+    db_session.commit()
+    assert dashboard_cache.backend.generation() == generation
+    assert client.get("/api/dashboard/?days=7", headers={**auth_headers, "If-None-Match": etag}).status_code == 304
+
+def test_district_and_clinic_responses_are_keyed_by_filter(client, auth_headers, db_session: Session, clinics, dashboard_cache):
+    """Test each endpoint and district filter is cached separately."""
+    add_result(db_session, clinics[0], TestStatus.Positive)
+    add_result(db_session, clinics[1], TestStatus.Negative)
+
+    all_districts = client.get("/api/dashboard/districts", headers=auth_headers)
+    gaborone = client.get("/api/dashboard/districts?district=Gaborone", headers=auth_headers)
+    clinic_stats = client.get("/api/dashboard/clinics?district=Gaborone", headers=auth_headers)
+
+    assert len(all_districts.json()) == 2
+    assert [row["district"] for row in gaborone.json()] == ["Gaborone"]
+    assert [row["clinic_name"] for row in clinic_stats.json()] == ["Central Clinic"]
+    assert len({all_districts.headers["ETag"], gaborone.headers["ETag"], clinic_stats.headers["ETag"]}) == 3
+
+def test_memory_backend_evicts_least_recently_used_and_expired_entries():
+    """Test the in-process backend honours its size limit and the TTL."""
+    backend = MemoryCacheBackend(max_entries=2)
+    backend.set("a", b"1", 60)
+    backend.set("b", b"2", 60)
+    backend.get("a")
+    backend.set("c", b"3", 60)
+    backend.set("d", b"4", 0)
+
+    assert (backend.get("a"), backend.get("b"), backend.get("c"), backend.get("d")) == (None, None, b"3", None)
+
+def add_prediction(db_session: Session, clinic: Clinic, ai_result: TestStatus, confirmed: TestStatus = None,
+                   confidence: float = None, model_version: str = "v1") -> TestResult:
+    test_result = TestResult(
+        id=uuid4(), patient_id=uuid4(), clinic_id=clinic.id, health_worker_id=uuid4(),
+        result=ai_result, ai_result=ai_result, confidence_score=confidence, model_version=model_version,
+        image_path="clinic/x.jpg", image_filename="x.jpg",
+    )
+    db_session.add(test_result)
+    db_session.commit()
+    if confirmed:
+        results_service.confirm_test_result(TokenData(user_id=str(uuid4())), db_session, test_result.id, confirmed)
+    return test_result
+
+def test_model_performance_compares_predictions_with_confirmations(db_session: Session, clinics):
+    """Test confirmation keeps the AI prediction and the rollup yields per-model accuracy metrics."""
+    for _ in range(3):
+        add_prediction(db_session, clinics[0], TestStatus.Positive, TestStatus.Positive, 0.95)
+    overridden = add_prediction(db_session, clinics[0], TestStatus.Positive, TestStatus.Negative, 0.65)
+    for _ in range(2):
+        add_prediction(db_session, clinics[0], TestStatus.Negative, TestStatus.Negative, 0.85)
+    add_prediction(db_session, clinics[1], TestStatus.Negative, TestStatus.Positive, 0.55)
+    add_prediction(db_session, clinics[0], TestStatus.Positive, confidence=0.9)  # Unconfirmed
+    add_prediction(db_session, clinics[1], TestStatus.Inconclusive, TestStatus.Negative, model_version="v2")
+
+    db_session.refresh(overridden)
+    assert (overridden.ai_result, overridden.result) == (TestStatus.Positive, TestStatus.Negative)
+
+    v1, v2 = service.get_model_performance(db_session)
+    assert (v1.model_version, v1.confirmed_tests, v1.agreement_rate) == ("v1", 7, 71.43)
+    assert (v1.sensitivity, v1.specificity) == (75.0, 66.67)
+    assert v1.confusion_matrix["positive"] == {"positive": 3, "negative": 1, "inconclusive": 0}
+    assert v1.confusion_matrix["negative"] == {"positive": 1, "negative": 2, "inconclusive": 0}
+    assert [(b.lower, b.tests, b.accuracy, b.mean_confidence) for b in v1.calibration] == [
+        (0.5, 1, 0.0, 0.55), (0.6, 1, 0.0, 0.65), (0.8, 2, 1.0, 0.85), (0.9, 3, 1.0, 0.95),
+    ]
+    assert v1.expected_calibration_error == 0.2357
+    assert (v2.sensitivity, v2.specificity, v2.calibration, v2.expected_calibration_error) == (None, 0.0, [], None)
+
+    per_clinic = service.get_model_performance(db_session, model_version="v1", by_clinic=True)
+    assert {(row.clinic_name, row.confirmed_tests) for row in per_clinic} == {("Central Clinic", 6), ("North Clinic", 1)}
+    assert service.get_model_performance(db_session, district="Francistown", granularity=Granularity.Week)[0].period is not None
+
+    incremental = db_session.query(DailyModelStats).count()
+    rollups.rebuild_daily_stats(db_session)
+    assert db_session.query(DailyModelStats).count() == incremental
+
+def test_model_performance_endpoint(client, auth_headers, db_session: Session, clinics, dashboard_cache):
+    """Test the endpoint serves per-period model performance."""
+    add_prediction(db_session, clinics[0], TestStatus.Positive, TestStatus.Positive, 0.9)
+
+    response = client.get("/api/dashboard/model-performance?days=30&granularity=month", headers=auth_headers)
+    assert response.status_code == 200
+    [row] = response.json()
+    assert (row["model_version"], row["confirmed_tests"], row["sensitivity"]) == ("v1", 1, 100.0)
+    assert "ETag" in response.headers
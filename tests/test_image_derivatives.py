@@ -0,0 +1,58 @@
+import pytest
+from PIL import Image
+from src.infrastructure.image_derivatives import ImageDerivativeService
+
+@pytest.fixture
+def derivatives(storage, tmp_path):
+    """Create a derivative service with a temporary cache."""
+    return ImageDerivativeService(storage, cache_path=str(tmp_path / "derivatives"))
+
+@pytest.fixture
+def stored_image(storage, tmp_path):
+    """Store a 1200x900 JPEG and return (relative_path, image_hash)."""
+    source = tmp_path / "smear.jpg"
+    Image.new("RGB", (1200, 900), (200, 120, 140)).save(source, format="JPEG")
+    content = source.read_bytes()
+    relative_path, _ = storage.save_image(content, "smear.jpg", "clinic-1")
+    return relative_path, storage.content_hash(content)
+
+def test_thumbnail_is_downscaled_and_cached(derivatives, stored_image):
+    """Test a thumbnail is rendered once and then served from cache."""
+    relative_path, image_hash = stored_image
+
+    path, key = derivatives.get_thumbnail(relative_path, image_hash, 200)
+
+    assert key == f"{image_hash}-thumb-256"
+    with Image.open(path) as thumb:
+        assert max(thumb.size) == 256
+        assert thumb.size == (256, 192)
+
+    mtime = path.stat().st_mtime_ns
+    cached_path, cached_key = derivatives.get_thumbnail(relative_path, image_hash, 256)
+    assert cached_path == path
+    assert cached_key == key
+    assert path.stat().st_mtime_ns == mtime
+
+def test_overlay_key_depends_on_detections(derivatives, stored_image):
+    """Test overlays are keyed by their detections as well as the image."""
+    relative_path, image_hash = stored_image
+    detections = [{"class": "plasmodium", "confidence": 0.9, "bbox": [100, 100, 300, 250]}]
+
+    path, key = derivatives.get_overlay(relative_path, image_hash, detections, 512)
+    other_path, other_key = derivatives.get_overlay(relative_path, image_hash, [], 512)
+
+    assert path.exists() and other_path.exists()
+    assert key != other_key
+    with Image.open(path) as overlay:
+        assert overlay.size == (512, 384)
+
+def test_missing_original_raises(derivatives):
+    """Test a missing original image surfaces as FileNotFoundError."""
+    with pytest.raises(FileNotFoundError):
+        derivatives.get_thumbnail("clinic-1/2025-01/missing.jpg", "0" * 64, 256)
+
+def test_invalid_hash_is_refused_before_building_a_cache_path(derivatives, stored_image):
+    """Test image hashes that are not hex SHA-256 digests never become cache file names."""
+    relative_path, _ = stored_image
+    with pytest.raises(ValueError):
+        derivatives.get_thumbnail(relative_path, "../../etc/passwd", 256)
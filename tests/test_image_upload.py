@@ -0,0 +1,106 @@
+import os
+import pytest
+from uuid import uuid4
+from sqlalchemy.orm import Session
+from src.entities.test_result import TestResult, TestStatus, SyncStatus
+from src.infrastructure.file_storage import FileStorageService
+from src.infrastructure.image_upload import ImageUploader
+from src.infrastructure.sync_service import SyncService
+
+CHUNK_SIZE = 1000
+
+@pytest.fixture
+def sync_service(central_server, storage):
+    """Create a sync service uploading small chunks to the mock central server."""
+    service = SyncService(central_server_url=central_server.url, batch_size=10)
+    service.image_uploader = ImageUploader(service.transport, storage, chunk_size=CHUNK_SIZE, max_in_flight=2)
+    yield service
+    service.close()
+
+def add_result_with_image(db_session: Session, storage: FileStorageService, content: bytes) -> TestResult:
+    image_path, image_filename = storage.save_image(content, "smear.jpg", "clinic")
+    result = TestResult(
+        id=uuid4(),
+        patient_id=uuid4(),
+        clinic_id=uuid4(),
+        health_worker_id=uuid4(),
+        result=TestStatus.Positive,
+        image_path=image_path,
+        image_filename=image_filename,
+        image_hash=storage.content_hash(content),
+    )
+    db_session.add(result)
+    db_session.commit()
+    return result
+
+def test_images_upload_in_checksummed_chunks_once_per_hash(db_session, central_server, sync_service, storage):
+    """Test images are uploaded in chunks before their results, deduplicated by hash."""
+    shared, other = os.urandom(3500), os.urandom(1200)
+    results = [add_result_with_image(db_session, storage, content) for content in (shared, shared, other)]
+
+    stats = sync_service.sync_all_pending(db_session)
+
+    assert stats["synced"] == 3
+    assert {h: bytes(u["data"]) for h, u in central_server.uploads.items()} == {
+        storage.content_hash(shared): shared,
+        storage.content_hash(other): other,
+    }
+    assert len(central_server.chunk_requests) == 4 + 2
+    assert all(r.sync_status == SyncStatus.Synced for r in results)
+
+    # Re-syncing an edited result does not resend an image the server already has
+    results[0].notes = "Edited"
+    db_session.commit()
+    sync_service.sync_all_pending(db_session)
+    assert len(central_server.chunk_requests) == 6
+
+def test_interrupted_upload_resumes_at_last_chunk(db_session, central_server, sync_service, storage):
+    """Test an upload cut off after two chunks continues from the server's offset."""
+    content = os.urandom(4500)
+    image_hash = storage.content_hash(content)
+    transport = sync_service.transport
+    transport.get_upload_offset(image_hash, len(content), "smear.jpg")
+    transport.upload_chunk(image_hash, 0, content[:CHUNK_SIZE])
+    transport.upload_chunk(image_hash, CHUNK_SIZE, content[CHUNK_SIZE:2 * CHUNK_SIZE])
+    add_result_with_image(db_session, storage, content)
+
+    sync_service.sync_all_pending(db_session)
+
+    offsets = [offset for h, offset, _ in central_server.chunk_requests if h == image_hash]
+    assert offsets == [0, 1000, 2000, 3000, 4000]
+    assert bytes(central_server.uploads[image_hash]["data"]) == content
+
+def test_failed_chunk_is_retried_without_resending_accepted_bytes(db_session, central_server, sync_service, storage):
+    """Test a dropped chunk is retried from the server's offset within the same sync."""
+    content = os.urandom(2500)
+    result = add_result_with_image(db_session, storage, content)
+    central_server.fail_chunks = 1
+
+    stats = sync_service.sync_all_pending(db_session)
+
+    assert stats["synced"] == 1
+    assert sum(length for _, _, length in central_server.chunk_requests) == len(content)
+    assert result.sync_status == SyncStatus.Synced
+
+def test_upload_failure_keeps_changes_queued(db_session, central_server, sync_service, storage):
+    """Test a result is not sent while its image cannot be uploaded."""
+    add_result_with_image(db_session, storage, os.urandom(1500))
+    central_server.fail_chunks = 3
+
+    stats = sync_service.sync_all_pending(db_session)
+
+    assert stats["synced"] == 0
+    assert central_server.batches == []
+    assert sync_service.count_unsynced_changes(db_session) == 1
+
+def test_upload_gives_up_when_the_offset_does_not_advance(db_session, central_server, sync_service, storage):
+    """Test a server that keeps repeating the same offset costs max_attempts chunks, not an endless loop."""
+    add_result_with_image(db_session, storage, os.urandom(1500))
+    central_server.stall_chunks = 100
+
+    stats = sync_service.sync_all_pending(db_session)
+
+    assert stats["synced"] == 0
+    assert central_server.stall_chunks == 100 - sync_service.image_uploader.max_attempts
+    assert central_server.batches == []
+    assert sync_service.count_unsynced_changes(db_session) == 1
@@ -0,0 +1,96 @@
+import os
+import gzip
+import hashlib
+import pytest
+from src.infrastructure.ai_inference import MalariaInferenceService
+from src.infrastructure.model_updater import ModelUpdater, read_active_model
+from src.infrastructure.sync_transport import SyncTransport, SyncTransportError
+
+class RecordingInferenceService:
+    """Stands in for the inference service, recording swaps instead of loading models."""
+
+    def __init__(self, loads: bool = True):
+        self.loads = loads
+        self.swaps = []
+
+    def swap_model(self, model_path: str, model_version: str) -> bool:
+        self.swaps.append((model_path, model_version))
+        return self.loads
+
+@pytest.fixture
+def transport(central_server):
+    transport = SyncTransport(central_server.url)
+    yield transport
+    transport.close()
+
+def publish_model(central_server, content: bytes, version: str = "v2", compression: str = "gzip") -> bytes:
+    artifact = gzip.compress(content) if compression == "gzip" else content
+    central_server.artifacts[f"/models/{version}"] = artifact
+    central_server.model_manifest = {
+        "version": version,
+        "sha256": hashlib.sha256(content).hexdigest(),
+        "size": len(artifact),
+        "compression": compression,
+        "path": f"/models/{version}",
+    }
+    return artifact
+
+def test_new_model_is_verified_swapped_in_and_recorded(central_server, transport, tmp_path):
+    """Test a published model is downloaded once, decompressed, verified and hot-swapped."""
+    content = os.urandom(5000)
+    publish_model(central_server, content)
+    inference_service = RecordingInferenceService()
+    updater = ModelUpdater(transport, inference_service, model_dir=tmp_path)
+
+    assert updater.check_for_update() == "v2"
+
+    model_path, version = inference_service.swaps[0]
+    assert version == "v2"
+    with open(model_path, "rb") as f:
+        assert f.read() == content
+    assert read_active_model(tmp_path)["path"] == model_path
+    assert updater.check_for_update() is None
+    assert len(central_server.download_requests) == 1
+
+def test_interrupted_model_download_resumes(central_server, transport, tmp_path):
+    """Test a partial download continues with a Range request from the bytes on disk."""
+    content = os.urandom(5000)
+    artifact = publish_model(central_server, content, compression=None)
+    expected_name = f"malaria_{hashlib.sha256(content).hexdigest()[:16]}.onnx"
+    (tmp_path / f"{expected_name}.download").write_bytes(artifact[:2000])
+    updater = ModelUpdater(transport, RecordingInferenceService(), model_dir=tmp_path)
+
+    assert updater.check_for_update() == "v2"
+    assert central_server.download_requests == [("/models/v2", 2000)]
+    assert (tmp_path / expected_name).read_bytes() == content
+
+def test_corrupt_model_is_rejected(central_server, transport, tmp_path):
+    """Test an artifact that does not match its checksum is discarded and never activated."""
+    publish_model(central_server, os.urandom(5000))
+    central_server.model_manifest["sha256"] = hashlib.sha256(b"something else").hexdigest()
+    inference_service = RecordingInferenceService()
+    updater = ModelUpdater(transport, inference_service, model_dir=tmp_path)
+
+    with pytest.raises(SyncTransportError):
+        updater.check_for_update()
+
+    assert inference_service.swaps == []
+    assert read_active_model(tmp_path) is None
+    assert list(tmp_path.iterdir()) == []
+
+def test_model_that_fails_to_load_is_not_activated(central_server, transport, tmp_path):
+    """Test the active model only changes once the inference service has loaded the new one."""
+    publish_model(central_server, os.urandom(5000))
+    updater = ModelUpdater(transport, RecordingInferenceService(loads=False), model_dir=tmp_path)
+
+    assert updater.check_for_update() is None
+    assert updater.current_version() is None
+
+def test_inference_service_keeps_current_model_when_swap_fails(tmp_path):
+    """Test swapping to a model that cannot be loaded leaves the service unchanged."""
+    service = MalariaInferenceService(model_path=str(tmp_path / "current.onnx"))
+    service.load_model()
+
+    assert service.swap_model(str(tmp_path / "missing.onnx"), "v2") is False
+    assert service.model_version == "malaria-yolo8-v1.0.0"
+    assert service.model_path == str(tmp_path / "current.onnx")
@@ -0,0 +1,180 @@
+import io
+import json
+import zipfile
+import pytest
+from datetime import datetime, timezone, timedelta
+from uuid import uuid4
+from PIL import Image
+from fastapi import UploadFile
+from sqlalchemy.orm import Session, sessionmaker
+from src.results import service, models
+from src.entities.test_result import TestResult, TestStatus, SyncStatus
+from src.entities.analysis_job import AnalysisJob, JobStatus
+from src.auth.models import TokenData
+from src.exceptions import BatchAnalysisError, InvalidCursorError
+
+@pytest.fixture
+def jpeg_bytes():
+    buffer = io.BytesIO()
+    Image.new("RGB", (320, 240), (200, 120, 140)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+def metadata(count: int, **extra) -> list:
+    return [{"patient_id": str(uuid4()), "clinic_id": str(uuid4()), **extra} for _ in range(count)]
+
+def test_prepare_batch_positional(jpeg_bytes):
+    """Test metadata items are matched to images by position."""
+    items = metadata(2)
+    batch = service.prepare_batch([("a.jpg", jpeg_bytes), ("b.jpg", jpeg_bytes)], json.dumps(items))
+
+    assert [filename for _, filename, _ in batch] == ["a.jpg", "b.jpg"]
+    assert str(batch[1][0].patient_id) == items[1]["patient_id"]
+
+def test_prepare_batch_zip_matched_by_filename(jpeg_bytes):
+    """Test zip archives are expanded and matched to metadata by filename."""
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("smears/b.jpg", jpeg_bytes)
+        zf.writestr("smears/a.jpg", jpeg_bytes)
+        zf.writestr("smears/readme.txt", b"ignored")
+    items = [{**metadata(1)[0], "filename": "b.jpg"}, {**metadata(1)[0], "filename": "a.jpg"}]
+
+    batch = service.prepare_batch([("smears.zip", archive.getvalue())], json.dumps(items))
+
+    assert [filename for _, filename, _ in batch] == ["a.jpg", "b.jpg"]
+    assert str(batch[0][0].patient_id) == items[1]["patient_id"]
+
+def test_prepare_batch_rejects_repeated_filenames(jpeg_bytes):
+    """Test images or metadata sharing a file name are rejected rather than matched ambiguously."""
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("ward-1/smear.jpg", jpeg_bytes)
+        zf.writestr("ward-2/smear.jpg", jpeg_bytes)
+    items = [{**item, "filename": "smear.jpg"} for item in metadata(2)]
+
+    with pytest.raises(BatchAnalysisError, match="repeated image file smear.jpg"):
+        service.prepare_batch([("smears.zip", archive.getvalue())], json.dumps(items))
+    with pytest.raises(BatchAnalysisError, match="repeated metadata filename smear.jpg"):
+        service.prepare_batch([("a.jpg", jpeg_bytes), ("smear.jpg", jpeg_bytes)], json.dumps(items))
+
+def test_prepare_batch_checks_zip_sizes_before_reading(jpeg_bytes, monkeypatch):
+    """Test zip entries are refused on their declared size, before being decompressed."""
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("a.jpg", jpeg_bytes)
+        zf.writestr("bomb.jpg", b"\0" * 100_000)
+    monkeypatch.setattr(service, "MAX_BATCH_IMAGE_BYTES", 50_000)
+    monkeypatch.setattr(zipfile.ZipFile, "read", lambda *args: pytest.fail("entry was read"))
+
+    with pytest.raises(BatchAnalysisError, match="bomb.jpg exceeds 50000 bytes"):
+        service.prepare_batch([("smears.zip", archive.getvalue())], json.dumps(metadata(2)))
+
+    monkeypatch.setattr(service, "MAX_BATCH_IMAGE_BYTES", 200_000)
+    monkeypatch.setattr(service, "MAX_BATCH_ZIP_BYTES", 100_000)
+    with pytest.raises(BatchAnalysisError, match="more than 100000 bytes"):
+        service.prepare_batch([("smears.zip", archive.getvalue())], json.dumps(metadata(2)))
+
+def test_prepare_batch_count_mismatch(jpeg_bytes):
+    """Test a metadata/image count mismatch is rejected."""
+    with pytest.raises(BatchAnalysisError):
+        service.prepare_batch([("a.jpg", jpeg_bytes)], json.dumps(metadata(2)))
+
+def test_analyze_batch_commits_in_one_transaction(db_session: Session, storage, jpeg_bytes):
+    """Test a batch streams one line per image and commits every valid result."""
+    items = metadata(2)
+    batch = service.prepare_batch(
+        [("a.jpg", jpeg_bytes), ("bad.jpg", b"not an image"), ("c.jpg", jpeg_bytes)],
+        json.dumps(items + metadata(1)),
+    )
+    derivative_jobs = []
+
+    lines = [json.loads(line) for line in service.analyze_batch(
+        TokenData(user_id=str(uuid4())), db_session, batch, derivative_jobs
+    )]
+
+    items_out = [line for line in lines if line["type"] == "item"]
+    summary = lines[-1]
+    assert len(items_out) == 3
+    assert summary == {"type": "summary", "total": 3, "analyzed": 2, "failed": 1, "committed": True, "error": None}
+    assert len(derivative_jobs) == 2
+
+    stored = db_session.query(TestResult).all()
+    assert len(stored) == 2
+    for result in stored:
+        assert storage.get_image_path(result.image_path).exists()
+
+def make_upload(content: bytes, filename: str = "smear.jpg") -> UploadFile:
+    return UploadFile(file=io.BytesIO(content), filename=filename)
+
+def queue_job(db_session: Session, content: bytes) -> AnalysisJob:
+    request = models.AnalysisRequest(patient_id=uuid4(), clinic_id=uuid4())
+    return service.create_analysis_job(TokenData(user_id=str(uuid4())), db_session, request, make_upload(content))
+
+def test_analysis_job_completes(db_session: Session, storage, jpeg_bytes):
+    """Test a queued job stays staged until its result is committed."""
+    job = queue_job(db_session, jpeg_bytes)
+    assert job.status == JobStatus.Queued
+    assert storage.get_staged_path(job.image_path).exists()
+
+    service.run_analysis_job(job.id, sessionmaker(bind=db_session.get_bind()))
+
+    status = service.get_analysis_job(TokenData(user_id=str(uuid4())), db_session, job.id)
+    assert status.status == JobStatus.Completed
+    assert status.result is not None
+    result = db_session.query(TestResult).filter(TestResult.id == status.test_result_id).one()
+    assert result.image_path == job.image_path
+    assert storage.get_image_path(job.image_path).exists()
+    assert not storage.get_staged_path(job.image_path).exists()
+
+def test_analysis_job_fails_on_invalid_image(db_session: Session, storage):
+    """Test an invalid upload marks the job failed and discards the staged image."""
+    job = queue_job(db_session, b"not an image")
+
+    service.run_analysis_job(job.id, sessionmaker(bind=db_session.get_bind()))
+
+    status = service.get_analysis_job(TokenData(user_id=str(uuid4())), db_session, job.id)
+    assert status.status == JobStatus.Failed
+    assert status.error == "Invalid image file"
+    assert not storage.get_staged_path(job.image_path).exists()
+
+def test_recover_analysis_jobs_requeues_stale_jobs(db_session: Session, storage, jpeg_bytes, monkeypatch):
+    """Test queued and stale running jobs are resubmitted after a restart."""
+    queued = queue_job(db_session, jpeg_bytes)
+    stale = queue_job(db_session, jpeg_bytes)
+    stale.status = JobStatus.Running
+    stale.started_at = datetime.now(timezone.utc) - timedelta(hours=1)
+    live = queue_job(db_session, jpeg_bytes)
+    live.status = JobStatus.Running
+    live.started_at = datetime.now(timezone.utc)
+    db_session.commit()
+
+    submitted = []
+    monkeypatch.setattr(service.get_analysis_job_runner(), "submit", submitted.append)
+
+    assert service.recover_analysis_jobs(sessionmaker(bind=db_session.get_bind())) == 2
+    assert set(submitted) == {queued.id, stale.id}
+
+def test_pending_sync_results_are_paginated_by_cursor(db_session: Session):
+    """Test pending results are returned oldest first in keyset pages."""
+    created = datetime(2024, 1, 1)
+    for i in range(5):
+        db_session.add(TestResult(
+            id=uuid4(), patient_id=uuid4(), clinic_id=uuid4(), health_worker_id=uuid4(),
+            result=TestStatus.Negative, image_path=f"c/{i}.jpg", image_filename=f"{i}.jpg",
+            # Two rows share a timestamp so the id tiebreaker is exercised
+            created_at=created + timedelta(minutes=i // 2),
+            sync_status=SyncStatus.Synced if i == 4 else SyncStatus.Pending,
+        ))
+    db_session.commit()
+    token = TokenData(user_id=str(uuid4()))
+
+    first, cursor = service.get_pending_sync_results(token, db_session, limit=3)
+    second, last_cursor = service.get_pending_sync_results(token, db_session, limit=3, cursor=cursor)
+
+    assert len(first) == 3 and len(second) == 1 and last_cursor is None
+    assert {r.id for r in first}.isdisjoint({r.id for r in second})
+    page_order = [(r.created_at, r.id) for r in first + second]
+    assert page_order == sorted(page_order)
+
+    with pytest.raises(InvalidCursorError):
+        service.get_pending_sync_results(token, db_session, cursor="not-a-cursor")
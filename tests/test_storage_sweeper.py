@@ -0,0 +1,79 @@
+import os
+import time
+import pytest
+from uuid import uuid4
+from sqlalchemy.orm import Session, sessionmaker
+from src.entities.test_result import TestResult, TestStatus
+from src.infrastructure.file_storage import FileStorageService
+from src.infrastructure.storage_sweeper import StorageSweeper
+
+@pytest.fixture
+def sweeper(storage, db_session: Session):
+    """Create a sweeper with a one hour grace period."""
+    session_factory = sessionmaker(bind=db_session.get_bind())
+    return StorageSweeper(storage, session_factory, interval_seconds=0, grace_seconds=3600)
+
+def add_result(db_session: Session, image_path: str) -> TestResult:
+    result = TestResult(
+        id=uuid4(),
+        patient_id=uuid4(),
+        clinic_id=uuid4(),
+        health_worker_id=uuid4(),
+        result=TestStatus.Negative,
+        image_path=image_path,
+        image_filename=os.path.basename(image_path),
+    )
+    db_session.add(result)
+    db_session.commit()
+    return result
+
+def make_old(path):
+    old = time.time() - 7200
+    os.utime(path, (old, old))
+
+def test_staged_image_is_invisible_until_promoted(storage: FileStorageService):
+    """Test staged images only appear at their final path after promotion."""
+    relative_path, _ = storage.stage_image(b"image-bytes", "smear.jpg", "clinic")
+
+    assert not storage.get_image_path(relative_path).exists()
+    assert storage.get_staged_path(relative_path).exists()
+
+    assert storage.promote_image(relative_path)
+    assert storage.get_image_path(relative_path).read_bytes() == b"image-bytes"
+    assert not storage.get_staged_path(relative_path).exists()
+
+def test_sweep_promotes_committed_staged_image(storage, sweeper, db_session):
+    """Test a staged image whose row was committed is promoted (crash after commit)."""
+    relative_path, _ = storage.stage_image(b"image-bytes", "smear.jpg", "clinic")
+    add_result(db_session, relative_path)
+
+    stats = sweeper.recover_staged()
+
+    assert stats["promoted"] == 1
+    assert storage.get_image_path(relative_path).exists()
+
+def test_sweep_discards_abandoned_staged_image(storage, sweeper):
+    """Test staged images without a row are removed after the grace period."""
+    fresh_path, _ = storage.stage_image(b"fresh", "a.jpg", "clinic")
+    old_path, _ = storage.stage_image(b"old", "b.jpg", "clinic")
+    make_old(storage.get_staged_path(old_path))
+
+    stats = sweeper.recover_staged()
+
+    assert stats["discarded"] == 1
+    assert storage.get_staged_path(fresh_path).exists()
+    assert not storage.get_staged_path(old_path).exists()
+
+def test_sweep_removes_orphaned_images(storage, sweeper, db_session):
+    """Test promoted images with no referencing row are removed after the grace period."""
+    kept_path, _ = storage.save_image(b"kept", "a.jpg", "clinic")
+    orphan_path, _ = storage.save_image(b"orphan", "b.jpg", "clinic")
+    add_result(db_session, kept_path)
+    make_old(storage.get_image_path(kept_path))
+    make_old(storage.get_image_path(orphan_path))
+
+    stats = sweeper.sweep()
+
+    assert stats["orphans_removed"] == 1
+    assert storage.get_image_path(kept_path).exists()
+    assert not storage.get_image_path(orphan_path).exists()
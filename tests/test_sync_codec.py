@@ -0,0 +1,95 @@
+import gzip
+import pytest
+from datetime import date, datetime
+from uuid import uuid4
+from src.entities.clinic import Clinic
+from src.entities.patient import Patient, Gender
+from src.entities.test_result import TestResult, TestStatus
+from src.infrastructure import sync_codec
+from src.infrastructure.sync_service import SyncService
+from src.infrastructure.sync_transport import SyncTransport
+from tests.test_sync_service import add_results
+
+msgpack = pytest.importorskip("msgpack")
+
+@pytest.fixture
+def sync_service(central_server):
+    """Create a sync service pointed at the mock central server."""
+    service = SyncService(central_server_url=central_server.url, batch_size=100)
+    yield service
+    service.close()
+
+def build_batch(db_session, sync_service):
+    clinic = Clinic(id=uuid4(), name="Clinic", district="Gaborone", region="South-East", latitude=-24.65)
+    patient = Patient(
+        id=uuid4(), clinic_id=clinic.id, first_name="Ada", last_name="B",
+        gender=Gender.Female, date_of_birth=date(1990, 5, 17),
+    )
+    result = TestResult(
+        id=uuid4(), patient_id=patient.id, clinic_id=clinic.id, health_worker_id=uuid4(),
+        result=TestStatus.Positive, confidence_score=0.87, image_path="c/x.jpg", image_filename="x.jpg",
+        detections=[{"bbox": [1.5, 2, 30, 40], "confidence": 0.9}],
+        test_date=datetime(2024, 3, 1, 9, 30, 15, 123456),
+    )
+    db_session.add_all([clinic, patient, result])
+    db_session.commit()
+    db_session.delete(result)
+    db_session.commit()
+    add_results(db_session, 3)
+
+    rows = next(sync_service.iter_change_batches(db_session))
+    items, _ = sync_service.build_changes(db_session, rows)
+    return items
+
+def test_columnar_encoding_round_trips(db_session, sync_service):
+    """Test decoding the binary batch yields exactly the JSON wire items."""
+    items = build_batch(db_session, sync_service)
+    assert {item["op"] for item in items} == {"upsert", "delete"}
+
+    decoded = sync_codec.decode_changes(sync_codec.encode_changes("device-1", items))
+
+    assert decoded == {"device_id": "device-1", "changes": items}
+
+def test_columnar_encoding_is_smaller_than_json(db_session, sync_service):
+    """Test the binary batch is several times smaller than JSON and still smaller after gzip."""
+    add_results(db_session, 100)
+    rows = next(sync_service.iter_change_batches(db_session))
+    items, _ = sync_service.build_changes(db_session, rows)
+
+    binary = sync_codec.encode_changes("device-1", items)
+    as_json = SyncTransport.encode_json({"device_id": "device-1", "changes": items})
+
+    assert len(binary) * 2 < len(gzip.decompress(as_json))
+    assert len(gzip.compress(binary)) < len(as_json)
+
+def test_unknown_columns_are_skipped(db_session, sync_service):
+    """Test a column this server does not know is dropped instead of failing the batch."""
+    items = build_batch(db_session, sync_service)
+    body = msgpack.unpackb(sync_codec.encode_changes("device-1", items), raw=False)
+    columns = body["tables"]["test_result"]["columns"]
+    columns["added_later"] = list(columns["image_filename"])
+
+    decoded = sync_codec.decode_changes(msgpack.packb(body, use_bin_type=True))
+
+    assert decoded == {"device_id": "device-1", "changes": items}
+
+def test_unknown_schema_version_is_rejected():
+    """Test payloads from a newer schema are refused rather than misread."""
+    payload = msgpack.packb({"v": sync_codec.SCHEMA_VERSION + 1}, use_bin_type=True)
+
+    with pytest.raises(ValueError):
+        sync_codec.decode_changes(payload)
+
+def test_sync_negotiates_binary_and_falls_back_to_json(db_session, central_server, sync_service):
+    """Test batches go out as MessagePack, and as JSON once the server answers 415."""
+    add_results(db_session, 2)
+    sync_service.sync_all_pending(db_session)
+    assert central_server.content_types == [sync_codec.MSGPACK_CONTENT_TYPE]
+
+    central_server.accept_msgpack = False
+    add_results(db_session, 2)
+    stats = sync_service.sync_all_pending(db_session)
+
+    assert stats["synced"] == 2
+    assert central_server.content_types[-1] == sync_codec.JSON_CONTENT_TYPE
+    assert sync_service.transport.payload_format == "json"
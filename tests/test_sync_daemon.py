@@ -0,0 +1,95 @@
+import time
+import pytest
+from sqlalchemy.orm import sessionmaker
+from src.entities.test_result import SyncStatus
+from src.infrastructure.sync_service import SyncService
+from src.infrastructure.sync_daemon import SyncDaemon
+from src.infrastructure.sync_transport import SyncTransportError
+from tests.test_sync_service import add_results
+
+def make_daemon(db_session, url: str, **kwargs) -> SyncDaemon:
+    service = SyncService(central_server_url=url, batch_size=10)
+    session_factory = sessionmaker(bind=db_session.get_bind())
+    return SyncDaemon(service, session_factory, interval_seconds=60, base_backoff_seconds=1, max_backoff_seconds=8, **kwargs)
+
+def test_run_once_drains_pending_and_reports_progress(db_session, central_server):
+    """Test one cycle pushes every pending result and updates the progress counters."""
+    add_results(db_session, 25)
+    daemon = make_daemon(db_session, central_server.url)
+
+    run = daemon.run_once()
+
+    assert run == {"total": 25, "synced": 25, "failed": 0, "pulled": 0, "errors": []}
+    progress = daemon.get_progress()
+    assert progress["online"] is True
+    assert progress["pending"] == 0
+    assert progress["synced_total"] == 25
+    assert progress["bytes_sent"] > 0
+    assert len(central_server.batches) == 3
+
+def test_run_once_detects_unreachable_server(db_session, central_server):
+    """Test an unreachable server fails fast without touching pending results."""
+    url = central_server.url
+    central_server.stop()
+    results = add_results(db_session, 2)
+    daemon = make_daemon(db_session, url)
+
+    with pytest.raises(SyncTransportError):
+        daemon.run_once()
+
+    assert daemon.get_progress()["online"] is False
+    db_session.expire_all()
+    assert all(r.sync_status == SyncStatus.Pending for r in results)
+
+def test_pull_and_model_failures_do_not_fail_the_push(db_session, central_server, monkeypatch):
+    """Test a failing pull or model check is reported without failing the cycle."""
+    results = add_results(db_session, 3)
+    daemon = make_daemon(db_session, central_server.url)
+    central_server.model_manifest = {"version": "v2"}
+
+    def fail_pull(db):
+        raise SyncTransportError("Central server returned 404 for /api/sync/pull")
+
+    monkeypatch.setattr(daemon.sync_service, "pull_changes", fail_pull)
+
+    run = daemon.run_once()
+
+    assert (run["synced"], run["failed"]) == (3, 0)
+    assert len(run["errors"]) == 2
+    db_session.expire_all()
+    assert all(r.sync_status == SyncStatus.Synced for r in results)
+
+def test_backoff_grows_exponentially_with_jitter(db_session):
+    """Test backoff delays double per failure, stay within jitter bounds and are capped."""
+    daemon = make_daemon(db_session, "http://127.0.0.1:9")
+
+    for failures, ceiling in [(1, 1), (2, 2), (3, 4), (4, 8), (10, 8)]:
+        delay = daemon.backoff_delay(failures)
+        assert ceiling / 2 <= delay <= ceiling
+
+def test_bandwidth_budget_pauses_until_window_frees(db_session):
+    """Test batches wait once the hourly byte budget is spent."""
+    daemon = make_daemon(db_session, "http://127.0.0.1:9", bandwidth_bytes_per_hour=1000)
+    now = time.monotonic()
+
+    assert daemon.budget_wait_seconds(now) == 0
+    daemon._sent.append((now - 600, 1200))
+    assert daemon.budget_wait_seconds(now) == pytest.approx(3000)
+    assert daemon.budget_wait_seconds(now + 3001) == 0
+
+def test_daemon_thread_syncs_in_background(db_session, central_server):
+    """Test the started daemon drains the backlog without a request."""
+    results = add_results(db_session, 5)
+    daemon = make_daemon(db_session, central_server.url)
+
+    daemon.start()
+    try:
+        deadline = time.time() + 5
+        while daemon.get_progress()["synced_total"] < 5 and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        daemon.stop()
+
+    db_session.expire_all()
+    assert all(r.sync_status == SyncStatus.Synced for r in results)
+    assert daemon.get_progress()["state"] == "stopped"
@@ -0,0 +1,272 @@
+import pytest
+from sqlalchemy import event
+from uuid import uuid4
+from sqlalchemy.orm import Session
+from src.entities.test_result import TestResult, TestStatus, SyncStatus
+from src.entities.clinic import Clinic
+from src.entities.patient import Patient, Gender
+from src.entities.sync_change import ChangeLog
+from src.exceptions import SyncNotConfiguredError
+from src.infrastructure.sync_service import SyncService
+
+@pytest.fixture
+def sync_service(central_server):
+    """Create a sync service pointed at the mock central server."""
+    service = SyncService(central_server_url=central_server.url, batch_size=10)
+    yield service
+    service.close()
+
+def add_results(db_session: Session, count: int):
+    results = [
+        TestResult(
+            id=uuid4(),
+            patient_id=uuid4(),
+            clinic_id=uuid4(),
+            health_worker_id=uuid4(),
+            result=TestStatus.Negative,
+            confidence_score=0.9,
+            image_path=f"clinic/2024-01/{i}.jpg",
+            image_filename=f"{i}.jpg",
+        )
+        for i in range(count)
+    ]
+    db_session.add_all(results)
+    db_session.commit()
+    return results
+
+def test_sync_all_pending_sends_batches_over_one_connection(db_session, central_server, sync_service):
+    """Test pending results are sent in batches over a reused connection."""
+    results = add_results(db_session, 25)
+
+    stats = sync_service.sync_all_pending(db_session)
+
+    assert stats == {"total": 25, "synced": 25, "failed": 0}
+    assert [len(batch["changes"]) for batch in central_server.batches] == [10, 10, 5]
+    assert sorted(central_server.received_ids) == sorted(str(r.id) for r in results)
+    assert central_server.connections == 1
+    assert all(r.sync_status == SyncStatus.Synced and r.synced_at for r in results)
+
+def test_sync_updates_statuses_per_batch_not_per_row(db_session, central_server, sync_service):
+    """Test sync bookkeeping issues set-based UPDATEs and one commit per batch."""
+    results = add_results(db_session, 25)
+    central_server.reject_ids = {str(results[0].id)}
+    engine = db_session.get_bind()
+    statements, commits = [], []
+
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("UPDATE TEST_RESULTS"):
+            statements.append(statement)
+
+    def record_commit(session):
+        commits.append(session)
+
+    event.listen(engine, "before_cursor_execute", record_statement)
+    event.listen(db_session, "after_commit", record_commit)
+    try:
+        sync_service.sync_all_pending(db_session)
+    finally:
+        event.remove(engine, "before_cursor_execute", record_statement)
+        event.remove(db_session, "after_commit", record_commit)
+
+    # 3 batches: synced UPDATE in each, plus the failed UPDATE for the first batch
+    assert len(statements) == 4
+    assert all("IN" in statement for statement in statements)
+    assert len(commits) == 3
+
+def test_change_batches_stream_in_seq_order(db_session, sync_service):
+    """Test queued changes are read batch by batch as plain rows, not ORM objects."""
+    result_ids = sorted(str(r.id) for r in add_results(db_session, 25))
+    db_session.expunge_all()
+
+    batches = list(sync_service.iter_change_batches(db_session))
+    items, _ = sync_service.build_changes(db_session, batches[0])
+
+    assert [len(rows) for rows in batches] == [10, 10, 5]
+    assert sorted(str(row.entity_id) for rows in batches for row in rows) == result_ids
+    assert [row.seq for rows in batches for row in rows] == sorted(row.seq for rows in batches for row in rows)
+    assert items[0]["op"] == "upsert" and items[0]["data"]["result"] == "negative"
+    assert "image_path" not in items[0]["data"]
+    assert len(db_session.identity_map) == 0
+
+def test_delta_sync_ships_only_changes_after_watermark(db_session, central_server, sync_service):
+    """Test edits after a sync flip the result to pending and only the edit is sent next time."""
+    results = add_results(db_session, 5)
+    sync_service.sync_all_pending(db_session)
+    watermark = sync_service.get_watermark(db_session)
+    assert watermark == central_server.watermarks[sync_service.transport.device_id]
+    assert sync_service.count_unsynced_changes(db_session) == 0
+
+    results[2].notes = "Reviewed"
+    results[2].notes = "Reviewed again"
+    db_session.commit()
+    assert results[2].sync_status == SyncStatus.Pending
+
+    stats = sync_service.sync_all_pending(db_session)
+
+    assert stats == {"total": 1, "synced": 1, "failed": 0}
+    last = central_server.batches[-1]["changes"]
+    assert [(c["id"], c["data"]["notes"]) for c in last] == [(str(results[2].id), "Reviewed again")]
+    assert last[0]["seq"] > watermark
+    assert results[2].sync_status == SyncStatus.Synced
+
+def test_patient_and_clinic_changes_are_tracked(db_session, central_server, sync_service):
+    """Test clinics and patients are synced, parents first, and deletes are sent as deletes."""
+    clinic = Clinic(id=uuid4(), name="Clinic", district="Gaborone", region="South-East")
+    patient = Patient(id=uuid4(), clinic_id=clinic.id, first_name="A", last_name="B", gender=Gender.Female)
+    db_session.add_all([patient, clinic])
+    db_session.commit()
+    db_session.delete(patient)
+    db_session.commit()
+
+    sync_service.sync_all_pending(db_session)
+
+    changes = [(c["entity"], c["op"]) for c in central_server.received_changes]
+    assert changes == [("clinic", "upsert"), ("patient", "delete")]
+
+def test_seed_change_log_backfills_existing_rows(db_session, sync_service):
+    """Test the first sync enqueues unsynced rows that predate change tracking."""
+    results = add_results(db_session, 3)
+    results[0].sync_status = SyncStatus.Synced
+    db_session.commit()
+    db_session.query(ChangeLog).delete()
+    db_session.commit()
+
+    assert sync_service.seed_change_log(db_session) == 2
+    assert sync_service.seed_change_log(db_session) == 0
+    assert sync_service.count_unsynced_changes(db_session) == 2
+
+def test_sync_records_per_item_rejections(db_session, central_server, sync_service):
+    """Test rejected items are marked failed while the rest of the batch is synced."""
+    results = add_results(db_session, 3)
+    central_server.reject_ids = {str(results[1].id)}
+
+    stats = sync_service.sync_all_pending(db_session)
+
+    assert stats == {"total": 3, "synced": 2, "failed": 1}
+    assert results[1].sync_status == SyncStatus.Failed
+    assert results[0].sync_status == SyncStatus.Synced
+
+    central_server.reject_ids = set()
+    retry_stats = sync_service.retry_failed_syncs(db_session)
+    assert retry_stats == {"total": 1, "synced": 1, "still_failed": 0}
+    assert results[1].sync_status == SyncStatus.Synced
+
+def test_undelivered_batch_stays_pending(db_session, central_server, sync_service):
+    """Test a server error leaves the batch pending and stops the run."""
+    results = add_results(db_session, 15)
+    central_server.fail_requests = 1
+
+    stats = sync_service.sync_all_pending(db_session)
+
+    assert stats == {"total": 15, "synced": 0, "failed": 15}
+    assert all(r.sync_status == SyncStatus.Pending for r in results)
+
+    stats = sync_service.sync_all_pending(db_session)
+    assert stats["synced"] == 15
+
+def test_unacknowledged_changes_stay_below_the_watermark(db_session, central_server, sync_service):
+    """Test a change the server did not acknowledge is kept and resent, even when later batches are acknowledged."""
+    results = add_results(db_session, 15)
+    missing = str(results[2].id)
+    central_server.unacknowledged_ids = {missing}
+
+    stats = sync_service.sync_all_pending(db_session)
+
+    assert stats == {"total": 15, "synced": 14, "failed": 1}
+    missing_seq = db_session.query(ChangeLog.seq).filter(ChangeLog.entity_id == results[2].id).scalar()
+    assert db_session.query(ChangeLog).count() == 1
+    assert sync_service.get_watermark(db_session) == missing_seq - 1
+    assert central_server.watermarks[sync_service.transport.device_id] > missing_seq
+    assert results[2].sync_status == SyncStatus.Pending
+
+    central_server.unacknowledged_ids = set()
+    stats = sync_service.sync_all_pending(db_session)
+
+    assert stats == {"total": 1, "synced": 1, "failed": 0}
+    assert central_server.batches[-1]["changes"][0]["id"] == missing
+    assert sync_service.count_unsynced_changes(db_session) == 0
+    assert results[2].sync_status == SyncStatus.Synced
+
+def test_sync_requires_central_server(db_session, monkeypatch):
+    """Test syncing without a configured central server is refused."""
+    monkeypatch.delenv("CENTRAL_SERVER_URL", raising=False)
+    add_results(db_session, 1)
+
+    with pytest.raises(SyncNotConfiguredError):
+        SyncService().sync_all_pending(db_session)
+
+def test_sync_status_counts_in_one_query(db_session, central_server, sync_service):
+    """Test sync status statistics come from a single grouped SELECT."""
+    results = add_results(db_session, 4)
+    central_server.reject_ids = {str(results[0].id)}
+    sync_service.sync_all_pending(db_session)
+    add_results(db_session, 2)
+    engine = db_session.get_bind()
+    statements = []
+
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record_statement)
+    try:
+        status = sync_service.get_sync_status(db_session)
+    finally:
+        event.remove(engine, "before_cursor_execute", record_statement)
+
+    assert status == {"total_results": 6, "pending": 2, "synced": 3, "failed": 1, "sync_percentage": 50.0}
+    assert len(statements) == 1
+    assert "GROUP BY" in statements[0]
+
+def central_change(seq, entity, entity_id, data=None):
+    return {"seq": seq, "entity": entity, "op": "upsert" if data else "delete", "id": str(entity_id), "data": data}
+
+def test_pull_applies_central_clinics_and_patients(db_session, central_server, sync_service):
+    """Test central changes are applied page by page without being queued to push back."""
+    clinic_id, patient_id = uuid4(), uuid4()
+    clinic = {"id": str(clinic_id), "name": "Central", "district": "Gaborone", "region": "South-East",
+              "latitude": None, "longitude": None, "contact_phone": None, "contact_email": None}
+    patient = {"id": str(patient_id), "clinic_id": str(clinic_id), "first_name": "Ada", "last_name": "B",
+               "date_of_birth": "1990-05-17", "age": None, "gender": "female", "phone_number": None,
+               "national_id": "P-1", "village": None, "district": None}
+    central_server.central_changes = [
+        central_change(1, "clinic", clinic_id, clinic),
+        *[central_change(seq, "clinic", uuid4(), {**clinic, "id": str(uuid4())}) for seq in range(2, 12)],
+        central_change(12, "patient", patient_id, patient),
+        central_change(13, "patient", patient_id, {**patient, "first_name": "Adah"}),
+    ]
+
+    stats = sync_service.pull_changes(db_session)
+
+    assert stats == {"applied": 13, "skipped": 0}
+    assert central_server.pull_requests == [0, 10]
+    assert sync_service.get_pull_cursor(db_session) == 13
+    stored = db_session.get(Patient, patient_id)
+    assert (stored.first_name, stored.gender, stored.date_of_birth.isoformat()) == ("Adah", Gender.Female, "1990-05-17")
+    assert sync_service.count_unsynced_changes(db_session) == 0
+
+    central_server.central_changes.append(central_change(14, "patient", patient_id))
+    assert sync_service.pull_changes(db_session) == {"applied": 1, "skipped": 0}
+    assert central_server.pull_requests[-1] == 13
+    db_session.expire_all()
+    assert db_session.get(Patient, patient_id) is None
+
+def test_pull_keeps_unpushed_edits_and_referenced_records(db_session, central_server, sync_service):
+    """Test local edits not yet pushed win, and records still in use are not deleted."""
+    clinic = Clinic(id=uuid4(), name="Local", district="Gaborone", region="South-East")
+    patient = Patient(id=uuid4(), clinic_id=clinic.id, first_name="A", last_name="B", gender=Gender.Male)
+    db_session.add_all([clinic, patient])
+    db_session.commit()
+    result = add_results(db_session, 1)[0]
+    result.patient_id = patient.id
+    db_session.commit()
+    central_server.central_changes = [
+        central_change(1, "clinic", clinic.id, {"id": str(clinic.id), "name": "Renamed", "district": "Gaborone", "region": "South-East"}),
+        central_change(2, "patient", patient.id),
+    ]
+
+    stats = sync_service.pull_changes(db_session)
+
+    assert stats == {"applied": 0, "skipped": 2}
+    db_session.expire_all()
+    assert db_session.get(Clinic, clinic.id).name == "Local"
+    assert db_session.get(Patient, patient.id) is not None